@@ -0,0 +1,431 @@
+# armazem_ncs.py
+# (Versão v1.4 - Armazém de NCs em Memória)
+# (Cópia em colunas NumPy de 'ncs_com_saldos', partilhada pelo processo: filtrar, ordenar e somar sem ida à BD)
+# (v1.3) Um armazém por âmbito RLS, lido com as credenciais da sessão; alterações aplicadas só às linhas mudadas
+# (v1.4) 'ate': as linhas das páginas já mostradas (a lista de NCs relê-as quando o Realtime avisa)
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+# (v1.3) Como os caches do cache_global: lido com o 'ClienteSessao' de quem pede (a RLS aplica-se)
+from cache_global import TTL_PADRAO_SEGUNDOS
+from leitura_paginada import ler_tudo
+
+# Desliga com SALC_ARMAZEM_NCS=0 (as views voltam a consultar a BD a cada filtro)
+ATIVO = os.environ.get("SALC_ARMAZEM_NCS", "1") != "0"
+
+# Recarregamento completo periódico (as alterações do Realtime são aplicadas antes disso)
+TTL_ARMAZEM_SEGUNDOS = int(os.environ.get("SALC_ARMAZEM_TTL", str(TTL_PADRAO_SEGUNDOS)))
+
+# Linhas por pedido no carregamento completo (limite 'max-rows' do PostgREST)
+TAMANHO_LOTE = 1000
+
+# (v1.3) Âmbitos RLS com armazém em memória (cada um é uma cópia da tabela; com
+# SALC_AMBITO_RLS=partilhado há só um). Acima disso, sai o usado há mais tempo.
+MAX_AMBITOS = int(os.environ.get("SALC_ARMAZEM_MAX_AMBITOS", "20"))
+
+# (v1.3) Com mais de 1/4 das posições ocupadas por NCs apagadas, o Instantaneo é refeito de raiz
+FRACAO_MAX_REMOVIDAS = 0.25
+
+# Índices por valor: atributo do Instantaneo -> coluna
+_INDICES = (('por_status', 'status_calculado'), ('por_pi', 'pi'), ('por_nd', 'natureza_despesa'))
+
+# Cobre as colunas de repositorio.COLUNAS_NCS e COLUNAS_RELATORIO_GERAL
+COLUNAS_ARMAZEM = (
+    'id, numero_nc, pi, natureza_despesa, status_calculado, '
+    'valor_inicial, saldo_disponivel, total_empenhado, id_secao, '
+    'data_validade_empenho, data_recebimento, ptres, fonte, '
+    'ug_gestora, observacao'
+)
+
+# (v1.1) NumPy só é importado no 1º carregamento do armazém (e não no arranque do processo)
+np = None
+_VAZIO = None
+
+def _importar_numpy():
+    global np, _VAZIO
+    if np is None:
+        import numpy
+        _VAZIO = numpy.empty(0, dtype=numpy.intp)
+        np = numpy
+
+
+def _para_data(valor):
+    """'AAAA-MM-DD[...]' (ou date) -> datetime64[D]; vazio -> NaT."""
+    if not valor:
+        return np.datetime64('NaT', 'D')
+    return np.datetime64(str(valor)[:10], 'D')
+
+
+def _indice(valores):
+    """valor -> posições (ordenadas) das linhas com esse valor. Ignora vazios."""
+    posicoes = {}
+    for posicao, valor in enumerate(valores):
+        if valor:
+            posicoes.setdefault(valor, []).append(posicao)
+    return {valor: np.array(lista, dtype=np.intp) for valor, lista in posicoes.items()}
+
+
+def _colunas(registos):
+    """
+    (v1.3) Colunas NumPy (nome do atributo -> array) alinhadas com 'registos'.
+    Um registo só com 'id' (NC apagada, ver 'com_alteracoes') fica sem status nem datas.
+    """
+    return {
+        'ids': np.array([r['id'] for r in registos]),
+        'numeros': np.array([(r.get('numero_nc') or '').lower() for r in registos], dtype=str),
+        'status': np.array([r.get('status_calculado') for r in registos], dtype=object),
+        'nds': np.array([r.get('natureza_despesa') for r in registos], dtype=object),
+        'saldos': np.array([float(r.get('saldo_disponivel') or 0) for r in registos], dtype=np.float64),
+        'datas_recebimento': np.array([_para_data(r.get('data_recebimento')) for r in registos], dtype='datetime64[D]'),
+        'datas_validade': np.array([_para_data(r.get('data_validade_empenho')) for r in registos], dtype='datetime64[D]'),
+    }
+
+
+class Instantaneo:
+    """
+    Estado IMUTÁVEL do armazém: as linhas (dicts, como vêm do PostgREST) e,
+    alinhadas com elas, as colunas NumPy usadas nos filtros e os índices por
+    status, PI e ND. Uma alteração gera um novo Instantaneo (copy-on-write),
+    por isso as sessões podem percorrê-lo sem locks.
+    (v1.3) Uma NC apagada deixa a sua posição vazia ('registos[p]' é None, fora de 'vivos',
+    dos índices e da 'ordem'), para as posições das outras não mudarem.
+    """
+
+    def __init__(self, registos):
+        _importar_numpy()
+        self.registos = registos
+        for nome, coluna in _colunas(registos).items():
+            setattr(self, nome, coluna)
+        self.vivos = np.ones(len(registos), dtype=bool)
+        self._posicoes = {r['id']: posicao for posicao, r in enumerate(registos)}
+
+        for atributo, campo in _INDICES:
+            setattr(self, atributo, _indice(r.get(campo) for r in registos))
+
+        self._ordenar()
+
+    def _ordenar(self):
+        # Ordem das listas: data_recebimento DESC, id DESC (igual à paginação por chave)
+        if not len(self.registos):
+            self.ordem = _VAZIO
+            return
+        ordem = np.lexsort((self.ids, self.datas_recebimento))[::-1]
+        self.ordem = ordem[self.vivos[ordem]]
+
+    def __len__(self):
+        return len(self.ordem)
+
+    def com_alteracoes(self, ids_alterados, linhas_novas):
+        """
+        Novo Instantaneo sem as NCs 'ids_alterados' e com as 'linhas_novas' (as que ainda existem).
+        (v1.3) Só as posições dessas NCs são reescritas (nas cópias das colunas) e só as entradas
+        dos índices cujo valor mudou são refeitas; as NCs novas vão para o fim das colunas.
+        """
+        novas = {r['id']: r for r in linhas_novas}
+        alteradas = [(self._posicoes[nc_id], novas.get(nc_id))
+                     for nc_id in set(ids_alterados) | set(novas) if nc_id in self._posicoes]
+        acrescentadas = [r for nc_id, r in novas.items() if nc_id not in self._posicoes]
+
+        removidas = int((~self.vivos).sum()) + sum(1 for _, r in alteradas if r is None)
+        if removidas > FRACAO_MAX_REMOVIDAS * (len(self.registos) + len(acrescentadas)):
+            registos = [r for r in self.registos if r is not None and r['id'] not in ids_alterados]
+            registos.extend(linhas_novas)
+            return Instantaneo(registos)
+
+        if not alteradas and not acrescentadas:
+            return self
+        inicio = len(self.registos)
+        posicoes = [p for p, _ in alteradas] + list(range(inicio, inicio + len(acrescentadas)))
+        antigos = [self.registos[p] for p, _ in alteradas] + [None] * len(acrescentadas)
+        atuais = [r for _, r in alteradas] + acrescentadas
+
+        novo = object.__new__(Instantaneo)
+        novo.registos = self.registos + [None] * len(acrescentadas)
+        for posicao, registo in zip(posicoes, atuais):
+            novo.registos[posicao] = registo
+        tamanho = len(novo.registos)
+        indices_np = np.array(posicoes, dtype=np.intp)
+
+        # Colunas: cópia (memcpy) + escrita só nas posições alteradas
+        valores = _colunas([r if r is not None else {'id': a['id']} for r, a in zip(atuais, antigos)])
+        for nome, coluna_nova in valores.items():
+            atual = getattr(self, nome)
+            coluna = np.empty(tamanho, dtype=np.result_type(atual, coluna_nova))  # (alarga o texto se preciso)
+            coluna[:inicio] = atual
+            coluna[indices_np] = coluna_nova
+            setattr(novo, nome, coluna)
+        novo.vivos = np.ones(tamanho, dtype=bool)
+        novo.vivos[:inicio] = self.vivos
+        novo.vivos[indices_np] = [r is not None for r in atuais]
+
+        novo._posicoes = dict(self._posicoes)
+        for posicao, antigo, atual in zip(posicoes, antigos, atuais):
+            if atual is None:
+                novo._posicoes.pop(antigo['id'], None)
+            else:
+                novo._posicoes[atual['id']] = posicao
+
+        # Índices: só os valores que ganharam ou perderam posições
+        for atributo, campo in _INDICES:
+            mudancas = {}  # valor -> (posições que saem, posições que entram)
+            for posicao, antigo, atual in zip(posicoes, antigos, atuais):
+                valor_antigo = antigo.get(campo) if antigo else None
+                valor_atual = atual.get(campo) if atual else None
+                if valor_antigo == valor_atual:
+                    continue
+                if valor_antigo:
+                    mudancas.setdefault(valor_antigo, ([], []))[0].append(posicao)
+                if valor_atual:
+                    mudancas.setdefault(valor_atual, ([], []))[1].append(posicao)
+            indice = dict(getattr(self, atributo))
+            for valor, (saem, entram) in mudancas.items():
+                lista = indice.get(valor, _VAZIO)
+                if saem:
+                    lista = np.setdiff1d(lista, saem, assume_unique=True)
+                if entram:
+                    lista = np.union1d(lista, entram)
+                if len(lista):
+                    indice[valor] = lista.astype(np.intp, copy=False)
+                else:
+                    indice.pop(valor, None)
+            setattr(novo, atributo, indice)
+
+        novo._ordenar()
+        return novo
+
+    # --- Consultas (microssegundos: só NumPy, sem rede) ---
+
+    def filtrar(self, status=None, pi=None, nd=None, pesquisa=None, data_inicio=None, data_fim=None):
+        """Posições das NCs que cumprem os filtros, já pela ordem das listas."""
+        selecao = None
+        for indice, valor in ((self.por_status, status), (self.por_pi, pi), (self.por_nd, nd)):
+            if valor:
+                posicoes = indice.get(valor, _VAZIO)
+                selecao = posicoes if selecao is None else np.intersect1d(selecao, posicoes, assume_unique=True)
+
+        if selecao is None:
+            mascara = np.ones(len(self.registos), dtype=bool)
+        else:
+            mascara = np.zeros(len(self.registos), dtype=bool)
+            mascara[selecao] = True
+        if pesquisa:
+            mascara &= np.char.find(self.numeros, pesquisa.lower()) >= 0
+        if data_inicio:
+            mascara &= self.datas_recebimento >= _para_data(data_inicio)
+        if data_fim:
+            mascara &= self.datas_recebimento <= _para_data(data_fim)
+        return self.ordem[mascara[self.ordem]]
+
+    def pagina(self, posicoes, cursor, tamanho):
+        """
+        Página por chave (data_recebimento, id) sobre 'posicoes' (ordenadas por 'filtrar').
+        Devolve (linhas, cursor_seguinte), no mesmo formato de repositorio.listar_ncs_pagina.
+        """
+        if cursor:
+            valor, ultimo_id = cursor
+            datas = self.datas_recebimento[posicoes]
+            ids = self.ids[posicoes]
+            valor = _para_data(valor)
+            depois = (datas < valor) | ((datas == valor) & (ids < ultimo_id))
+            posicoes = posicoes[np.argmax(depois):] if depois.any() else _VAZIO
+        linhas = [self.registos[p] for p in posicoes[:tamanho]]
+        if len(posicoes) <= tamanho:
+            return linhas, None
+        ultima = linhas[-1]
+        return linhas, (ultima['data_recebimento'], ultima['id'])
+
+    def ate(self, posicoes, cursor):
+        """
+        (v1.4) Linhas de 'posicoes' (ordenadas por 'filtrar') até ao cursor de 'pagina',
+        inclusive: as das páginas já mostradas. Sem cursor, todas.
+        """
+        if cursor:
+            valor, ultimo_id = cursor
+            datas = self.datas_recebimento[posicoes]
+            valor = _para_data(valor)
+            antes = (datas > valor) | ((datas == valor) & (self.ids[posicoes] >= ultimo_id))
+            posicoes = posicoes[:np.count_nonzero(antes)]
+        return [self.registos[p] for p in posicoes]
+
+    def resumo(self, status=None, pi=None, nd=None):
+        """Igual a 'get_resumo_saldos' (sql/002): 'por_status' ignora o filtro de status."""
+        posicoes = self.filtrar(pi=pi, nd=nd)
+        status_sel = self.status[posicoes]
+        saldos_sel = self.saldos[posicoes]
+        por_status = {}
+        for valor in self.por_status:
+            mascara = status_sel == valor
+            quantidade = int(mascara.sum())
+            if quantidade:
+                por_status[valor] = {"saldo": float(saldos_sel[mascara].sum()), "quantidade": quantidade}
+        if status:
+            totais = por_status.get(status, {"saldo": 0.0, "quantidade": 0})
+        else:
+            totais = {"saldo": float(saldos_sel.sum()), "quantidade": len(posicoes)}
+        return {"saldo_total": totais["saldo"], "quantidade": totais["quantidade"], "por_status": por_status}
+
+    def a_vencer(self, hoje, dias=7):
+        """NCs 'Ativas' com prazo de empenho entre hoje e hoje + dias, pela data do prazo."""
+        inicio = _para_data(hoje)
+        fim = _para_data(hoje + timedelta(days=dias))
+        mascara = (self.status == 'Ativa') & (self.datas_validade >= inicio) & (self.datas_validade <= fim)
+        posicoes = np.flatnonzero(mascara)
+        posicoes = posicoes[np.argsort(self.datas_validade[posicoes], kind='stable')]
+        return [self.registos[p] for p in posicoes]
+
+    def lista_pis(self):
+        return sorted(self.por_pi)
+
+    def lista_nds(self, pi=None):
+        """NDs existentes para o PI (ou todas, sem PI)."""
+        if not pi:
+            return sorted(self.por_nd)
+        return sorted({nd for nd in self.nds[self.por_pi.get(pi, _VAZIO)] if nd})
+
+
+class ArmazemNCs:
+    """
+    Guarda o Instantaneo atual de 'ncs_com_saldos' para as sessões de UM âmbito RLS.
+      - Carregamento completo: no primeiro acesso, após 'invalidar()' ou ao fim do TTL.
+      - Incremental: 'marcar_alteradas(ids)' (chamado pelo Realtime) guarda os ids;
+        no acesso seguinte só ESSAS NCs são pedidas à BD.
+    As alterações são aplicadas no acesso (preguiçosamente), nunca na thread do Realtime.
+    """
+
+    def __init__(self, ttl_segundos=TTL_ARMAZEM_SEGUNDOS):
+        self.ttl_segundos = ttl_segundos
+        self._instantaneo = None
+        self._carregado_em = 0.0
+        self._recarregar_tudo = True
+        self._pendentes = set()
+        self._lock = threading.Lock()            # Um carregamento de cada vez
+        self._lock_pendentes = threading.Lock()  # Curto: só protege '_pendentes'/'_recarregar_tudo'
+
+    def marcar_alteradas(self, *nc_ids):
+        """Ids de NCs cujo saldo/dados mudaram. Um id None (desconhecido) força o recarregamento completo."""
+        with self._lock_pendentes:
+            if None in nc_ids:
+                self._recarregar_tudo = True
+            else:
+                self._pendentes.update(nc_ids)
+
+    def invalidar(self):
+        with self._lock_pendentes:
+            self._recarregar_tudo = True
+
+    def _atualizado(self):
+        return (
+            self._instantaneo is not None
+            and not self._recarregar_tudo
+            and not self._pendentes
+            and (time.monotonic() - self._carregado_em) < self.ttl_segundos
+        )
+
+    def pronto(self):
+        """O Instantaneo atual se não houver nada a aplicar (sem bloquear), senão None."""
+        return self._instantaneo if self._atualizado() else None
+
+    def obter(self, cliente):
+        """
+        Instantaneo atualizado (pode consultar a BD: chamar fora do loop do Flet).
+        (v1.3) As consultas usam o 'cliente' (ClienteSessao) de quem pede, do âmbito deste armazém.
+        """
+        instantaneo = self.pronto()
+        if instantaneo is not None:
+            return instantaneo
+
+        with self._lock:
+            with self._lock_pendentes:
+                expirado = (time.monotonic() - self._carregado_em) >= self.ttl_segundos
+                tudo = self._recarregar_tudo or self._instantaneo is None or expirado
+                pendentes = self._pendentes
+                self._pendentes = set()
+                if tudo:
+                    self._recarregar_tudo = False
+
+            inicio = time.perf_counter()
+            try:
+                if tudo:
+                    self._instantaneo = Instantaneo(_carregar_todas(cliente))
+                    self._carregado_em = time.monotonic()
+                    print(f"ArmazemNCs: {len(self._instantaneo)} NCs carregadas em {(time.perf_counter() - inicio) * 1000:.0f} ms.")
+                elif pendentes:
+                    self._instantaneo = self._instantaneo.com_alteracoes(pendentes, _carregar_ncs(cliente, pendentes))
+                    print(f"ArmazemNCs: {len(pendentes)} NC(s) atualizadas em {(time.perf_counter() - inicio) * 1000:.0f} ms.")
+            except Exception:
+                # Não perde o trabalho pendente: tenta de novo no acesso seguinte
+                self.marcar_alteradas(*pendentes)
+                if tudo:
+                    self.invalidar()
+                raise
+            return self._instantaneo
+
+
+class ArmazensPorAmbito:
+    """
+    (v1.3) Um ArmazemNCs por âmbito RLS ('cliente.ambito', ver supabase_client.AMBITO_RLS):
+    cada um é lido com as credenciais de uma sessão desse âmbito e só a ele é servido.
+    Os avisos do Realtime ('marcar_alteradas', 'invalidar') valem para todos; as NCs
+    alteradas são relidas por cada âmbito (as que a RLS esconder saem desse armazém).
+    """
+
+    def __init__(self, max_ambitos=MAX_AMBITOS):
+        self.max_ambitos = max_ambitos
+        self._armazens = OrderedDict()  # ambito -> ArmazemNCs, do usado há mais tempo ao mais recente
+        self._lock = threading.Lock()
+
+    def _armazem(self, cliente):
+        if cliente.ambito is None:
+            raise ValueError("ArmazemNCs: sessão sem login (âmbito RLS desconhecido).")
+        with self._lock:
+            armazem = self._armazens.pop(cliente.ambito, None)
+            if armazem is None:
+                armazem = ArmazemNCs()
+            self._armazens[cliente.ambito] = armazem
+            while len(self._armazens) > self.max_ambitos:
+                self._armazens.popitem(last=False)
+            return armazem
+
+    def _todos(self):
+        with self._lock:
+            return list(self._armazens.values())
+
+    def pronto(self, cliente):
+        return self._armazem(cliente).pronto()
+
+    def obter(self, cliente):
+        return self._armazem(cliente).obter(cliente)
+
+    def marcar_alteradas(self, *nc_ids):
+        for armazem in self._todos():
+            armazem.marcar_alteradas(*nc_ids)
+
+    def invalidar(self):
+        for armazem in self._todos():
+            armazem.invalidar()
+        print("ArmazemNCs: Invalidado.")
+
+
+# --- Consultas ao Supabase ---
+# (v1.3) Com o PostgREST síncrono da sessão (thread do armazém, fora do loop do Flet)
+
+def _carregar_todas(cliente):
+    # (v1.2) Janelas de 'leitura_paginada': um 'max-rows' abaixo de TAMANHO_LOTE
+    # já não faz parar a leitura na 1ª janela (lote "curto" não quer dizer "último")
+    return ler_tudo(
+        lambda count: cliente.table('ncs_com_saldos').select(COLUNAS_ARMAZEM, count=count).order('id'),
+        TAMANHO_LOTE,
+    )
+
+def _carregar_ncs(cliente, nc_ids):
+    resposta = cliente.table('ncs_com_saldos').select(COLUNAS_ARMAZEM) \
+        .in_('id', list(nc_ids)).execute()
+    return resposta.data or []
+
+
+# Instância única do processo
+armazem_ncs = ArmazensPorAmbito()
@@ -0,0 +1,123 @@
+# benchmark_arranque.py
+# (Versão v1.0 - Benchmark de Arranque)
+# (Mede o tempo de importação do main.py e o tempo até o servidor Flet responder ao 1º pedido)
+#
+# Uso:   python benchmark_arranque.py [--repeticoes 5] [--timeout 60] [--top 15]
+# Cada medição corre num processo Python NOVO (arranque a frio, como no contentor).
+
+import argparse
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_CODIGO_IMPORTACAO = (
+    "import time; inicio = time.perf_counter(); import main; "
+    "print(f'SALC_IMPORT {time.perf_counter() - inicio:.6f}')"
+)
+
+
+def _ambiente():
+    ambiente = dict(os.environ)
+    ambiente["PYTHONDONTWRITEBYTECODE"] = "1"
+    # O main.py abre o browser em modo WEB_BROWSER: aqui não há browser
+    ambiente["BROWSER"] = "true"
+    return ambiente
+
+
+def medir_importacao():
+    """Segundos para 'import main' num processo novo."""
+    resultado = subprocess.run(
+        [sys.executable, "-c", _CODIGO_IMPORTACAO],
+        cwd=APP_DIR, env=_ambiente(), capture_output=True, text=True, check=True,
+    )
+    return float(re.search(r"SALC_IMPORT ([0-9.]+)", resultado.stdout).group(1))
+
+
+def modulos_mais_lentos(top):
+    """Os 'top' módulos com maior tempo cumulativo de importação ('python -X importtime')."""
+    resultado = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=APP_DIR, env=_ambiente(), capture_output=True, text=True, check=True,
+    )
+    modulos = []
+    for linha in resultado.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        partes = linha.split("|")
+        if len(partes) != 3 or not linha.startswith("import time:"):
+            continue
+        try:
+            cumulativo = int(partes[1])
+        except ValueError:
+            continue
+        nome = partes[2].rstrip()
+        nivel = (len(nome) - len(nome.lstrip()) - 1) // 2
+        if nivel <= 1:  # 'main' e o que ele importa diretamente
+            modulos.append((cumulativo, nome.strip()))
+    return sorted(modulos, reverse=True)[:top]
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def medir_primeiro_pedido(timeout):
+    """Segundos desde o lançamento de 'python main.py' até à 1ª resposta HTTP 200."""
+    porta = _porta_livre()
+    ambiente = _ambiente()
+    ambiente["PORT"] = str(porta)
+    inicio = time.perf_counter()
+    processo = subprocess.Popen(
+        [sys.executable, "main.py"],
+        cwd=APP_DIR, env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - inicio < timeout:
+            if processo.poll() is not None:
+                raise RuntimeError(f"main.py terminou com o código {processo.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{porta}/", timeout=1) as resposta:
+                    if resposta.status == 200:
+                        return time.perf_counter() - inicio
+            except (urllib.error.URLError, ConnectionError, socket.timeout):
+                time.sleep(0.05)
+        raise TimeoutError(f"Sem resposta em {timeout} s")
+    finally:
+        processo.terminate()
+        try:
+            processo.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            processo.kill()
+
+
+def _resumo(nome, valores):
+    ms = [valor * 1000 for valor in valores]
+    print(f"{nome}: mediana {statistics.median(ms):.0f} ms | mín {min(ms):.0f} ms | máx {max(ms):.0f} ms ({len(ms)} medições)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de arranque do SALC.")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Segundos à espera do 1º pedido")
+    parser.add_argument("--top", type=int, default=15, help="Módulos mais lentos a listar")
+    args = parser.parse_args()
+
+    _resumo("Importação do main.py", [medir_importacao() for _ in range(args.repeticoes)])
+    _resumo("Até ao 1º pedido HTTP", [medir_primeiro_pedido(args.timeout) for _ in range(args.repeticoes)])
+
+    print("\nMódulos mais lentos a importar (cumulativo):")
+    for cumulativo, nome in modulos_mais_lentos(args.top):
+        print(f"  {cumulativo / 1000:8.1f} ms  {nome}")
+
+
+if __name__ == "__main__":
+    main()
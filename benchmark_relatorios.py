@@ -0,0 +1,92 @@
+# benchmark_relatorios.py
+# (Versão v1.0 - Benchmark dos Relatórios)
+# (Mede o tempo de geração do PDF/Excel do Relatório Geral com NCs sintéticas, sem BD)
+#
+# Uso:   python benchmark_relatorios.py [--linhas 3000] [--repeticoes 5] [--longas 0.1]
+# Corre os exportadores diretamente (como um processo do fila_relatorios), num único processo:
+# a 1ª geração inclui a importação do ReportLab/pandas e não entra na mediana.
+# Meta do PDF Geral: alguns milhares de NCs bem abaixo de 1 s.
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import exportadores
+
+META_PDF_SEGUNDOS = 1.0
+
+_PIS = ("E6SUPLJA5PA", "D6DAFUNADOM", "I3DAFUNADVA", "E3PCFSCDEGE")
+_NDS = ("339030", "339039", "449052", "339014")
+_STATUS = ("Ativa", "Sem Saldo", "Vencida", "Cancelada")
+_PALAVRAS = ("material", "de", "consumo", "para", "manutenção", "da", "viatura", "empenho", "parcial", "saldo")
+
+
+def gerar_ncs(linhas, fracao_longas, semente=0):
+    """NCs sintéticas (dicts com as colunas do Relatório Geral). 'fracao_longas': Observações de várias linhas."""
+    aleatorio = random.Random(semente)
+    ncs = []
+    for i in range(linhas):
+        sorteio = aleatorio.random()
+        if sorteio < fracao_longas:
+            palavras = aleatorio.randint(25, 60)
+        elif sorteio < 0.5:
+            palavras = aleatorio.randint(1, 4)
+        else:
+            palavras = 0
+        ncs.append({
+            "numero_nc": f"2025NC{i:06d}",
+            "pi": aleatorio.choice(_PIS),
+            "natureza_despesa": aleatorio.choice(_NDS),
+            "status_calculado": aleatorio.choice(_STATUS),
+            "valor_inicial": round(aleatorio.uniform(100, 2_000_000), 2),
+            "saldo_disponivel": round(aleatorio.uniform(0, 1_000_000), 2),
+            "data_validade_empenho": f"2025-{aleatorio.randint(1, 12):02d}-{aleatorio.randint(1, 28):02d}",
+            "ug_gestora": "160504",
+            "data_recebimento": f"2025-{aleatorio.randint(1, 12):02d}-{aleatorio.randint(1, 28):02d}",
+            "observacao": " ".join(aleatorio.choice(_PALAVRAS) for _ in range(palavras)),
+        })
+    return ncs
+
+
+def medir(tipo, ncs, repeticoes):
+    """Segundos de cada geração de 'tipo' (ver exportadores.EXPORTADORES), depois de uma a frio."""
+    extensao = ".pdf" if tipo.startswith("pdf") else ".xlsx"
+    with tempfile.TemporaryDirectory() as pasta:
+        destino = os.path.join(pasta, f"relatorio{extensao}")
+        exportadores.EXPORTADORES[tipo](ncs, destino, filtros={})  # A frio (importações)
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            exportadores.EXPORTADORES[tipo](ncs, destino, filtros={})
+            tempos.append(time.perf_counter() - inicio)
+    return tempos
+
+
+def _resumo(nome, valores):
+    ms = [valor * 1000 for valor in valores]
+    print(f"{nome}: mediana {statistics.median(ms):.0f} ms | mín {min(ms):.0f} ms | máx {max(ms):.0f} ms ({len(ms)} medições)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos relatórios do SALC.")
+    parser.add_argument("--linhas", type=int, default=3000, help="NCs no relatório")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--longas", type=float, default=0.1, help="Fração de Observações longas (várias linhas)")
+    args = parser.parse_args()
+
+    ncs = gerar_ncs(args.linhas, args.longas)
+    print(f"{args.linhas} NCs ({args.longas:.0%} com Observação longa)")
+    tempos_pdf = medir("pdf_geral", ncs, args.repeticoes)
+    _resumo("PDF Geral", tempos_pdf)
+    _resumo("Excel Geral", medir("excel_geral", ncs, args.repeticoes))
+
+    mediana = statistics.median(tempos_pdf)
+    estado = "OK" if mediana < META_PDF_SEGUNDOS else "ACIMA DA META"
+    print(f"\nMeta do PDF Geral (< {META_PDF_SEGUNDOS:.0f} s): {estado}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+# cache_global.py
+# (Versão v1.8 - Cache de Lookups Partilhado)
+# (PIs, NDs, Seções, Listas de NCs/NEs e mapa PI->ND carregados UMA VEZ por processo)
+# (v1.2) 'obter_varios' carrega várias chaves em paralelo num executor limitado
+# (v1.6) Listas lidas em janelas: deixam de ficar cortadas no 'max-rows' do PostgREST
+# (v1.7) Lidos com as credenciais da sessão (a RLS aplica-se) e guardados por âmbito RLS
+# (v1.8) Mapa PI->ND lido num só pedido (RPC 'get_distinct_pi_nd', sql/005), sem ler todas as NCs
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from leitura_paginada import ler_tudo
+
+# TTL padrão (segundos) de cada entrada. Pode ser ajustado no servidor.
+TTL_PADRAO_SEGUNDOS = int(os.environ.get("SALC_CACHE_TTL", "300"))
+
+# Máximo de consultas de cache em simultâneo (partilhado por todas as sessões)
+MAX_CARREGAMENTOS_PARALELOS = int(os.environ.get("SALC_CACHE_WORKERS", "5"))
+
+# (v1.7) Âmbitos RLS com lookups em memória (um só com o padrão SALC_AMBITO_RLS=partilhado;
+# um por utilizador com SALC_AMBITO_RLS=utilizador); acima disso, sai o usado há mais tempo
+MAX_AMBITOS = int(os.environ.get("SALC_CACHE_MAX_AMBITOS", "100"))
+
+
+class CacheGlobal:
+    """
+    Cache de dados de lookup partilhado pelas sessões Flet do processo.
+    Cada chave tem um 'loader' (função que consulta o Supabase), um TTL e uma versão:
+      - TTL: a entrada expira e é recarregada no acesso seguinte.
+      - Versão: 'invalidar()' incrementa a versão e força o recarregamento.
+    (v1.7) O loader recebe o 'ClienteSessao' de quem pede: a consulta corre com a RLS DESSE
+    utilizador, e o valor só é servido a sessões do mesmo âmbito ('cliente.ambito', ver
+    supabase_client.AMBITO_RLS). Nunca com o cliente de serviço: a RLS não pode ser ignorada.
+    Um lock por (chave, âmbito) garante que uma rajada de logins faz UMA consulta por chave.
+    """
+
+    def __init__(self, ttl_segundos=TTL_PADRAO_SEGUNDOS, max_ambitos=MAX_AMBITOS):
+        self.ttl_segundos = ttl_segundos
+        self.max_ambitos = max_ambitos
+        self._loaders = {}
+        self._ttls = {}
+        self._entradas = {}  # (chave, ambito) -> {"valor", "carregado_em", "versao"}
+        self._versoes = {}   # chave -> int
+        self._locks = {}     # (chave, ambito) -> Lock
+        self._ambitos = OrderedDict()  # ambito -> None, do usado há mais tempo ao mais recente
+        self._lock_ambitos = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=MAX_CARREGAMENTOS_PARALELOS,
+            thread_name_prefix="cache-global",
+        )
+
+    def registar(self, chave, loader, ttl_segundos=None):
+        """Regista o loader de uma chave (chamado uma vez, no import do módulo)."""
+        self._loaders[chave] = loader
+        self._ttls[chave] = ttl_segundos if ttl_segundos is not None else self.ttl_segundos
+        self._versoes.setdefault(chave, 0)
+
+    def _usar_ambito(self, ambito):
+        """Marca o âmbito como usado agora e descarta os mais antigos acima de 'max_ambitos'."""
+        if ambito is None:
+            raise ValueError("CacheGlobal: sessão sem login (âmbito RLS desconhecido).")
+        with self._lock_ambitos:
+            self._ambitos[ambito] = None
+            self._ambitos.move_to_end(ambito)
+            while len(self._ambitos) > self.max_ambitos:
+                antigo, _ = self._ambitos.popitem(last=False)
+                for chave in [c for c in self._entradas if c[1] == antigo]:
+                    self._entradas.pop(chave, None)
+                    self._locks.pop(chave, None)
+
+    def _entrada_valida(self, chave, entrada):
+        if entrada is None:
+            return False
+        if entrada["versao"] != self._versoes[chave]:
+            return False
+        return (time.monotonic() - entrada["carregado_em"]) < self._ttls[chave]
+
+    def obter(self, chave, cliente):
+        """
+        Devolve o valor da chave para o âmbito RLS do 'cliente' (ClienteSessao), carregando-o
+        do Supabase, com as credenciais desse cliente, se expirou ou foi invalidado.
+        """
+        if chave not in self._loaders:
+            raise KeyError(f"Chave de cache desconhecida: {chave}")
+        self._usar_ambito(cliente.ambito)
+        chave_ambito = (chave, cliente.ambito)
+
+        entrada = self._entradas.get(chave_ambito)
+        if self._entrada_valida(chave, entrada):
+            return entrada["valor"]
+
+        with self._lock_ambitos:
+            lock = self._locks.setdefault(chave_ambito, threading.Lock())
+        with lock:
+            # Outra sessão pode ter carregado enquanto esperávamos pelo lock
+            entrada = self._entradas.get(chave_ambito)
+            if self._entrada_valida(chave, entrada):
+                return entrada["valor"]
+
+            versao = self._versoes[chave]
+            print(f"CacheGlobal: A carregar '{chave}' (versão {versao})...")
+            inicio = time.perf_counter()
+            valor = self._loaders[chave](cliente)
+            print(f"CacheGlobal: '{chave}' carregado em {(time.perf_counter() - inicio) * 1000:.0f} ms.")
+            self._entradas[chave_ambito] = {
+                "valor": valor,
+                "carregado_em": time.monotonic(),
+                "versao": versao,
+            }
+            return valor
+
+    def obter_varios(self, cliente, chaves=None):
+        """
+        Obtém várias chaves (ou todas) em PARALELO e devolve {chave: valor}.
+        As consultas são independentes: o tempo total é o da mais lenta, não a soma.
+        Se alguma falhar, a exceção é relançada aqui.
+        """
+        chaves = tuple(chaves or self._loaders)
+        futuros = {chave: self._executor.submit(self.obter, chave, cliente) for chave in chaves}
+        return {chave: futuro.result() for chave, futuro in futuros.items()}
+
+    def atualizar(self, chave, funcao):
+        """
+        Aplica uma alteração incremental às entradas da chave JÁ carregadas e válidas (de todos
+        os âmbitos). 'funcao' recebe o valor atual e devolve um NOVO valor (copy-on-write,
+        para não alterar listas/dicts que outras sessões estejam a percorrer).
+        (v1.7) Só para alterações que valem para QUALQUER âmbito (ex: remover um registo
+        apagado); o que possa depender da RLS tem de ser 'invalidar' (a leitura seguinte
+        de cada âmbito vai à BD com as suas credenciais).
+        """
+        for chave_ambito in [c for c in list(self._entradas) if c[0] == chave]:
+            lock = self._locks.get(chave_ambito)
+            if lock is None:
+                continue  # Âmbito acabado de descartar
+            with lock:
+                entrada = self._entradas.get(chave_ambito)
+                if not self._entrada_valida(chave, entrada):
+                    continue
+                entrada = dict(entrada)
+                entrada["valor"] = funcao(entrada["valor"])
+                self._entradas[chave_ambito] = entrada
+
+    def invalidar(self, *chaves):
+        """Invalida as chaves indicadas (ou todas, se nenhuma for indicada)."""
+        for chave in (chaves or tuple(self._loaders)):
+            self._versoes[chave] = self._versoes.get(chave, 0) + 1
+        print(f"CacheGlobal: Invalidado(s): {', '.join(chaves) if chaves else 'todas as chaves'}")
+
+    def versao(self, chave):
+        return self._versoes.get(chave, 0)
+
+
+# --- (v1.4) Versão dos dados + cache de resultados por filtro ---
+
+_versao_dados = 0
+_lock_versao_dados = threading.Lock()
+
+def versao_dados():
+    """Número que muda sempre que NCs, NEs ou recolhimentos são alterados."""
+    return _versao_dados
+
+def marcar_dados_alterados():
+    """Chamado pelo Realtime (ou pelo fallback do main.py) quando os dados mudam."""
+    global _versao_dados
+    with _lock_versao_dados:
+        _versao_dados += 1
+
+
+class CacheResultados:
+    """
+    Cache pequeno de resultados por chave arbitrária (ex: combinação de filtros).
+    Uma entrada vale até expirar o TTL OU até os dados mudarem ('versao_dados').
+    Quando cheio, descarta a entrada mais antiga.
+    """
+
+    def __init__(self, ttl_segundos, max_entradas=256):
+        self.ttl_segundos = ttl_segundos
+        self.max_entradas = max_entradas
+        self._entradas = {}  # chave -> (carregado_em, versao_dados, valor)
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        """Devolve o valor guardado, ou None se não existir / estiver desatualizado."""
+        with self._lock:
+            entrada = self._entradas.get(chave)
+        if entrada is None:
+            return None
+        carregado_em, versao, valor = entrada
+        if versao != _versao_dados or (time.monotonic() - carregado_em) >= self.ttl_segundos:
+            return None
+        return valor
+
+    def guardar(self, chave, valor, versao=None):
+        """'versao' deve ser a 'versao_dados()' lida ANTES da consulta."""
+        with self._lock:
+            if chave not in self._entradas and len(self._entradas) >= self.max_entradas:
+                mais_antiga = min(self._entradas, key=lambda c: self._entradas[c][0])
+                del self._entradas[mais_antiga]
+            self._entradas[chave] = (
+                time.monotonic(),
+                _versao_dados if versao is None else versao,
+                valor,
+            )
+
+
+# --- Loaders (consultas ao Supabase) ---
+# (v1.7) Recebem o 'ClienteSessao' de quem pede: PostgREST síncrono, com o token dessa sessão
+
+def _carregar_pis(cliente):
+    return cliente.rpc('get_distinct_pis').execute().data or []
+
+def _carregar_nds(cliente):
+    return cliente.rpc('get_distinct_nds').execute().data or []
+
+def _carregar_secoes_map(cliente):
+    resposta = cliente.table('secoes').select('id, nome').execute()
+    return {secao['id']: secao['nome'] for secao in (resposta.data or [])}
+
+def _carregar_ncs_lista(cliente):
+    return ler_tudo(lambda count: cliente.table('notas_de_credito')
+                    .select('id, numero_nc', count=count).order('numero_nc').order('id'))
+
+def _carregar_nes_lista(cliente):
+    """(v1.5) Números das NEs (índice local da pesquisa por Nº NE)."""
+    return ler_tudo(lambda count: cliente.table('notas_de_empenho')
+                    .select('id, numero_ne', count=count).order('numero_ne').order('id'))
+
+def _carregar_mapa_pi_nd(cliente):
+    """
+    Relação completa PI -> set(ND).
+    (v1.8) Só os pares distintos, calculados no servidor (sql/005_get_distinct_pi_nd.sql):
+    um pedido por invalidação, em vez de ler todas as NCs em janelas.
+    """
+    linhas = cliente.rpc('get_distinct_pi_nd').execute().data or []
+    mapa = {}
+    for linha in linhas:
+        pi = linha.get('pi')
+        nd = linha.get('natureza_despesa')
+        if pi and nd:
+            mapa.setdefault(pi, set()).add(nd)
+    return mapa
+
+
+# Instância única do processo
+cache_global = CacheGlobal()
+cache_global.registar("pis", _carregar_pis)
+cache_global.registar("nds", _carregar_nds)
+cache_global.registar("secoes_map", _carregar_secoes_map)
+cache_global.registar("ncs_lista", _carregar_ncs_lista)
+cache_global.registar("mapa_pi_nd", _carregar_mapa_pi_nd)
+cache_global.registar("nes_lista", _carregar_nes_lista)
+
+
+# --- Consultas ao índice PI -> ND (sem ida à BD) ---
+
+def nds_para_pi(cliente, pi):
+    """Devolve as NDs (ordenadas) que existem para o PI indicado."""
+    return sorted(cache_global.obter("mapa_pi_nd", cliente).get(pi, ()))
+
+def nd_valida_para_pi(cliente, pi, nd):
+    """Verifica se a ND selecionada existe para o PI escolhido (vazio = sempre válido)."""
+    if not pi or not nd:
+        return True
+    return nd in cache_global.obter("mapa_pi_nd", cliente).get(pi, ())
+
@@ -0,0 +1,129 @@
+# cache_relatorios.py
+# (Versão v1.4 - Cache de Ficheiros de Relatório)
+# (O mesmo relatório, com os mesmos filtros e os mesmos dados, é gerado UMA vez e reutilizado)
+
+# A chave de um relatório é um HMAC de (versão do formato, tipo, filtros normalizados,
+# versão dos dados, âmbito RLS, época):
+#   - (v1.4) os dados NÃO entram na chave: a chave é calculada ANTES de os ler, e um ficheiro
+#     já gerado é servido sem nenhuma consulta. A "versão dos dados" é a 'versao_dados()'
+#     do cache_global (muda com cada alteração de NCs, NEs ou recolhimentos avisada pelo
+#     Realtime), mais uma janela de tempo (VALIDADE_SEGUNDOS), para o que não é avisado
+#     (ex: o status 'Vencida' muda com a data);
+#   - o âmbito RLS da sessão ('cliente.ambito'): um utilizador não recebe o relatório de outro;
+#   - a época (aleatória por processo): a 'versao_dados()' recomeça em 0 a cada arranque;
+#   - exportadores.VERSAO_FORMATO entra na chave: mudar o aspeto dos relatórios não serve
+#     ficheiros antigos;
+#   - o HMAC (com a FLET_SECRET_KEY) mantém o nome do ficheiro impossível de adivinhar.
+# (v1.2) Os ficheiros ficam numa pasta PRIVADA (não servida como estática): o browser só
+#        os recebe por /download/<token> (ver downloads.py).
+# (v1.3) Nunca assina com uma chave vazia: sem FLET_SECRET_KEY, usa uma aleatória do processo.
+# Dois pedidos iguais em simultâneo (ex: duplo clique, duas sessões) partilham a mesma geração.
+
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+
+from cache_global import versao_dados
+from exportadores import VERSAO_FORMATO
+from limpeza_ficheiros import zelador_ficheiros, REGRA_RELATORIOS
+
+PASTA_RELATORIOS = os.environ.get("SALC_PASTA_RELATORIOS", "relatorios_gerados")
+
+# (v1.4) Tempo máximo (segundos) em que um relatório é reutilizado, mesmo sem avisos do Realtime
+VALIDADE_SEGUNDOS = int(os.environ.get("SALC_RELATORIOS_VALIDADE", "300"))
+
+_EPOCA = secrets.token_hex(8)
+
+# (v1.3) Segredo dos HMAC dos relatórios (nomes dos ficheiros e tokens de download.py).
+# O main.py garante a FLET_SECRET_KEY; importado sem ela, 32 bytes aleatórios deste processo.
+_chave = os.environ.get("FLET_SECRET_KEY")
+if not _chave:
+    print("AVISO: FLET_SECRET_KEY não definida. Relatórios assinados com uma chave aleatória deste processo.")
+SEGREDO = _chave.encode() if _chave else secrets.token_bytes(32)
+
+
+class RelatorioSemDados(Exception):
+    """(v1.4) Lançada por 'gerar' quando não há dados: nenhum ficheiro é publicado."""
+
+
+def normalizar_filtros(filtros):
+    """Filtros vazios ('' / None) são iguais a filtro nenhum; a ordem das chaves não conta."""
+    return {chave: str(valor) for chave, valor in sorted((filtros or {}).items()) if valor not in (None, "")}
+
+
+def chave_relatorio(tipo, filtros, ambito):
+    """
+    Chave (hex) do relatório: muda se mudar o tipo, os filtros, o formato, o âmbito RLS ou
+    os dados (versao_dados / janela de tempo). Não lê dados nenhuns.
+    """
+    conteudo = json.dumps(
+        [VERSAO_FORMATO, tipo, normalizar_filtros(filtros), ambito,
+         _EPOCA, versao_dados(), int(time.time() // VALIDADE_SEGUNDOS)],
+        sort_keys=True, default=str, separators=(",", ":"), ensure_ascii=False,
+    )
+    return hmac.new(SEGREDO, conteudo.encode(), hashlib.sha256).hexdigest()
+
+
+class CacheRelatorios:
+    """Ficheiros de relatório em PASTA_RELATORIOS, endereçados pela 'chave_relatorio'."""
+
+    def __init__(self, pasta=PASTA_RELATORIOS):
+        self.pasta = pasta
+        self._a_gerar = {}  # nome_ficheiro -> asyncio.Task
+
+    def _nome_ficheiro(self, nome_base, tipo, chave):
+        extensao = "xlsx" if "excel" in tipo else "pdf"
+        return f"{nome_base}_{chave[:32]}.{extensao}"
+
+    async def obter_ou_gerar(self, tipo, nome_base, filtros, ambito, gerar):
+        """
+        Devolve (nome_ficheiro, reutilizado). Se o ficheiro já existir, é devolvido logo;
+        senão 'await gerar(caminho_destino)' lê os dados e escreve-o (num '.parcial',
+        publicado só no fim). (v1.4) Os dados só são lidos (dentro de 'gerar') se faltar o ficheiro.
+        """
+        chave = chave_relatorio(tipo, filtros, ambito)
+        nome = self._nome_ficheiro(nome_base, tipo, chave)
+        caminho = os.path.join(self.pasta, nome)
+
+        if os.path.exists(caminho):
+            os.utime(caminho)  # Marca como usado (a limpeza apaga primeiro os menos usados)
+            print(f"CacheRelatorios: '{nome}' reutilizado.")
+            return nome, True
+
+        tarefa = self._a_gerar.get(nome)
+        if tarefa is None:
+            tarefa = asyncio.create_task(self._gerar(caminho, gerar))
+            self._a_gerar[nome] = tarefa
+            tarefa.add_done_callback(lambda t, nome=nome: self._terminou(nome, t))
+            reutilizado = False
+        else:
+            print(f"CacheRelatorios: '{nome}' já está a ser gerado; à espera do mesmo ficheiro.")
+            reutilizado = True
+        # 'shield': se esta sessão desistir, a geração continua para quem a partilha
+        await asyncio.shield(tarefa)
+        return nome, reutilizado
+
+    def _terminou(self, nome, tarefa):
+        self._a_gerar.pop(nome, None)
+        if not tarefa.cancelled():
+            tarefa.exception()  # Marca a exceção como lida (quem espera pela tarefa recebe-a na mesma)
+
+    async def _gerar(self, caminho, gerar):
+        os.makedirs(self.pasta, exist_ok=True)
+        caminho_parcial = caminho + ".parcial"
+        try:
+            await gerar(caminho_parcial)
+            os.replace(caminho_parcial, caminho)
+            zelador_ficheiros.pedir_limpeza()  # Ficheiro novo: confirmar já a quota da pasta
+        finally:
+            if os.path.exists(caminho_parcial):
+                os.remove(caminho_parcial)
+
+
+# Instância única do processo
+cache_relatorios = CacheRelatorios()
+zelador_ficheiros.vigiar(PASTA_RELATORIOS, REGRA_RELATORIOS)
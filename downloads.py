@@ -0,0 +1,95 @@
+# downloads.py
+# (Versão v1.2 - Downloads de Relatórios por Token Assinado)
+# (Documentado porque a rota serve o ficheiro do cache_relatorios, e não bytes em memória)
+
+# Antes, cada relatório era copiado para assets/ e ficava servido como estático, para sempre,
+# a quem soubesse o nome. Agora:
+#   - os ficheiros ficam na pasta PRIVADA do cache_relatorios (não servida pelo Flet);
+#   - cada clique em "Baixar" gera um token assinado (HMAC com a FLET_SECRET_KEY) que só
+#     vale para ESSE ficheiro e durante VALIDADE_TOKEN_SEGUNDOS;
+#   - a rota lê o ficheiro em blocos (FileResponse): nada é copiado para assets/ nem carregado
+#     inteiro em memória.
+# (v1.1) A chave é a SEGREDO do cache_relatorios: nunca vazia (aleatória se faltar a FLET_SECRET_KEY).
+# A rota vive numa FastAPI (a do próprio Flet) à frente da app Flet: ver 'criar_servidor'.
+# (v1.2) O relatório é escrito UMA vez, já na pasta do cache_relatorios, e a rota lê-o daí.
+#        Não é uma cópia a mais: esse ficheiro é a entrada do cache (mesmo tipo + filtros + dados
+#        = mesmo ficheiro, servido de novo sem gerar). Por isso não há streaming direto de bytes
+#        em memória para o browser. Dependências: flet-web, fastapi e uvicorn (requirements.txt).
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+
+from cache_relatorios import PASTA_RELATORIOS, SEGREDO
+
+VALIDADE_TOKEN_SEGUNDOS = int(os.environ.get("SALC_DOWNLOAD_VALIDADE", "120"))
+
+CAMINHO_DOWNLOAD = "/download"
+
+_TIPOS_MIME = {
+    ".pdf": "application/pdf",
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def _assinatura(carga):
+    return hmac.new(SEGREDO, carga, hashlib.sha256).hexdigest()
+
+
+def assinar(nome_ficheiro, nome_download, validade=VALIDADE_TOKEN_SEGUNDOS):
+    """Token para descarregar 'nome_ficheiro' (da pasta de relatórios) como 'nome_download'."""
+    carga = json.dumps([nome_ficheiro, nome_download, int(time.time()) + validade], separators=(",", ":")).encode()
+    return f"{base64.urlsafe_b64encode(carga).decode().rstrip('=')}.{_assinatura(carga)}"
+
+
+def verificar(token):
+    """(nome_ficheiro, nome_download) se o token for válido e não tiver expirado; senão None."""
+    try:
+        carga_b64, assinatura = token.rsplit(".", 1)
+        carga = base64.urlsafe_b64decode(carga_b64 + "=" * (-len(carga_b64) % 4))
+        if not hmac.compare_digest(assinatura, _assinatura(carga)):
+            return None
+        nome_ficheiro, nome_download, expira = json.loads(carga)
+    except (ValueError, TypeError):
+        return None
+    if time.time() > expira or os.path.basename(nome_ficheiro) != nome_ficheiro:
+        return None
+    return nome_ficheiro, nome_download
+
+
+def url_download(nome_ficheiro, nome_download):
+    """URL (relativo ao servidor) para o botão "Baixar". Gerar no momento do clique."""
+    return f"{CAMINHO_DOWNLOAD}/{assinar(nome_ficheiro, nome_download)}"
+
+
+def criar_servidor(app_flet, ao_arrancar=None):
+    """
+    FastAPI com a rota de downloads À FRENTE da app Flet ('app_flet' = ft.app(..., export_asgi_app=True)).
+    A FastAPI do flet_web arranca o gestor de sessões do Flet no seu 'lifespan'.
+    """
+    import flet.fastapi as flet_fastapi
+    from fastapi.responses import FileResponse, PlainTextResponse
+
+    servidor = flet_fastapi.FastAPI(on_startup=[ao_arrancar] if ao_arrancar else None)
+
+    @servidor.get(CAMINHO_DOWNLOAD + "/{token}")
+    async def descarregar(token: str):
+        dados = verificar(token)
+        if dados is None:
+            return PlainTextResponse("Link de download inválido ou expirado. Volte à aplicação e clique de novo em \"Baixar\".", status_code=403)
+        nome_ficheiro, nome_download = dados
+        caminho = os.path.join(PASTA_RELATORIOS, nome_ficheiro)
+        if not os.path.isfile(caminho):
+            return PlainTextResponse("Este relatório já não está disponível. Gere-o de novo.", status_code=404)
+        return FileResponse(
+            caminho,
+            media_type=_TIPOS_MIME.get(os.path.splitext(nome_ficheiro)[1], "application/octet-stream"),
+            filename=nome_download,
+            headers={"Cache-Control": "private, no-store"},
+        )
+
+    servidor.mount("/", app_flet)
+    return servidor
@@ -0,0 +1,415 @@
+# exportadores.py
+# (Versão v1.7 - Exportação de Relatórios em Streaming)
+# (PDF Geral: colunas com largura fixa para o seu conteúdo; só as Observações longas são Paragraph)
+# (v1.1) Todos os relatórios (Excel/PDF, Geral/Extrato) vivem aqui, como funções de módulo:
+#        o 'fila_relatorios' corre-as noutro processo. NÃO importar flet/supabase neste módulo.
+
+# Sem pandas nem DataFrame: o openpyxl em modo 'write_only' serializa cada linha
+# assim que é acrescentada.
+# (v1.5) Isso só limita a memória se os registos também chegarem um a um: no Relatório Geral
+#        chegam do ficheiro JSON Lines gravado pela sessão (fila_relatorios.gravar_linhas), e
+#        o processo que gera o relatório nunca os tem todos em memória. O processo do Flet
+#        também não: grava-os janela a janela (repositorio.iterar_relatorio_geral), por isso
+#        o pico é de uma janela (SALC_TAMANHO_JANELA), não do relatório inteiro.
+# (v1.4) Nos PDFs, as tabelas longas são 'TabelaEmBlocos' (ver tabelas_pdf.py): formatadas
+#        e paginadas aos blocos, à medida que o documento é composto.
+
+# (v1.2) Mudar sempre que o conteúdo/aspeto de algum relatório mudar:
+# faz parte da chave do cache_relatorios (os ficheiros antigos deixam de ser servidos)
+VERSAO_FORMATO = 4
+
+# (Coluna da consulta, cabeçalho no Excel) - pela ordem do relatório
+COLUNAS_EXCEL_GERAL = (
+    ('numero_nc', 'Número NC'),
+    ('pi', 'PI'),
+    ('natureza_despesa', 'ND'),
+    ('status_calculado', 'Status'),
+    ('valor_inicial', 'Valor Inicial'),
+    ('saldo_disponivel', 'Saldo Disponível'),
+    ('data_validade_empenho', 'Prazo Empenho'),
+    ('ug_gestora', 'UG Gestora'),
+    ('data_recebimento', 'Data Recebimento'),
+    ('observacao', 'Observação'),
+)
+
+_COLUNAS_DATA = {'data_validade_empenho', 'data_recebimento'}
+_COLUNAS_VALOR = {'valor_inicial', 'saldo_disponivel'}
+
+
+# Progresso reportado a cada N linhas escritas/preparadas
+PASSO_PROGRESSO = 500
+
+
+def formatar_moeda(valor):
+    try: val = float(valor); return f"R$ {val:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    except (ValueError, TypeError): return "R$ 0,00"
+
+
+def _reportar(progresso, etapa, feitas=None, total=None):
+    """'progresso(etapa, fracao)' é opcional; fracao é None quando não se sabe o total."""
+    if progresso is None:
+        return
+    fracao = (feitas / total) if (total and feitas is not None) else None
+    progresso(etapa, fracao)
+
+
+def formatar_data(valor):
+    """'2025-03-07' (ou timestamp ISO) -> '07/03/2025'. Inválido ou vazio -> None."""
+    if not valor:
+        return None
+    texto = str(valor)
+    if len(texto) < 10 or texto[4] != '-' or texto[7] != '-':
+        return None
+    return f"{texto[8:10]}/{texto[5:7]}/{texto[0:4]}"
+
+
+def _para_numero(valor):
+    try:
+        return float(valor) if valor is not None else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _linha_excel_geral(registo):
+    linha = []
+    for coluna, _ in COLUNAS_EXCEL_GERAL:
+        valor = registo.get(coluna)
+        if coluna in _COLUNAS_DATA:
+            valor = formatar_data(valor)
+        elif coluna in _COLUNAS_VALOR:
+            valor = _para_numero(valor)
+        linha.append(valor)
+    return linha
+
+
+def exportar_excel_geral(registos, destino, filtros=None, progresso=None):
+    """
+    Escreve o Relatório Geral (.xlsx) em 'destino' (caminho ou ficheiro binário aberto).
+    'registos' pode ser qualquer iterável de dicts (lista, LinhasEmFicheiro...):
+    é percorrido uma única vez e nenhuma linha fica guardada depois de escrita.
+    Devolve o nº de linhas escritas.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    total_esperado = len(registos) if hasattr(registos, '__len__') else None
+
+    livro = Workbook(write_only=True)
+    folha = livro.create_sheet("Sheet1")
+
+    negrito = Font(bold=True)
+    cabecalho = []
+    for _, titulo in COLUNAS_EXCEL_GERAL:
+        celula = WriteOnlyCell(folha, value=titulo)
+        celula.font = negrito
+        cabecalho.append(celula)
+    folha.append(cabecalho)
+
+    total = 0
+    for registo in registos:
+        folha.append(_linha_excel_geral(registo))
+        total += 1
+        if total % PASSO_PROGRESSO == 0:
+            _reportar(progresso, "A escrever linhas", total, total_esperado)
+
+    _reportar(progresso, "A gravar o ficheiro")
+    livro.save(destino)
+    return total
+
+
+# --- (v1.1) PDF e Extratos (antes em RelatoriosView._gerar_bytes_do_relatorio) ---
+
+def descrever_filtros(filtros):
+    """Linha 'Filtros Aplicados: ...' do PDF Geral ('filtros' com as chaves de iterar_relatorio_geral)."""
+    filtros_str = "Filtros Aplicados: "
+    if filtros.get('data_inicio'): filtros_str += f"Data Rec. Início: {filtros['data_inicio']}, "
+    if filtros.get('data_fim'): filtros_str += f"Data Rec. Fim: {filtros['data_fim']}, "
+    if filtros.get('pi'): filtros_str += f"PI: {filtros['pi']}, "
+    if filtros.get('nd'): filtros_str += f"ND: {filtros['nd']}, "
+    if filtros.get('status'): filtros_str += f"Status: {filtros['status']}"
+    if filtros_str == "Filtros Aplicados: ": filtros_str += "Nenhum"
+    return filtros_str
+
+
+def _estilos_pdf():
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
+
+    styles = getSampleStyleSheet()
+    style_normal = styles['Normal']; style_normal.alignment = TA_LEFT; style_normal.fontSize = 8
+    style_title = styles['Heading1']; style_title.alignment = TA_CENTER
+    return {
+        'styles': styles,
+        'normal': style_normal,
+        'right': ParagraphStyle(name='Right', parent=style_normal, alignment=TA_RIGHT),
+        'header': ParagraphStyle(name='Header', parent=style_normal, alignment=TA_CENTER, fontName='Helvetica-Bold', textColor=colors.whitesmoke, fontSize=9),
+        'center': ParagraphStyle(name='Center', parent=style_normal, alignment=TA_CENTER),
+        'title': style_title,
+        'heading2': styles['Heading2'],
+    }
+
+
+def _data_pdf(valor, vazio=''):
+    return formatar_data(valor) or vazio
+
+
+# (v1.3) Colunas do PDF Geral: (coluna da consulta, cabeçalho, largura em polegadas, alinhamento)
+# (v1.7) Larguras medidas para o texto normal de cada coluna caber numa linha (Helvetica 8):
+#        qualquer PI de 11 caracteres, 'Cancelada', 'R$ 99.999.999,99'... Só a Observação parte em linhas.
+#        Cabeçalhos em texto simples ('\n' onde não cabem numa linha), não Paragraphs.
+COLUNAS_PDF_GERAL = (
+    ('numero_nc', 'Número NC', 1.0, 'CENTER'),
+    ('pi', 'PI', 1.35, 'CENTER'),
+    ('natureza_despesa', 'ND', 0.6, 'CENTER'),
+    ('status_calculado', 'Status', 0.75, 'CENTER'),
+    ('valor_inicial', 'Valor Inicial', 1.1, 'RIGHT'),
+    ('saldo_disponivel', 'Saldo', 1.1, 'RIGHT'),
+    ('data_validade_empenho', 'Prazo\nEmpenho', 0.8, 'CENTER'),
+    ('ug_gestora', 'UG\nGestora', 0.6, 'CENTER'),
+    ('data_recebimento', 'Data\nReceb.', 0.8, 'CENTER'),
+    ('observacao', 'Observação', 1.9, 'LEFT'),
+)
+
+# (v1.7) Colunas de texto curto cujo conteúdo é cortado (com '…') se, fora do normal, não couber
+_COLUNAS_CORTADAS = {'numero_nc', 'pi', 'natureza_despesa', 'status_calculado', 'ug_gestora'}
+
+
+def formatar_moedas(serie):
+    """
+    (v1.3) Coluna inteira (pandas.Series) -> 'R$ 1.234,56'; inválido/vazio -> 'R$ 0,00'.
+    (v1.7) Em cêntimos inteiros (numpy) e operações de texto sobre a coluna (pandas '.str'),
+    sem 'format' célula a célula. Os valores vêm da BD com 2 casas: 'x * 100' é exato.
+    """
+    import numpy as np
+    import pandas as pd
+
+    numeros = pd.to_numeric(serie, errors='coerce').astype('float64')
+    numeros = numeros.where(np.isfinite(numeros), 0.0)
+    centimos = pd.Series(np.rint(numeros.to_numpy() * 100).astype('int64'), index=serie.index)
+    digitos = centimos.abs().astype(str).str.zfill(3)
+    inteiros = digitos.str[:-2].str.replace(r'\B(?=(\d{3})+$)', '.', regex=True)
+    sinais = centimos.lt(0).map({True: '-', False: ''})
+    return "R$ " + sinais + inteiros + "," + digitos.str[-2:]
+
+
+def formatar_datas(serie):
+    """(v1.3) Coluna inteira de datas ISO -> 'dd/mm/aaaa'; inválido/vazio -> ''."""
+    import pandas as pd
+    datas = pd.to_datetime(serie.astype("string").str.slice(0, 10), format="%Y-%m-%d", errors='coerce')
+    return datas.dt.strftime('%d/%m/%Y').fillna('')
+
+
+def _cortar_a_largura(textos, largura):
+    """
+    (v1.7) Coluna de strings -> a mesma coluna, com os textos que não cabem numa linha da
+    célula cortados (terminam em '…'). Cada texto distinto é medido uma vez.
+    """
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    largura_util = largura * 72 - 12  # Menos o padding (6 pt de cada lado)
+    cortados = {}
+    for texto in textos.unique():
+        if stringWidth(texto, 'Helvetica', 8) <= largura_util:
+            continue
+        corte = texto
+        while corte and stringWidth(corte + '…', 'Helvetica', 8) > largura_util:
+            corte = corte[:-1]
+        cortados[texto] = corte + '…'
+    return textos.replace(cortados) if cortados else textos
+
+
+def _linhas_pdf_geral(registos, estilo_observacao):
+    """
+    (v1.3) Formata as linhas do PDF Geral coluna a coluna (pandas), em vez de célula a célula.
+    Só as Observações que não cabem numa linha são Paragraphs; o resto são strings
+    simples, que o ReportLab desenha sem medir/partir texto.
+    (v1.7) As outras colunas têm largura para o seu conteúdo normal; o que exceder é cortado.
+    """
+    import pandas as pd
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+    from reportlab.platypus import Paragraph
+
+    colunas = [coluna for coluna, _, _, _ in COLUNAS_PDF_GERAL]
+    larguras = {coluna: largura for coluna, _, largura, _ in COLUNAS_PDF_GERAL}
+    tabela = pd.DataFrame.from_records(list(registos), columns=colunas)
+    formatadas = {}
+    for coluna in colunas:
+        if coluna in _COLUNAS_VALOR:
+            formatadas[coluna] = formatar_moedas(tabela[coluna])
+        elif coluna in _COLUNAS_DATA:
+            formatadas[coluna] = formatar_datas(tabela[coluna])
+        else:
+            formatadas[coluna] = tabela[coluna].fillna('').astype(str)
+        if coluna in _COLUNAS_CORTADAS:
+            formatadas[coluna] = _cortar_a_largura(formatadas[coluna], larguras[coluna])
+    # Observações que cabem numa linha também ficam como string (a maioria): só as longas
+    # pagam o custo de um Paragraph (medir e partir em linhas)
+    largura_util = larguras['observacao'] * 72 - 12
+    formatadas['observacao'] = [
+        texto if stringWidth(texto, 'Helvetica', 8) <= largura_util else Paragraph(texto, estilo_observacao)
+        for texto in formatadas['observacao']
+    ]
+    return [list(linha) for linha in zip(*(formatadas[coluna] for coluna in colunas))]
+
+
+def exportar_pdf_geral(registos, destino, filtros=None, progresso=None):
+    """
+    Relatório Geral de NCs em PDF (paisagem). Devolve o nº de linhas.
+    (v1.5) 'registos' (com len: lista ou LinhasEmFicheiro) é percorrido uma vez, aos blocos.
+    (v1.7) Meta: alguns milhares de NCs bem abaixo de 1 s (ver benchmark_relatorios.py).
+    """
+    from reportlab.lib.pagesizes import letter, landscape
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+    from reportlab.lib import colors
+    from tabelas_pdf import TabelaEmBlocos
+
+    estilos = _estilos_pdf()
+
+    doc = SimpleDocTemplate(destino, pagesize=landscape(letter)); story = []
+    story.append(Paragraph("Relatório Geral de Notas de Crédito", estilos['title'])); story.append(Spacer(1, 0.2*inch))
+    story.append(Paragraph(descrever_filtros(filtros or {}), estilos['styles']['Normal'])); story.append(Spacer(1, 0.2*inch))
+
+    # (v1.7) Cabeçalho em texto simples (repete-se em todas as páginas: Paragraphs eram medidos em cada uma)
+    header = [titulo for _, titulo, _, _ in COLUNAS_PDF_GERAL]
+    col_widths = [largura*inch for _, _, largura, _ in COLUNAS_PDF_GERAL]
+
+    style = [ ('BACKGROUND', (0, 0), (-1, 0), colors.grey), ('VALIGN', (0, 0), (-1, -1), 'TOP'), ('GRID', (0, 0), (-1, -1), 1, colors.black), ('BACKGROUND', (0, 1), (-1, -1), colors.beige), ]
+    # (v1.3) Células de texto simples: mesma letra/tamanho dos Paragraphs que substituem
+    style.append(('FONTNAME', (0, 1), (-1, -1), 'Helvetica'))
+    style.append(('FONTSIZE', (0, 1), (-1, -1), 8))
+    style.append(('LEADING', (0, 1), (-1, -1), 12))
+    style.append(('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'))
+    style.append(('FONTSIZE', (0, 0), (-1, 0), 9))
+    style.append(('LEADING', (0, 0), (-1, 0), 11))
+    style.append(('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke))
+    style.append(('ALIGN', (0, 0), (-1, 0), 'CENTER'))
+    style.append(('VALIGN', (0, 0), (-1, 0), 'MIDDLE'))
+    for indice, (_, _, _, alinhamento) in enumerate(COLUNAS_PDF_GERAL):
+        style.append(('ALIGN', (indice, 1), (indice, -1), alinhamento))
+
+    # (v1.4) As linhas só são formatadas (aos blocos) quando a página delas é composta
+    total = len(registos)
+    story.append(TabelaEmBlocos(
+        header, registos, col_widths, style,
+        formatar_bloco=lambda bloco: _linhas_pdf_geral(bloco, estilos['normal']),
+        ao_avancar=lambda feitas: _reportar(progresso, "A compor as páginas", feitas, total),
+    ))
+
+    _reportar(progresso, "A compor as páginas", 0, total)
+    doc.build(story)
+    return total
+
+
+def exportar_excel_extrato(dados, destino, filtros=None, progresso=None):
+    """Extrato de uma NC em Excel (folhas: NC, NEs, Recolhimentos)."""
+    import pandas as pd
+
+    df_nc = pd.DataFrame([dados['nc']])
+    df_nc = df_nc.rename(columns={ 'numero_nc': 'Número NC', 'pi': 'PI', 'natureza_despesa': 'ND', 'valor_inicial': 'Valor Inicial', 'data_validade_empenho': 'Prazo Empenho', 'ug_gestora': 'UG Gestora', 'data_recebimento': 'Data Recebimento', 'ptres':'PTRES', 'fonte':'Fonte', 'observacao': 'Observação' })
+    df_nc = df_nc[['Número NC', 'PI', 'ND', 'Valor Inicial', 'Prazo Empenho', 'Data Recebimento', 'UG Gestora', 'PTRES', 'Fonte', 'Observação']]
+    if 'Data Recebimento' in df_nc.columns: df_nc['Data Recebimento'] = pd.to_datetime(df_nc['Data Recebimento'], errors='coerce').dt.strftime('%d/%m/%Y')
+    if 'Prazo Empenho' in df_nc.columns: df_nc['Prazo Empenho'] = pd.to_datetime(df_nc['Prazo Empenho'], errors='coerce').dt.strftime('%d/%m/%Y')
+
+    df_nes = pd.DataFrame(dados['nes'])
+    if not df_nes.empty:
+        df_nes = df_nes.rename(columns={'numero_ne': 'Número NE', 'data_empenho': 'Data Empenho', 'valor_empenhado': 'Valor Empenhado', 'descricao':'Descrição'})
+        df_nes = df_nes[['Número NE', 'Data Empenho', 'Valor Empenhado', 'Descrição']]
+        if 'Data Empenho' in df_nes.columns: df_nes['Data Empenho'] = pd.to_datetime(df_nes['Data Empenho'], errors='coerce').dt.strftime('%d/%m/%Y')
+        if 'Valor Empenhado' in df_nes.columns: df_nes['Valor Empenhado'] = pd.to_numeric(df_nes['Valor Empenhado'], errors='coerce')
+    else: df_nes = pd.DataFrame([{" ": "Nenhum empenho registado."}])
+
+    df_recolhimentos = pd.DataFrame(dados['recolhimentos'])
+    if not df_recolhimentos.empty:
+        df_recolhimentos = df_recolhimentos.rename(columns={'data_recolhimento': 'Data Recolhimento', 'valor_recolhido': 'Valor Recolhido', 'descricao':'Descrição'})
+        df_recolhimentos = df_recolhimentos[['Data Recolhimento', 'Valor Recolhido', 'Descrição']]
+        if 'Data Recolhimento' in df_recolhimentos.columns: df_recolhimentos['Data Recolhimento'] = pd.to_datetime(df_recolhimentos['Data Recolhimento'], errors='coerce').dt.strftime('%d/%m/%Y')
+        if 'Valor Recolhido' in df_recolhimentos.columns: df_recolhimentos['Valor Recolhido'] = pd.to_numeric(df_recolhimentos['Valor Recolhido'], errors='coerce')
+    else: df_recolhimentos = pd.DataFrame([{" ": "Nenhum recolhimento registado."}])
+
+    _reportar(progresso, "A gravar o ficheiro")
+    with pd.ExcelWriter(destino, engine='openpyxl') as writer:
+        df_nc.to_excel(writer, sheet_name='Dados da NC', index=False)
+        df_nes.to_excel(writer, sheet_name='Notas de Empenho', index=False)
+        df_recolhimentos.to_excel(writer, sheet_name='Recolhimentos', index=False)
+    return len(dados['nes']) + len(dados['recolhimentos'])
+
+
+def exportar_pdf_extrato(dados, destino, filtros=None, progresso=None):
+    """Extrato de uma NC em PDF (dados da NC, NEs e recolhimentos)."""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+    from reportlab.lib import colors
+    from tabelas_pdf import TabelaEmBlocos
+
+    estilos = _estilos_pdf()
+    styles = estilos['styles']
+    style_normal, style_right, style_center = estilos['normal'], estilos['right'], estilos['center']
+    style_header, style_heading2 = estilos['header'], estilos['heading2']
+
+    doc = SimpleDocTemplate(destino, pagesize=letter); story = []
+
+    nc = dados['nc']
+
+    story.append(Paragraph(f"Extrato da Nota de Crédito: {nc.get('numero_nc', '')}", estilos['title'])); story.append(Spacer(1, 0.1*inch))
+    story.append(Paragraph(f"PI: {nc.get('pi', '')} | ND: {nc.get('natureza_despesa', '')}", styles['Normal']))
+    story.append(Paragraph(f"Valor Inicial: {formatar_moeda(nc.get('valor_inicial'))} | Prazo Empenho: {_data_pdf(nc.get('data_validade_empenho'))}", styles['Normal']))
+    story.append(Paragraph(f"Data Recebimento: {_data_pdf(nc.get('data_recebimento'))} | UG Gestora: {nc.get('ug_gestora', '')}", styles['Normal']))
+    story.append(Paragraph("Observação:", style_heading2))
+    story.append(Paragraph(nc.get('observacao', 'N/A'), styles['Normal']))
+    story.append(Spacer(1, 0.2*inch))
+
+    story.append(Paragraph("Notas de Empenho Vinculadas", style_heading2))
+    header_nes = [Paragraph(h, style_header) for h in ['Número NE', 'Data', 'Valor', 'Descrição']]
+
+    def linha_ne(ne):
+        return [
+            Paragraph(ne.get('numero_ne', ''), style_center),
+            Paragraph(_data_pdf(ne.get('data_empenho'), '??/??/????'), style_center),
+            Paragraph(formatar_moeda(ne.get('valor_empenhado')), style_right),
+            Paragraph(ne.get('descricao', ''), style_normal)
+        ]
+
+    # (v1.4) Linhas criadas aos blocos, à medida que as páginas são compostas
+    if dados['nes']:
+        linhas_nes = (linha_ne(ne) for ne in dados['nes'])
+    else:
+        linhas_nes = [[Paragraph("Nenhum empenho registado.", style_normal), "", "", ""]]
+
+    style_nes = [('BACKGROUND', (0, 0), (-1, 0), colors.darkblue), ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke), ('VALIGN', (0, 0), (-1, -1), 'TOP'), ('GRID', (0, 0), (-1, -1), 1, colors.black), ('BACKGROUND', (0, 1), (-1, -1), colors.lightblue),]
+    story.append(TabelaEmBlocos(header_nes, linhas_nes, [1.5*inch, 0.8*inch, 1.2*inch, 4*inch], style_nes)); story.append(Spacer(1, 0.2*inch))
+
+    story.append(Paragraph("Recolhimentos de Saldo Vinculados", style_heading2))
+    header_rec = [Paragraph(h, style_header) for h in ['Data', 'Valor Recolhido', 'Descrição']]
+
+    def linha_rec(rec):
+        return [
+            Paragraph(_data_pdf(rec.get('data_recolhimento'), '??/??/????'), style_center),
+            Paragraph(formatar_moeda(rec.get('valor_recolhido')), style_right),
+            Paragraph(rec.get('descricao', ''), style_normal)
+        ]
+
+    if dados['recolhimentos']:
+        linhas_rec = (linha_rec(rec) for rec in dados['recolhimentos'])
+    else:
+        linhas_rec = [[Paragraph("Nenhum recolhimento registado.", style_normal), "", ""]]
+
+    style_rec = [('BACKGROUND', (0, 0), (-1, 0), colors.darkorange), ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke), ('VALIGN', (0, 0), (-1, -1), 'TOP'), ('GRID', (0, 0), (-1, -1), 1, colors.black), ('BACKGROUND', (0, 1), (-1, -1), colors.lightyellow),]
+    story.append(TabelaEmBlocos(header_rec, linhas_rec, [1*inch, 1.5*inch, 5*inch], style_rec))
+
+    _reportar(progresso, "A compor as páginas")
+    doc.build(story)
+    return len(dados['nes']) + len(dados['recolhimentos'])
+
+
+# Tipo de relatório (como em RelatoriosView) -> exportador
+# Todos têm a assinatura (dados, destino, filtros=None, progresso=None)
+EXPORTADORES = {
+    "excel_geral": exportar_excel_geral,
+    "pdf_geral": exportar_pdf_geral,
+    "excel_extrato": exportar_excel_extrato,
+    "pdf_extrato": exportar_pdf_extrato,
+}
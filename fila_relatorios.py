@@ -0,0 +1,185 @@
+# fila_relatorios.py
+# (Versão v1.1 - Geração de Relatórios Fora do Processo)
+# (ReportLab/openpyxl correm num pool de processos limitado, com fila finita e progresso por trabalho)
+# (v1.1) Processos criados por 'forkserver' (sem reimportar o main.py); linhas passadas num ficheiro
+
+# Gerar um PDF/Excel grande é trabalho de CPU. Numa thread do servidor Flet, segura o GIL
+# e atrasa TODAS as sessões; num processo do pool, as outras sessões nem dão por isso.
+#   - SALC_RELATORIOS_PROCESSOS: relatórios gerados em simultâneo (0 = sem pool, numa thread);
+#   - SALC_RELATORIOS_FILA: máximo de relatórios em curso + à espera; acima disso, 'FilaCheia'.
+# O pool (e o gestor que transporta o progresso) só arranca no 1º relatório.
+# (v1.1) Com 'spawn', cada processo do pool reimportava o main.py (como '__mp_main__'), e com
+#        ele o Flet, o Supabase e o resto da app. Com 'forkserver', os processos nascem de um
+#        servidor que só importou os exportadores. ('spawn' fica para onde não há forkserver:
+#        Windows.) As linhas do relatório também já não vão no pedido (pickle da lista inteira):
+#        são gravadas num ficheiro JSON Lines ao lado do destino, e o processo lê-as uma a uma.
+
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import exportadores
+
+PROCESSOS_RELATORIOS = int(os.environ.get("SALC_RELATORIOS_PROCESSOS", "2"))
+MAX_TRABALHOS_NA_FILA = int(os.environ.get("SALC_RELATORIOS_FILA", "8"))
+
+
+# Módulos carregados UMA vez no forkserver (cada processo do pool já nasce com eles)
+MODULOS_PRE_CARREGADOS = ["exportadores", "tabelas_pdf"]
+
+
+class FilaCheia(Exception):
+    """Já há demasiados relatórios em curso/à espera: tentar de novo mais tarde."""
+
+
+class LinhasEmFicheiro:
+    """
+    (v1.1) Registos (dicts) gravados em JSON Lines: é isto, e não a lista, que vai para o
+    processo do pool (só o caminho e o total). Percorrido uma vez, uma linha de cada vez.
+    """
+
+    def __init__(self, caminho, total):
+        self.caminho = caminho
+        self.total = total
+
+    def __len__(self):
+        return self.total
+
+    def __iter__(self):
+        with open(self.caminho, encoding="utf-8") as ficheiro:
+            for linha in ficheiro:
+                yield json.loads(linha)
+
+
+def _escrever_linhas(ficheiro, registos):
+    for registo in registos:
+        ficheiro.write(json.dumps(registo, default=str, ensure_ascii=False))
+        ficheiro.write("\n")
+    return len(registos)
+
+
+async def gravar_linhas(caminho, registos):
+    """
+    (v1.1) Grava 'registos' (lista, ou iterável assíncrono de listas: ex. as janelas de
+    'leitura_paginada') em 'caminho' e devolve o LinhasEmFicheiro correspondente.
+    A escrita corre numa thread (fora do loop do Flet), janela a janela.
+    """
+    total = 0
+    with open(caminho, "w", encoding="utf-8") as ficheiro:
+        if hasattr(registos, "__aiter__"):
+            async for lote in registos:
+                total += await asyncio.to_thread(_escrever_linhas, ficheiro, lote)
+        else:
+            total = await asyncio.to_thread(_escrever_linhas, ficheiro, registos)
+    return LinhasEmFicheiro(caminho, total)
+
+
+def _gerar_no_processo(tipo, dados, destino, filtros, fila_progresso, id_trabalho):
+    """Corre NUM PROCESSO DO POOL: escreve o relatório em 'destino' e devolve o nº de linhas."""
+    def progresso(etapa, fracao):
+        try:
+            fila_progresso.put_nowait((id_trabalho, etapa, fracao))
+        except Exception:
+            pass  # O progresso é só informativo: nunca faz falhar o relatório
+
+    progresso("A gerar", None)
+    return exportadores.EXPORTADORES[tipo](dados, destino, filtros=filtros, progresso=progresso)
+
+
+class FilaRelatorios:
+    """
+    Fila (limitada) de geração de relatórios, partilhada por todas as sessões do processo.
+    'executar' é assíncrono: a sessão espera pelo resultado sem bloquear o loop do Flet, e
+    'ao_progresso(etapa, fracao)' é chamado (a partir de uma thread) à medida que o trabalho avança.
+    """
+
+    def __init__(self, processos=PROCESSOS_RELATORIOS, max_na_fila=MAX_TRABALHOS_NA_FILA):
+        self.processos = processos
+        self.max_na_fila = max_na_fila
+        self._pool = None
+        self._gestor = None  # Mantém vivo o processo do Manager (e a fila de progresso)
+        self._fila_progresso = None
+        self._ouvintes = {}  # id_trabalho -> ao_progresso
+        self._ids = itertools.count(1)
+        self._em_curso = 0
+        self._lock = threading.Lock()
+
+    def _obter_pool(self):
+        """
+        Cria o pool no 1º uso. 'forkserver'/'spawn': os processos não herdam as threads/sockets
+        do servidor Flet. (v1.1) 'forkserver' sempre que existe (não reimporta o main.py).
+        """
+        with self._lock:
+            if self._pool is None:
+                if "forkserver" in multiprocessing.get_all_start_methods():
+                    contexto = multiprocessing.get_context("forkserver")
+                    contexto.set_forkserver_preload(MODULOS_PRE_CARREGADOS)
+                else:
+                    contexto = multiprocessing.get_context("spawn")
+                if self._gestor is None:
+                    self._gestor = contexto.Manager()
+                    self._fila_progresso = self._gestor.Queue()
+                    threading.Thread(target=self._distribuir_progresso, name="fila-relatorios-progresso", daemon=True).start()
+                self._pool = ProcessPoolExecutor(max_workers=self.processos, mp_context=contexto)
+                print(f"FilaRelatorios: Pool iniciado ({self.processos} processo(s), fila máx. {self.max_na_fila}).")
+            return self._pool
+
+    def _distribuir_progresso(self):
+        while True:
+            try:
+                id_trabalho, etapa, fracao = self._fila_progresso.get()
+            except Exception:
+                return  # O gestor terminou (fim do processo)
+            ouvinte = self._ouvintes.get(id_trabalho)
+            if ouvinte is None:
+                continue
+            try:
+                ouvinte(etapa, fracao)
+            except Exception as ex:
+                print(f"FilaRelatorios: Erro ao mostrar progresso: {ex}")
+
+    async def executar(self, tipo, dados, destino, filtros=None, ao_progresso=None):
+        """
+        Gera o relatório 'tipo' (ver exportadores.EXPORTADORES) em 'destino'. Devolve o nº de linhas.
+        (v1.1) 'dados' pode ser um LinhasEmFicheiro (ver 'gravar_linhas'): o processo lê o ficheiro.
+        """
+        with self._lock:
+            if self._em_curso >= self.max_na_fila:
+                raise FilaCheia("Há demasiados relatórios a ser gerados neste momento. Tente de novo dentro de instantes.")
+            self._em_curso += 1
+            a_frente = self._em_curso - 1
+
+        id_trabalho = next(self._ids)
+        pool = None
+        try:
+            if self.processos <= 0:
+                return await asyncio.to_thread(
+                    exportadores.EXPORTADORES[tipo], dados, destino, filtros=filtros, progresso=ao_progresso,
+                )
+            # Arrancar o pool demora (novos processos): fora do loop do Flet
+            pool = await asyncio.to_thread(self._obter_pool)
+            if ao_progresso:
+                self._ouvintes[id_trabalho] = ao_progresso
+                if a_frente >= self.processos:
+                    ao_progresso(f"À espera de vez ({a_frente} relatório(s) à frente)", None)
+            futuro = pool.submit(_gerar_no_processo, tipo, dados, destino, filtros, self._fila_progresso, id_trabalho)
+            return await asyncio.wrap_future(futuro)
+        except BrokenProcessPool:
+            # Um processo morreu (ex: falta de memória): o próximo relatório cria um pool novo
+            with self._lock:
+                if self._pool is pool:
+                    self._pool = None
+            raise
+        finally:
+            self._ouvintes.pop(id_trabalho, None)
+            with self._lock:
+                self._em_curso -= 1
+
+
+# Instância única do processo
+fila_relatorios = FilaRelatorios()
@@ -0,0 +1,18 @@
+# iniciar.py
+# (Versão v1.0 - Ponto de Entrada do Servidor)
+# (Arranque: 'python iniciar.py'. Leve de importar: os processos do pool de relatórios reimportam-no)
+
+# O multiprocessing reimporta o script de arranque ('__main__') em cada processo filho, como
+# '__mp_main__', tanto com 'spawn' como com 'forkserver'. Arrancada por 'python main.py', cada
+# processo do pool de relatórios (fila_relatorios.py) importava o Flet, o Supabase e a app
+# inteira só para gerar um PDF. Aqui, a app só é importada dentro do bloco '__main__',
+# que os processos filhos não correm. ('python main.py' continua a funcionar.)
+
+import multiprocessing
+
+if __name__ == "__main__":
+    # Num executável congelado, os processos filhos têm de parar aqui
+    multiprocessing.freeze_support()
+
+    from main import arrancar_servidor
+    arrancar_servidor()
@@ -0,0 +1,100 @@
+# leitura_paginada.py
+# (Versão v1.1 - Leitura por Janelas)
+# (Lê consultas grandes em janelas de 'offset/limit' para não serem cortadas pelo 'max-rows' do PostgREST)
+
+# O PostgREST corta SEM AVISO qualquer resposta com mais linhas do que o seu 'max-rows'
+# (1000 por omissão no Supabase). Um '.execute()' único num relatório anual devolve
+# só as primeiras 1000 NCs - e parece um relatório válido.
+#
+# Aqui a consulta é lida em janelas ('.range(inicio, fim)'):
+#   - a 1ª janela pede também o total ('count=exact'), para saber quando parar;
+#   - o 'inicio' da janela seguinte avança pelo nº de linhas RECEBIDAS (não pelo pedido),
+#     por isso um 'max-rows' menor do que a janela não salta linhas;
+#   - a versão assíncrona já pede a janela seguinte enquanto quem chama processa a atual.
+#
+# 'construir_query(count)' tem de devolver um builder NOVO a cada chamada (os builders
+# do postgrest são mutáveis) com a ordenação já aplicada, terminada numa coluna única
+# (ex: '.order("id")'), para que as janelas não se sobreponham nem deixem buracos.
+
+import asyncio
+import os
+
+# Linhas pedidas por janela (não deve exceder o 'max-rows' do PostgREST)
+TAMANHO_JANELA = int(os.environ.get("SALC_TAMANHO_JANELA", "1000"))
+
+
+def _fim(inicio, tamanho):
+    return inicio + tamanho - 1
+
+
+def _terminou(inicio, total, lote):
+    """Sem total conhecido, só uma janela vazia indica o fim."""
+    if not lote:
+        return True
+    return total is not None and inicio >= total
+
+
+def iterar_janelas(construir_query, tamanho=TAMANHO_JANELA):
+    """
+    Gerador (síncrono) das linhas da consulta, janela a janela: cada 'yield' é uma lista.
+    Para os loaders que correm em threads (ver 'ler_tudo': cache_global, armazem_ncs).
+    """
+    resposta = construir_query(count="exact").range(0, _fim(0, tamanho)).execute()
+    total, lote = resposta.count, resposta.data or []
+    inicio = len(lote)
+    while True:
+        if lote:
+            yield lote
+        if _terminou(inicio, total, lote):
+            return
+        lote = construir_query(count=None).range(inicio, _fim(inicio, tamanho)).execute().data or []
+        inicio += len(lote)
+
+
+async def iterar_janelas_async(construir_query, tamanho=TAMANHO_JANELA, pre_carregar=True):
+    """
+    Gerador assíncrono das linhas da consulta, janela a janela ('async for lote in ...').
+    (v1.1) Usado diretamente pelo Relatório Geral (repositorio.iterar_relatorio_geral).
+    Com 'pre_carregar', o pedido da janela seguinte parte ANTES de a atual ser entregue:
+    o tempo de rede sobrepõe-se ao processamento de quem chama.
+    """
+    async def _pedir(inicio):
+        resposta = await construir_query(count=None).range(inicio, _fim(inicio, tamanho)).execute()
+        return resposta.data or []
+
+    resposta = await construir_query(count="exact").range(0, _fim(0, tamanho)).execute()
+    total, lote = resposta.count, resposta.data or []
+    inicio = len(lote)
+    seguinte = None
+    try:
+        while True:
+            acabou = _terminou(inicio, total, lote)
+            if not acabou and pre_carregar:
+                seguinte = asyncio.create_task(_pedir(inicio))
+            if lote:
+                yield lote
+            if acabou:
+                return
+            lote = await (seguinte if seguinte is not None else _pedir(inicio))
+            seguinte = None
+            inicio += len(lote)
+    finally:
+        # Quem chama parou a meio (ex: exceção, 'break'): não deixa pedidos órfãos
+        if seguinte is not None and not seguinte.done():
+            seguinte.cancel()
+
+
+async def ler_tudo_async(construir_query, tamanho=TAMANHO_JANELA):
+    """Todas as linhas da consulta numa lista (conveniência sobre 'iterar_janelas_async')."""
+    linhas = []
+    async for lote in iterar_janelas_async(construir_query, tamanho):
+        linhas.extend(lote)
+    return linhas
+
+
+def ler_tudo(construir_query, tamanho=TAMANHO_JANELA):
+    """Versão síncrona de 'ler_tudo_async'."""
+    linhas = []
+    for lote in iterar_janelas(construir_query, tamanho):
+        linhas.extend(lote)
+    return linhas
@@ -0,0 +1,176 @@
+# limpeza_ficheiros.py
+# (Versão v1.1 - Limpeza de Relatórios e Uploads)
+# (Relatórios gerados e PDFs do SIAFI carregados deixam de se acumular no disco para sempre)
+
+# Uma thread de fundo aplica a cada pasta uma regra de retenção:
+#   1. apaga os ficheiros mais velhos do que 'idade_maxima' (pelo mtime: o cache_relatorios
+#      atualiza-o sempre que um relatório é reutilizado, por isso mtime = último uso);
+#   2. se a pasta continuar acima de 'tamanho_maximo', apaga os menos usados (LRU) até caber.
+# Ficheiros com menos de PERIODO_DE_GRACA_SEGUNDOS nunca são apagados por tamanho (o utilizador
+# ainda não carregou em "Baixar"), nem os que estejam protegidos (ex: um upload a ser lido).
+# Só são tocados ficheiros com as extensões da regra: o resto de assets/ (ícones...) fica.
+
+import os
+import threading
+import time
+
+MB = 1024 * 1024
+
+# Entre passagens da limpeza (segundos); 'pedir_limpeza' antecipa a próxima
+INTERVALO_LIMPEZA_SEGUNDOS = int(os.environ.get("SALC_LIMPEZA_INTERVALO", "600"))
+
+PERIODO_DE_GRACA_SEGUNDOS = 300
+
+
+class RegraRetencao:
+    def __init__(self, idade_maxima_horas, tamanho_maximo_mb, extensoes=None):
+        self.idade_maxima = idade_maxima_horas * 3600
+        self.tamanho_maximo = tamanho_maximo_mb * MB
+        self.extensoes = tuple(extensoes) if extensoes else None
+
+    def abrange(self, nome):
+        return self.extensoes is None or nome.lower().endswith(self.extensoes)
+
+
+EXTENSOES_RELATORIOS = (".pdf", ".xlsx", ".parcial")
+
+# (v1.1) Pasta privada dos relatórios (cache_relatorios): registada com 'vigiar'
+REGRA_RELATORIOS = RegraRetencao(
+    idade_maxima_horas=float(os.environ.get("SALC_RELATORIOS_IDADE_MAX_HORAS", "24")),
+    tamanho_maximo_mb=float(os.environ.get("SALC_RELATORIOS_MAX_MB", "500")),
+    extensoes=EXTENSOES_RELATORIOS,
+)
+
+REGRAS = {
+    # (v1.1) Já não recebe relatórios novos (ver downloads.py): só escoa os antigos
+    "assets": RegraRetencao(
+        idade_maxima_horas=float(os.environ.get("SALC_ASSETS_IDADE_MAX_HORAS", "24")),
+        tamanho_maximo_mb=float(os.environ.get("SALC_ASSETS_MAX_MB", "500")),
+        extensoes=EXTENSOES_RELATORIOS,
+    ),
+    "uploads": RegraRetencao(
+        idade_maxima_horas=float(os.environ.get("SALC_UPLOADS_IDADE_MAX_HORAS", "1")),
+        tamanho_maximo_mb=float(os.environ.get("SALC_UPLOADS_MAX_MB", "100")),
+    ),
+}
+
+
+class ZeladorFicheiros:
+    """Aplica as REGRAS às pastas, numa thread de fundo, e conta os bytes recuperados."""
+
+    def __init__(self, regras=REGRAS, intervalo=INTERVALO_LIMPEZA_SEGUNDOS):
+        self.regras = dict(regras)
+        self.intervalo = intervalo
+        self.bytes_recuperados = 0
+        self.ficheiros_apagados = 0
+        self._protegidos = set()
+        self._lock = threading.Lock()
+        self._acordar = threading.Event()
+        self._thread = None
+
+    def iniciar(self):
+        """Arranca a thread de limpeza (chamadas repetidas não fazem nada)."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._ciclo, name="limpeza-ficheiros", daemon=True)
+                self._thread.start()
+
+    def vigiar(self, pasta, regra):
+        """Acrescenta uma pasta (e a sua regra) às que são limpas."""
+        self.regras[pasta] = regra
+
+    def pedir_limpeza(self):
+        """Acabou de ser escrito um ficheiro: verificar as quotas já, sem esperar pelo intervalo."""
+        self._acordar.set()
+
+    def proteger(self, caminho):
+        with self._lock:
+            self._protegidos.add(os.path.abspath(caminho))
+
+    def libertar(self, caminho):
+        with self._lock:
+            self._protegidos.discard(os.path.abspath(caminho))
+
+    def descartar(self, caminho):
+        """Apaga já um ficheiro que deixou de ser preciso (ex: o PDF do SIAFI depois de lido)."""
+        self.libertar(caminho)
+        self._apagar(caminho)
+
+    def _ciclo(self):
+        while True:
+            try:
+                self.limpar_tudo()
+            except Exception as ex:
+                print(f"Limpeza: Erro na passagem de limpeza: {ex}")
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+
+    def limpar_tudo(self):
+        """Uma passagem por todas as pastas. Devolve {pasta: (ficheiros, bytes)} recuperados."""
+        resultado = {}
+        for pasta, regra in list(self.regras.items()):
+            resultado[pasta] = self.limpar_pasta(pasta, regra)
+        ficheiros = sum(n for n, _ in resultado.values())
+        if ficheiros:
+            recuperados = sum(b for _, b in resultado.values())
+            print(f"Limpeza: {ficheiros} ficheiro(s) apagado(s), {recuperados / MB:.1f} MB recuperados "
+                  f"(total desde o arranque: {self.bytes_recuperados / MB:.1f} MB).")
+        return resultado
+
+    def limpar_pasta(self, pasta, regra, agora=None):
+        if not os.path.isdir(pasta):
+            return 0, 0
+        agora = time.time() if agora is None else agora
+        with self._lock:
+            protegidos = set(self._protegidos)
+
+        ficheiros = []  # (mtime, tamanho, caminho)
+        with os.scandir(pasta) as entradas:
+            for entrada in entradas:
+                if not entrada.is_file() or not regra.abrange(entrada.name):
+                    continue
+                if os.path.abspath(entrada.path) in protegidos:
+                    continue
+                info = entrada.stat()
+                ficheiros.append((info.st_mtime, info.st_size, entrada.path))
+
+        apagados, recuperados = 0, 0
+        restantes = []
+        for mtime, tamanho, caminho in ficheiros:
+            if agora - mtime > regra.idade_maxima and self._apagar(caminho, tamanho):
+                apagados += 1
+                recuperados += tamanho
+            else:
+                restantes.append((mtime, tamanho, caminho))
+
+        # Acima da quota: os menos usados primeiro (LRU)
+        ocupado = sum(tamanho for _, tamanho, _ in restantes)
+        for mtime, tamanho, caminho in sorted(restantes):
+            if ocupado <= regra.tamanho_maximo:
+                break
+            if agora - mtime < PERIODO_DE_GRACA_SEGUNDOS or caminho.endswith(".parcial"):
+                continue
+            if self._apagar(caminho, tamanho):
+                apagados += 1
+                recuperados += tamanho
+                ocupado -= tamanho
+        return apagados, recuperados
+
+    def _apagar(self, caminho, tamanho=None):
+        try:
+            if tamanho is None:
+                tamanho = os.path.getsize(caminho)
+            os.remove(caminho)
+        except FileNotFoundError:
+            return False
+        except OSError as ex:
+            print(f"Limpeza: Não foi possível apagar '{caminho}': {ex}")
+            return False
+        with self._lock:
+            self.bytes_recuperados += tamanho
+            self.ficheiros_apagados += 1
+        return True
+
+
+# Instância única do processo
+zelador_ficheiros = ZeladorFicheiros()
@@ -1,21 +1,48 @@
 # main.py
-# (Versão Refatorada v2.2 - Performance)
-# (Corrige o callback 'on_data_changed_master' para apenas atualizar caches)
+# (Versão Refatorada v2.21 - Performance)
+# (Avisos do Realtime corridos no loop da sessão ('page.run_task'), não na thread do Timer)
 
 import flet as ft
+import asyncio
+import importlib
+import multiprocessing
 import os 
+import secrets
+import time
 import traceback 
+from concurrent.futures import ThreadPoolExecutor
 
-os.environ["FLET_SECRET_KEY"] = os.environ.get("FLET_SECRET_KEY", "chave_secreta_local_padrao_12345!")
+# (v2.19) A FLET_SECRET_KEY assina os uploads do Flet, os links de download e os nomes dos
+# relatórios: nunca uma chave fixa do código. Sem ela, uma aleatória só DESTE processo
+# (os links deixam de valer ao reiniciar e não servem entre vários processos do servidor).
+if not os.environ.get("FLET_SECRET_KEY"):
+    os.environ["FLET_SECRET_KEY"] = secrets.token_urlsafe(32)
+    print("AVISO: FLET_SECRET_KEY não definida. A usar uma chave aleatória deste processo.")
 
-from supabase_client import supabase, supabase_admin 
+from supabase_client import pool_clientes, cliente_da_sessao
 from supabase_auth.errors import AuthApiError 
+from cache_global import cache_global, marcar_dados_alterados
+from armazem_ncs import armazem_ncs
+from limpeza_ficheiros import zelador_ficheiros
+from sincronizacao_realtime import iniciar_sincronizacao, registar_ouvinte, remover_ouvinte, realtime_ligado
 
-from views.dashboard_view import create_dashboard_view
-from views.ncs_view import create_ncs_view
-from views.nes_view import create_nes_view
-from views.relatorios_view import create_relatorios_view
-from views.admin_view import create_admin_view
+# (v2.13) As views (e o que elas importam) são carregadas em '_criar_view', não aqui
+
+# (v2.6) Executor limitado para as consultas do login que podem correr em paralelo
+_executor_login = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("SALC_LOGIN_WORKERS", "8")),
+    thread_name_prefix="salc-login",
+)
+
+# (v2.12) Pré-carregar as outras abas depois do 1º ecrã (0 = só criar cada view quando for aberta)
+PRE_CARREGAR_ABAS = os.environ.get("SALC_PRE_CARREGAR_ABAS", "1") != "0"
+
+# (v2.18) Módulos das views com dados a revalidar ('revalidar'): só estas são criadas no
+# pré-carregamento. As outras (Relatórios, Administração) não têm nada para adiantar.
+VIEWS_PRE_CARREGAVEIS = ("dashboard_view", "ncs_view", "nes_view")
+
+# (v2.12) Segundos sem visitar uma aba até a sua view ser descartada (0 = nunca)
+INATIVIDADE_VIEW_SEGUNDOS = int(os.environ.get("SALC_INATIVIDADE_VIEW", "0"))
 
 class ErrorModal:
     def __init__(self, page: ft.Page):
@@ -47,33 +74,22 @@ class ErrorModal:
 
 def _load_global_caches(page: ft.Page):
     """
-    Busca todos os dados de filtro comuns UMA VEZ e armazena na sessão.
+    Garante que os dados de filtro comuns estão no cache GLOBAL do processo.
     Chamado no login.
+    (v2.4) As views leem diretamente do 'cache_global'; a sessão já não
+    guarda cópias próprias. A consulta ao Supabase só acontece se o cache
+    partilhado estiver vazio, expirado ou invalidado.
+    (v2.6) As cinco chaves são pedidas em paralelo.
+    (v2.17) Com as credenciais da sessão: a cópia partilhada é a do âmbito RLS do utilizador.
     """
-    print("A carregar caches globais (PIs, NDs, Seções, NCs)...")
+    print("A carregar caches globais (PIs, NDs, Seções, NCs, mapa PI->ND)...")
     try:
-        # 1. Buscar PIs
-        pis_data = supabase.rpc('get_distinct_pis').execute().data
-        page.session.set("cache_pis", pis_data or [])
-        print(f"Cache: {len(pis_data or [])} PIs carregados.")
-
-        # 2. Buscar NDs
-        nds_data = supabase.rpc('get_distinct_nds').execute().data
-        page.session.set("cache_nds", nds_data or [])
-        print(f"Cache: {len(nds_data or [])} NDs carregados.")
-
-        # 3. Buscar Seções (como um mapa/dict para acesso rápido)
-        secoes_resp = supabase.table('secoes').select('id, nome').execute()
-        secoes_map = {}
-        if secoes_resp.data:
-            secoes_map = {secao['id']: secao['nome'] for secao in secoes_resp.data}
-        page.session.set("cache_secoes_map", secoes_map)
-        print(f"Cache: {len(secoes_map)} Seções carregadas.")
-
-        # 4. Buscar Lista de NCs (para filtros de NE)
-        ncs_resp = supabase.table('notas_de_credito').select('id, numero_nc').order('numero_nc').execute()
-        page.session.set("cache_ncs_lista", ncs_resp.data or [])
-        print(f"Cache: {len(ncs_resp.data or [])} NCs carregadas.")
+        caches = cache_global.obter_varios(cliente_da_sessao(page))
+        print(f"Cache: {len(caches['pis'])} PIs disponíveis.")
+        print(f"Cache: {len(caches['nds'])} NDs disponíveis.")
+        print(f"Cache: {len(caches['secoes_map'])} Seções disponíveis.")
+        print(f"Cache: {len(caches['ncs_lista'])} NCs disponíveis.")
+        print(f"Cache: {len(caches['mapa_pi_nd'])} PIs no mapa PI->ND.")
         
         print("Caches globais carregados com sucesso.")
         return True
@@ -83,6 +99,43 @@ def _load_global_caches(page: ft.Page):
         traceback.print_exc()
         print("--------------------------------------------------")
         return e 
+
+
+def _buscar_funcao_utilizador(cliente, user_id):
+    """Lê a função (perfil) do utilizador. Lança exceção se não existir perfil."""
+    resposta_perfil = cliente.table('perfis_usuarios') \
+                              .select('funcao') \
+                              .eq('id_usuario', user_id) \
+                              .single() \
+                              .execute()
+    
+    if not resposta_perfil.data:
+        raise Exception("O seu utilizador autenticou, mas não tem um perfil (função) definido.")
+    return resposta_perfil.data['funcao']
+
+
+def _criar_view(modulo, fabrica, *args, **kwargs):
+    """(v2.13) Importa 'views.<modulo>' na 1ª utilização e chama a sua função 'fabrica'."""
+    return getattr(importlib.import_module(f"views.{modulo}"), fabrica)(*args, **kwargs)
+
+
+async def _pre_carregar_views(obter_views):
+    """
+    (v2.11) Carrega em segundo plano os dados das abas ainda não visitadas.
+    Cada view guarda o resultado e marca-o como fresco ('views/frescura.py').
+    (v2.12) Recebe uma função que cria as views: corre DEPOIS do 1º ecrã.
+    (v2.18) Só deve criar as de VIEWS_PRE_CARREGAVEIS (criar uma view é caro).
+    """
+    inicio = time.perf_counter()
+    views = obter_views()
+    await asyncio.gather(*(view.revalidar() for view in views), return_exceptions=True)
+    print(f"Pré-carregamento de {len(views)} aba(s) em {(time.perf_counter() - inicio) * 1000:.0f} ms.")
+
+
+def _registar_tempos_login(email, tempos):
+    """Regista no log a duração (ms) de cada fase do login."""
+    fases = " | ".join(f"{fase}: {segundos * 1000:.0f} ms" for fase, segundos in tempos.items())
+    print(f"Login {email}: {fases}")
         
 
 def main(page: ft.Page):
@@ -172,35 +225,25 @@ def main(page: ft.Page):
         def on_data_changed_master(e):
             """
             Chamado quando uma NE ou NC é salva/excluída.
-            Recarrega APENAS os caches que podem ter mudado.
+            (v2.5) Com o Realtime ligado, o próprio evento da BD atualiza o
+            cache global e as views abertas de TODAS as sessões.
+            Só invalidamos aqui se a subscrição estiver em baixo (fallback).
             """
-            print("Callback Mestre: Recarregando caches voláteis...")
-            try:
-                # Recarrega caches que MUDAM (lista de NCs)
-                ncs_resp = supabase.table('notas_de_credito').select('id, numero_nc').order('numero_nc').execute()
-                page.session.set("cache_ncs_lista", ncs_resp.data or [])
-                
-                # Recarrega PIs/NDs
-                pis_data = supabase.rpc('get_distinct_pis').execute().data
-                page.session.set("cache_pis", pis_data or [])
-                nds_data = supabase.rpc('get_distinct_nds').execute().data
-                page.session.set("cache_nds", nds_data or [])
-                
-                print("Caches voláteis atualizados após alteração.")
-            except Exception as ex:
-                print(f"Erro ao atualizar caches voláteis: {ex}")
-            
-            # NÃO chama mais 'view_dashboard.load_dashboard_data()'
-            # NÃO chama mais 'view_ncs.load_ncs_data()'
-            # A view VISÍVEL já fará isso (ex: nes_view.load_nes_data())
-            # A view invisível (ex: dashboard) carregará quando for clicada.
+            if realtime_ligado():
+                return
+            print("Callback Mestre: Realtime em baixo. A invalidar caches voláteis...")
+            cache_global.invalidar("ncs_lista", "nes_lista", "pis", "nds", "mapa_pi_nd")
+            marcar_dados_alterados()
+            armazem_ncs.invalidar()
         
-        # Cria as views
-        all_views = [
-            create_dashboard_view(page, error_modal=error_modal_global),
-            create_ncs_view(page, on_data_changed=on_data_changed_master, error_modal=error_modal_global),
-            create_nes_view(page, on_data_changed=on_data_changed_master, error_modal=error_modal_global),
-            create_relatorios_view(page, error_modal=error_modal_global)
+        # (v2.12) Fábricas das views: cada view só é criada quando é precisa
+        # (v2.18) 'modulos_views' acompanha 'fabricas_views' (índice a índice)
+        modulos_views = ["dashboard_view", "ncs_view", "nes_view", "relatorios_view"]
+        fabricas_views = [
+            lambda: _criar_view("dashboard_view", "create_dashboard_view", page, error_modal=error_modal_global),
+            lambda: _criar_view("ncs_view", "create_ncs_view", page, on_data_changed=on_data_changed_master, error_modal=error_modal_global),
+            lambda: _criar_view("nes_view", "create_nes_view", page, on_data_changed=on_data_changed_master, error_modal=error_modal_global),
+            lambda: _criar_view("relatorios_view", "create_relatorios_view", page, error_modal=error_modal_global),
         ]
         
         navigation_destinations = [
@@ -227,7 +270,8 @@ def main(page: ft.Page):
         ]
         
         if page.session.get("user_funcao") == "admin":
-            all_views.append(create_admin_view(page, error_modal=error_modal_global))
+            modulos_views.append("admin_view")
+            fabricas_views.append(lambda: _criar_view("admin_view", "create_admin_view", page, error_modal=error_modal_global))
             navigation_destinations.append(
                 ft.NavigationRailDestination(
                     icon="ADMIN_PANEL_SETTINGS_OUTLINED",
@@ -236,8 +280,40 @@ def main(page: ft.Page):
                 )
             )
 
+        views_criadas = {}        # índice -> view
+        overlays_das_views = {}   # índice -> controlos que a view pôs em page.overlay
+        saida_das_views = {}      # índice -> quando a aba deixou de estar visível
+        estado_nav = {"indice": 0}
+
+        def obter_view(indice):
+            """(v2.12) Devolve a view da aba, criando-a na 1ª vez."""
+            view = views_criadas.get(indice)
+            if view is None:
+                inicio = time.perf_counter()
+                overlay_antes = {id(controlo) for controlo in page.overlay}
+                view = fabricas_views[indice]()
+                views_criadas[indice] = view
+                overlays_das_views[indice] = [c for c in page.overlay if id(c) not in overlay_antes]
+                print(f"View {type(view).__name__} criada em {(time.perf_counter() - inicio) * 1000:.0f} ms.")
+            return view
+
+        def descartar_views_inativas():
+            """(v2.12) Liberta as views (e os seus modais) das abas não visitadas há muito tempo."""
+            if not INATIVIDADE_VIEW_SEGUNDOS:
+                return
+            agora = time.monotonic()
+            for indice in list(views_criadas):
+                saida = saida_das_views.get(indice)
+                if indice == estado_nav["indice"] or saida is None or agora - saida < INATIVIDADE_VIEW_SEGUNDOS:
+                    continue
+                view = views_criadas.pop(indice)
+                for controlo in overlays_das_views.pop(indice, []):
+                    if controlo in page.overlay:
+                        page.overlay.remove(controlo)
+                print(f"View {type(view).__name__} descartada por inatividade.")
+
         view_container = ft.Container(
-            content=all_views[0], 
+            content=obter_view(0), 
             expand=True,
             padding=20, 
             alignment=ft.alignment.top_left
@@ -245,13 +321,34 @@ def main(page: ft.Page):
         
         def switch_view(e):
             index = e.control.selected_index
-            view_container.content = all_views[index]
+            saida_das_views[estado_nav["indice"]] = time.monotonic()
+            estado_nav["indice"] = index
+            view_container.content = obter_view(index)
+            descartar_views_inativas()
             
             # O Flet irá chamar o 'on_mount' da view automaticamente
             # DEPOIS que a linha 'view_container.update()' for executada.
             
             view_container.update()
         # --- (FIM DA CORREÇÃO v2.2) ---
+
+        # --- (v2.5) Realtime: avisa a view VISÍVEL das alterações feitas por qualquer sessão ---
+        # (v2.11) As invisíveis ficam marcadas como desatualizadas e revalidam no próximo 'on_mount'.
+        # (v2.21) Assíncrono: o sincronizacao_realtime agenda-o no loop desta sessão ('page.run_task'),
+        #         depois de reler os caches afetados (uma vez por âmbito, não por sessão).
+        async def on_realtime_change(tabelas):
+            view_ativa = view_container.content
+            for view in list(views_criadas.values()):
+                if view is not view_ativa and hasattr(view, "frescura"):
+                    view.frescura.invalidar()
+            if hasattr(view_ativa, "on_realtime_change"):
+                print(f"Sessão {page.session.get('user_email')}: Alterações em {', '.join(sorted(tabelas))}.")
+                resultado = view_ativa.on_realtime_change(tabelas)
+                if asyncio.iscoroutine(resultado):
+                    await resultado
+
+        iniciar_sincronizacao()
+        page.session.set("realtime_ouvinte", registar_ouvinte(page, on_realtime_change, cliente_da_sessao(page)))
             
         navigation_rail = ft.NavigationRail(
             selected_index=0,
@@ -275,6 +372,13 @@ def main(page: ft.Page):
         )
         page.update()
 
+        # (v2.11) Pré-carrega as outras abas: a 1ª visita a cada uma já mostra dados
+        # (v2.12) As views são criadas aqui, DEPOIS do 1º ecrã (SALC_PRE_CARREGAR_ABAS=0 desliga)
+        if PRE_CARREGAR_ABAS:
+            page.run_task(_pre_carregar_views, lambda: [
+                obter_view(i) for i in range(1, len(fabricas_views)) if modulos_views[i] in VIEWS_PRE_CARREGAVEIS
+            ])
+
     def handle_login(e):
         username = username_field.value
         password = password_field.value
@@ -290,56 +394,65 @@ def main(page: ft.Page):
         try:
             email_formatado = f"{username.strip()}@salc.com"
             print(f"Tentativa de login como: {email_formatado}") 
+            tempos = {}
+            inicio_login = time.perf_counter()
 
-            auth_response = supabase.auth.sign_in_with_password({
-                "email": email_formatado,
-                "password": password
-            })
+            # (v2.7) Cliente PRÓPRIO desta sessão (token e refresh não são partilhados)
+            _libertar_cliente_supabase()
+            cliente = pool_clientes.adquirir()
+            page.session.set("cliente_supabase", cliente)
+
+            auth_response = cliente.entrar(email_formatado, password)
+            tempos["autenticação"] = time.perf_counter() - inicio_login
             
             user = auth_response.user
             page.session.set("user_email", user.email) 
             page.session.set("user_id", user.id)
             page.session.set("access_token", auth_response.session.access_token)
-
-            supabase.auth.set_session(
-                access_token=auth_response.session.access_token,
-                refresh_token=auth_response.session.refresh_token
-            )
             
-            try:
-                resposta_perfil = supabase.table('perfis_usuarios') \
-                                          .select('funcao') \
-                                          .eq('id_usuario', user.id) \
-                                          .single() \
-                                          .execute()
-                
-                if not resposta_perfil.data:
-                    raise Exception("O seu utilizador autenticou, mas não tem um perfil (função) definido.")
+            # (v2.6) O perfil e os caches não dependem um do outro: o perfil é
+            # pedido em segundo plano enquanto os caches carregam (em paralelo).
+            def _perfil_com_tempo():
+                inicio = time.perf_counter()
+                funcao = _buscar_funcao_utilizador(cliente, user.id)
+                tempos["perfil"] = time.perf_counter() - inicio
+                return funcao
+
+            futuro_perfil = _executor_login.submit(_perfil_com_tempo)
+
+            inicio_fase = time.perf_counter()
+            cache_result = _load_global_caches(page)
+            tempos["caches"] = time.perf_counter() - inicio_fase
 
-                funcao = resposta_perfil.data['funcao']
+            try:
+                funcao = futuro_perfil.result()
                 page.session.set("user_funcao", funcao) 
                 print(f"Login OK: {user.email} (Função: {funcao})")
                 
             except Exception as ex_perfil:
                 print(f"Erro ao buscar perfil: {ex_perfil}")
-                supabase.auth.sign_out() 
+                _libertar_cliente_supabase()
                 username_field.disabled = False
                 password_field.disabled = False
                 error_modal_global.show(f"Erro ao carregar perfil de utilizador: {ex_perfil}")
                 return
 
-            cache_result = _load_global_caches(page)
             if cache_result is not True:
-                supabase.auth.sign_out() 
+                _libertar_cliente_supabase()
                 username_field.disabled = False
                 password_field.disabled = False
                 error_modal_global.show(f"Erro ao carregar dados iniciais (caches): {cache_result}")
                 return
 
+            inicio_fase = time.perf_counter()
             show_main_layout()
+            tempos["layout"] = time.perf_counter() - inicio_fase
+            tempos["total"] = time.perf_counter() - inicio_login
+            _registar_tempos_login(user.email, tempos)
 
         except AuthApiError as ex:
             print(f"Erro de Login: {ex.message}")
+            _libertar_cliente_supabase()
             username_field.disabled = False
             password_field.disabled = False
             error_modal_global.show(f"Utilizador ou senha inválidos.")
@@ -348,16 +461,29 @@ def main(page: ft.Page):
             traceback.print_exc()
             print("---------------------------------------------")
             
+            _libertar_cliente_supabase()
             username_field.disabled = False
             password_field.disabled = False
             error_modal_global.show(f"Ocorreu um erro inesperado: {ex}")
             
+    def _remover_ouvinte_realtime():
+        ouvinte = page.session.get("realtime_ouvinte")
+        if ouvinte is not None:
+            remover_ouvinte(ouvinte)
+
+    def _libertar_cliente_supabase():
+        """(v2.7) Termina a sessão Supabase e devolve o cliente ao pool."""
+        cliente = page.session.get("cliente_supabase")
+        if cliente is not None:
+            page.session.remove("cliente_supabase")
+            pool_clientes.devolver(cliente)
+
+    def _terminar_sessao():
+        _remover_ouvinte_realtime()
+        _libertar_cliente_supabase()
+
     def handle_logout(e):
-        try:
-            supabase.auth.sign_out()
-        except Exception as ex_logout:
-            print(f"Erro ao fazer logout no Supabase: {ex_logout}")
-            
+        _terminar_sessao()
         page.session.clear()
         page.appbar = None 
         page.clean()
@@ -416,18 +542,52 @@ def main(page: ft.Page):
             )
         )
 
+    # (v2.5) Sessão terminada sem logout (ex: separador do browser fechado)
+    page.on_close = lambda e: _terminar_sessao()
+
     page.add(build_login_view()) 
 
-if __name__ == "__main__":
+def arrancar_servidor():
+    """
+    (v2.20) Arranque do servidor (antes no bloco '__main__' deste ficheiro).
+    Chamado por iniciar.py, o ponto de entrada leve (ver lá porquê).
+    """
+    # (v2.15) Relatórios e PDFs carregados antigos são apagados em segundo plano
+    zelador_ficheiros.iniciar()
     
     port = int(os.environ.get("PORT", 8550))
     
     print(f"A iniciar aplicação web na porta: {port}")
     
-    ft.app(
+    # (v2.16) A app Flet é montada numa FastAPI com a rota /download/<token> à frente
+    # (relatórios servidos por token assinado, fora de assets/: ver downloads.py)
+    import uvicorn
+    from flet.utils import get_bool_env_var, is_linux_server, open_in_browser
+    from downloads import criar_servidor
+
+    app_flet = ft.app(
         target=main, 
-        view=ft.AppView.WEB_BROWSER, 
         assets_dir="assets",
         upload_dir="uploads", 
-        port=port
-    )
\ No newline at end of file
+        export_asgi_app=True
+    )
+
+    def abrir_browser():
+        # Como o ft.app em modo WEB_BROWSER: só abre o browser fora de um servidor
+        if not (get_bool_env_var("FLET_FORCE_WEB_SERVER") or is_linux_server()):
+            open_in_browser(f"http://127.0.0.1:{port}")
+
+    uvicorn.run(
+        criar_servidor(app_flet, ao_arrancar=abrir_browser),
+        host=os.environ.get("FLET_SERVER_IP") or None,  # None = todas as interfaces (como o ft.app)
+        port=port,
+    )
+
+
+if __name__ == "__main__":
+    # (v2.14) Num executável congelado, os processos filhos do pool de relatórios
+    # têm de parar aqui em vez de arrancar outro servidor
+    # (v2.20) Prefira 'python iniciar.py': arrancado daqui, cada processo do pool
+    # reimporta este ficheiro (e o Flet, o Supabase...)
+    multiprocessing.freeze_support()
+    arrancar_servidor()
@@ -0,0 +1,307 @@
+# repositorio.py
+# (Versão v1.12 - Camada de Dados Assíncrona)
+# (Relatório Geral entregue janela a janela (gerador assíncrono), em vez de numa lista única)
+
+import asyncio
+import os
+from datetime import datetime
+
+from cache_global import CacheResultados, versao_dados
+from armazem_ncs import armazem_ncs, ATIVO as ARMAZEM_NCS_ATIVO
+from leitura_paginada import ler_tudo_async, iterar_janelas_async, TAMANHO_JANELA
+
+# Colunas usadas pela tabela de NCs e pelo modal "Quick View"
+COLUNAS_NCS = (
+    'id, numero_nc, pi, natureza_despesa, status_calculado, '
+    'valor_inicial, saldo_disponivel, total_empenhado, id_secao, '
+    'data_validade_empenho, data_recebimento, ptres, fonte, '
+    'ug_gestora, observacao'
+)
+COLUNAS_RELATORIO_GERAL = (
+    'numero_nc, pi, natureza_despesa, status_calculado, valor_inicial, saldo_disponivel, '
+    'data_validade_empenho, ug_gestora, data_recebimento, observacao'
+)
+
+# Linhas por página nas listas paginadas (NCs e NEs)
+TAMANHO_PAGINA = 50
+
+# (v1.1) Todas as funções recebem o 'ClienteSessao' da sessão (ver supabase_client.py)
+# e usam o seu PostgREST assíncrono, autenticado com o token DESSA sessão.
+
+
+# --- (v1.6) Armazém de NCs em memória (ver armazem_ncs.py) ---
+
+async def _instantaneo_ncs(cliente):
+    """
+    Instantaneo atual do armazém do âmbito RLS do 'cliente'. Se não houver nada a aplicar,
+    é imediato; senão o (re)carregamento corre numa thread, fora do loop do Flet.
+    """
+    instantaneo = armazem_ncs.pronto(cliente)
+    if instantaneo is None:
+        instantaneo = await asyncio.to_thread(armazem_ncs.obter, cliente)
+    return instantaneo
+
+
+# --- Paginação por chave (keyset) ---
+
+def _aplicar_cursor(query, coluna, cursor):
+    """
+    Filtra as linhas que vêm DEPOIS do cursor (coluna, id) na ordenação
+    'coluna DESC, id DESC'. 'coluna' tem de ser NOT NULL.
+    """
+    if not cursor:
+        return query
+    valor, ultimo_id = cursor
+    return query.or_(f"{coluna}.lt.{valor},and({coluna}.eq.{valor},id.lt.{ultimo_id})")
+
+
+def _ate_cursor(query, coluna, cursor):
+    """
+    (v1.10) O contrário de '_aplicar_cursor': as linhas ATÉ ao cursor, inclusive
+    (as das páginas já mostradas). Sem cursor, não filtra (já se viu a última página).
+    """
+    if not cursor:
+        return query
+    valor, ultimo_id = cursor
+    return query.or_(f"{coluna}.gt.{valor},and({coluna}.eq.{valor},id.gte.{ultimo_id})")
+
+
+def _dividir_pagina(linhas, coluna, tamanho):
+    """Pedimos tamanho+1 linhas: a linha extra só indica se há mais páginas."""
+    if len(linhas) <= tamanho:
+        return linhas, None
+    pagina = linhas[:tamanho]
+    ultima = pagina[-1]
+    return pagina, (ultima[coluna], ultima['id'])
+
+
+# --- Dashboard ---
+
+# (v1.5) Snapshots do Dashboard guardados por combinação de filtros (TTL curto;
+# também expiram assim que o Realtime avisa que NCs/NEs/recolhimentos mudaram)
+# (v1.8) E por âmbito RLS: a RPC corre como 'security invoker' (cada utilizador vê as suas linhas)
+_snapshots_dashboard = CacheResultados(ttl_segundos=int(os.environ.get("SALC_SNAPSHOT_TTL", "30")))
+
+
+def _normalizar_resumo(resumo):
+    resumo = resumo or {}
+    return {
+        "saldo_total": float(resumo.get('saldo_total') or 0),
+        "quantidade": int(resumo.get('quantidade') or 0),
+        "por_status": resumo.get('por_status') or {},
+    }
+
+
+async def carregar_snapshot_dashboard(cliente, status=None, pi=None, nd=None, dias=7):
+    """
+    (v1.5) Tudo o que o Dashboard mostra, num ÚNICO pedido
+    (RPC 'get_dashboard_snapshot', ver sql/003_get_dashboard_snapshot.sql):
+    {"resumo": {...}, "a_vencer": [...], "pis": [...], "nds": [...]}.
+    O resumo é o de 'get_resumo_saldos' (sql/002_get_resumo_saldos.sql).
+    (v1.6) Com o armazém ativo, o mesmo snapshot é calculado em memória.
+    """
+    hoje = datetime.now().date()
+    if ARMAZEM_NCS_ATIVO:
+        instantaneo = await _instantaneo_ncs(cliente)
+        return {
+            "resumo": instantaneo.resumo(status=status, pi=pi, nd=nd),
+            "a_vencer": instantaneo.a_vencer(hoje, dias),
+            "pis": instantaneo.lista_pis(),
+            "nds": instantaneo.lista_nds(pi),
+        }
+
+    chave = (cliente.ambito, status or None, pi or None, nd or None, hoje, dias)
+    snapshot = _snapshots_dashboard.obter(chave)
+    if snapshot is not None:
+        return snapshot
+
+    versao = versao_dados()
+    resposta = await cliente.rest_async.rpc('get_dashboard_snapshot', {
+        'p_pi': pi or None,
+        'p_nd': nd or None,
+        'p_status': status or None,
+        'p_hoje': hoje.isoformat(),
+        'p_dias': dias,
+    }).execute()
+    dados = resposta.data or {}
+    snapshot = {
+        "resumo": _normalizar_resumo(dados.get('resumo')),
+        "a_vencer": dados.get('a_vencer') or [],
+        "pis": dados.get('pis') or [],
+        "nds": dados.get('nds') or [],
+    }
+    _snapshots_dashboard.guardar(chave, snapshot, versao)
+    return snapshot
+
+
+# --- Notas de Crédito ---
+
+def _query_ncs(rest, pesquisa=None, status=None, pi=None, nd=None, **opcoes):
+    """(v1.10) Consulta base da lista de NCs com os filtros da view."""
+    query = rest.table('ncs_com_saldos').select(COLUNAS_NCS, **opcoes)
+    if pesquisa: query = query.ilike('numero_nc', f"%{pesquisa}%")
+    if status: query = query.eq('status_calculado', status)
+    if pi: query = query.eq('pi', pi)
+    if nd: query = query.eq('natureza_despesa', nd)
+    return query
+
+
+async def listar_ncs_pagina(cliente, cursor=None, tamanho=TAMANHO_PAGINA, pesquisa=None, status=None, pi=None, nd=None):
+    """
+    (v1.2) Uma página de NCs, da mais recente para a mais antiga.
+    Paginação por chave (keyset) em (data_recebimento, id): o custo de cada
+    página não depende de quantas NCs já foram mostradas.
+    Devolve (linhas, cursor_seguinte); cursor_seguinte é None na última página.
+    (v1.6) Com o armazém ativo, filtra e pagina em memória (mesmo formato de cursor).
+    """
+    if ARMAZEM_NCS_ATIVO:
+        instantaneo = await _instantaneo_ncs(cliente)
+        posicoes = instantaneo.filtrar(status=status, pi=pi, nd=nd, pesquisa=pesquisa)
+        return instantaneo.pagina(posicoes, cursor, tamanho)
+
+    query = _query_ncs(cliente.rest_async, pesquisa=pesquisa, status=status, pi=pi, nd=nd)
+    query = _aplicar_cursor(query, 'data_recebimento', cursor)
+    resposta = await query.order('data_recebimento', desc=True) \
+                          .order('id', desc=True) \
+                          .limit(tamanho + 1) \
+                          .execute()
+    return _dividir_pagina(resposta.data or [], 'data_recebimento', tamanho)
+
+
+async def listar_ncs_carregadas(cliente, cursor=None, pesquisa=None, status=None, pi=None, nd=None):
+    """
+    (v1.10) As NCs das páginas já mostradas, relidas: da 1ª até ao 'cursor' devolvido pela
+    última 'listar_ncs_pagina' (inclusive; sem cursor, todas). A view atualiza-as no sítio,
+    sem perder o ponto onde estava. Lidas em janelas (podem passar do 'max-rows').
+    """
+    if ARMAZEM_NCS_ATIVO:
+        instantaneo = await _instantaneo_ncs(cliente)
+        posicoes = instantaneo.filtrar(status=status, pi=pi, nd=nd, pesquisa=pesquisa)
+        return instantaneo.ate(posicoes, cursor)
+
+    def construir_query(count):
+        query = _query_ncs(cliente.rest_async, pesquisa=pesquisa, status=status, pi=pi, nd=nd, count=count)
+        return _ate_cursor(query, 'data_recebimento', cursor) \
+            .order('data_recebimento', desc=True).order('id', desc=True)
+
+    return await ler_tudo_async(construir_query)
+
+
+async def carregar_historico_nc(cliente, nc_id):
+    """NEs e recolhimentos de uma NC, pedidos em paralelo."""
+    rest = cliente.rest_async
+    resposta_nes, resposta_recolhimentos = await asyncio.gather(
+        rest.table('notas_de_empenho').select('*').eq('id_nc', nc_id)
+            .order('data_empenho', desc=True).execute(),
+        rest.table('recolhimentos_de_saldo').select('*').eq('id_nc', nc_id)
+            .order('data_recolhimento', desc=True).execute(),
+    )
+    return resposta_nes.data or [], resposta_recolhimentos.data or []
+
+
+# --- Notas de Empenho ---
+
+def _query_nes(rest, colunas, pesquisa=None, id_nc=None, pi=None, nd=None, **opcoes):
+    """
+    Consulta base de NEs com os filtros da view.
+    Com filtro de PI/ND, o embed passa a '!inner' para que o filtro sobre a NC
+    elimine a NE (sem '!inner' a NE viria na mesma, só sem a NC embutida).
+    """
+    embed = 'notas_de_credito!inner' if (pi or nd) else 'notas_de_credito'
+    query = rest.table('notas_de_empenho').select(colunas.format(embed=embed), **opcoes)
+    if pesquisa: query = query.ilike('numero_ne', f"%{pesquisa}%")
+    if id_nc: query = query.eq('id_nc', id_nc)
+    if pi: query = query.eq('notas_de_credito.pi', pi)
+    if nd: query = query.eq('notas_de_credito.natureza_despesa', nd)
+    return query
+
+
+async def listar_nes_pagina(cliente, cursor=None, tamanho=TAMANHO_PAGINA, **filtros):
+    """
+    (v1.3) Uma página de NEs, da mais recente para a mais antiga.
+    Paginação por chave em (data_empenho, id). Devolve (linhas, cursor_seguinte).
+    """
+    query = _query_nes(cliente.rest_async, '*, {embed}(numero_nc, pi, natureza_despesa)', **filtros)
+    query = _aplicar_cursor(query, 'data_empenho', cursor)
+    resposta = await query.order('data_empenho', desc=True) \
+                          .order('id', desc=True) \
+                          .limit(tamanho + 1) \
+                          .execute()
+    return _dividir_pagina(resposta.data or [], 'data_empenho', tamanho)
+
+
+async def listar_nes_carregadas(cliente, cursor=None, **filtros):
+    """
+    (v1.11) As NEs das páginas já mostradas, relidas (ver 'listar_ncs_carregadas'):
+    da 1ª até ao 'cursor' da última 'listar_nes_pagina', inclusive; sem cursor, todas.
+    """
+    def construir_query(count):
+        query = _query_nes(cliente.rest_async, '*, {embed}(numero_nc, pi, natureza_despesa)', count=count, **filtros)
+        return _ate_cursor(query, 'data_empenho', cursor) \
+            .order('data_empenho', desc=True).order('id', desc=True)
+
+    return await ler_tudo_async(construir_query)
+
+
+async def contar_nes(cliente, **filtros):
+    """(v1.3) Total de NEs com os filtros (pedido 'HEAD': só o número, sem linhas)."""
+    resposta = await _query_nes(cliente.rest_async, 'id, {embed}(id)', count='exact', head=True, **filtros).execute()
+    return resposta.count or 0
+
+
+async def listar_ncs_ativas(cliente):
+    """NCs 'Ativas' (com saldo) para o dropdown do modal de NE."""
+    # (v1.7) Lida em janelas: com mais NCs ativas do que o 'max-rows', a lista vinha cortada
+    return await ler_tudo_async(
+        lambda count: cliente.rest_async.table('ncs_com_saldos')
+            .select('id, numero_nc, saldo_disponivel', count=count)
+            .filter('status_calculado', 'eq', 'Ativa')
+            .order('id')
+    )
+
+
+# --- Relatórios ---
+
+async def iterar_relatorio_geral(cliente, data_inicio=None, data_fim=None, status=None, pi=None, nd=None):
+    """
+    (v1.12) Linhas do Relatório Geral, janela a janela ('async for lote in ...'): quem chama
+    grava cada janela (ver fila_relatorios.gravar_linhas) e o relatório inteiro nunca fica
+    numa lista em memória.
+    """
+    if ARMAZEM_NCS_ATIVO:
+        instantaneo = await _instantaneo_ncs(cliente)
+        posicoes = instantaneo.filtrar(status=status, pi=pi, nd=nd, data_inicio=data_inicio, data_fim=data_fim)
+        colunas = [coluna.strip() for coluna in COLUNAS_RELATORIO_GERAL.split(',')]
+        for inicio in range(0, len(posicoes), TAMANHO_JANELA):
+            yield [{coluna: instantaneo.registos[p].get(coluna) for coluna in colunas}
+                   for p in posicoes[inicio:inicio + TAMANHO_JANELA]]
+        return
+
+    def construir_query(count):
+        query = cliente.rest_async.table('ncs_com_saldos').select(COLUNAS_RELATORIO_GERAL, count=count)
+        if data_inicio: query = query.gte('data_recebimento', data_inicio)
+        if data_fim: query = query.lte('data_recebimento', data_fim)
+        if status: query = query.eq('status_calculado', status)
+        if pi: query = query.eq('pi', pi)
+        if nd: query = query.eq('natureza_despesa', nd)
+        # 'id' desempata: as janelas (offset) precisam de uma ordem estável
+        return query.order('data_recebimento', desc=True).order('id', desc=True)
+
+    # (v1.7) Um relatório anual passa facilmente das 1000 linhas do 'max-rows'
+    # (v1.12) A janela seguinte já é pedida enquanto a atual é gravada
+    async for lote in iterar_janelas_async(construir_query):
+        yield lote
+
+
+async def carregar_extrato_nc(cliente, nc_id):
+    """
+    NC, NEs e recolhimentos para o Extrato, pedidos em paralelo.
+    Devolve None se a NC não existir.
+    """
+    resposta_nc, (nes, recolhimentos) = await asyncio.gather(
+        cliente.rest_async.table('notas_de_credito').select('*, observacao').eq('id', nc_id).maybe_single().execute(),
+        carregar_historico_nc(cliente, nc_id),
+    )
+    if not resposta_nc or not resposta_nc.data:
+        return None
+    return {"nc": resposta_nc.data, "nes": nes, "recolhimentos": recolhimentos}
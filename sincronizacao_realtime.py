@@ -0,0 +1,276 @@
+# sincronizacao_realtime.py
+# (Versão v1.6 - Sincronização em Tempo Real)
+# (Avisos às sessões no loop de cada uma ('page.run_task'), com os caches relidos uma vez por rajada)
+# (v1.5) INSERT/UPDATE invalidam o cache (lido por âmbito RLS); só o DELETE é aplicado no lugar
+# (v1.6) Um único agrupamento de eventos para o processo (antes, um Timer por sessão, e o aviso
+#        corria na thread do Timer: leituras bloqueantes e 'update()' fora do loop da sessão).
+#        Quando a rajada acaba, as chaves do cache_global afetadas são relidas UMA vez por âmbito
+#        RLS com sessões ligadas, e só depois cada sessão é avisada, no seu próprio loop.
+
+import asyncio
+import threading
+import traceback
+
+from supabase_client import SUPABASE_URL, SUPABASE_SERVICE_KEY
+from cache_global import cache_global, marcar_dados_alterados
+from armazem_ncs import armazem_ncs
+
+# Tabelas publicadas em 'supabase_realtime' (ver sql/001_realtime_publicacao.sql)
+TABELAS_OBSERVADAS = ("notas_de_credito", "notas_de_empenho", "recolhimentos_de_saldo", "secoes")
+
+# Tempo (segundos) para agrupar uma rajada de eventos num único aviso por sessão
+ATRASO_AGRUPAMENTO = 0.5
+
+# (v1.6) Chaves do cache_global que cada tabela invalida (relidas antes de avisar as sessões)
+CHAVES_POR_TABELA = {
+    "notas_de_credito": ("ncs_lista", "pis", "nds", "mapa_pi_nd"),
+    "notas_de_empenho": ("nes_lista",),
+    "secoes": ("secoes_map",),
+}
+
+# (v1.1) Tabelas que entram nos valores (saldos) mostrados pelo Dashboard
+TABELAS_DE_SALDO = ("notas_de_credito", "notas_de_empenho", "recolhimentos_de_saldo")
+
+_lock = threading.Lock()
+_thread = None
+_ligado = threading.Event()
+_ouvintes = {}  # id -> _Ouvinte
+
+
+class _Ouvinte:
+    """(v1.6) Sessão a avisar: a 'page' (para o 'run_task'), o callback assíncrono e o cliente (âmbito RLS)."""
+
+    def __init__(self, page, callback, cliente):
+        self.page = page
+        self.callback = callback
+        self.cliente = cliente
+
+
+class _Agrupador:
+    """
+    Agrupa os eventos recebidos num curto intervalo e chama 'disparar' UMA vez com o
+    conjunto de tabelas alteradas. (v1.6) Um só para o processo, partilhado pelas sessões.
+    """
+
+    def __init__(self, disparar, atraso):
+        self.disparar = disparar
+        self.atraso = atraso
+        self._tabelas = set()
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def receber(self, tabela):
+        with self._lock:
+            self._tabelas.add(tabela)
+            if self._timer is None:
+                self._timer = threading.Timer(self.atraso, self._disparar)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _disparar(self):
+        with self._lock:
+            tabelas = self._tabelas
+            self._tabelas = set()
+            self._timer = None
+        try:
+            self.disparar(tabelas)
+        except Exception as ex:
+            print(f"Realtime: Erro ao avisar as sessões: {ex}")
+            traceback.print_exc()
+
+
+def _recarregar_caches(tabelas, ouvintes):
+    """
+    (v1.6) Relê as chaves invalidadas por 'tabelas' UMA vez por âmbito RLS (com o cliente de
+    uma das suas sessões): as sessões avisadas a seguir já as encontram no cache.
+    """
+    chaves = sorted({chave for tabela in tabelas for chave in CHAVES_POR_TABELA.get(tabela, ())})
+    if not chaves:
+        return
+    clientes_por_ambito = {}
+    for ouvinte in ouvintes:
+        if ouvinte.cliente.ambito is not None:
+            clientes_por_ambito.setdefault(ouvinte.cliente.ambito, ouvinte.cliente)
+    for ambito, cliente in clientes_por_ambito.items():
+        try:
+            cache_global.obter_varios(cliente, chaves)
+        except Exception as ex:
+            # Cada sessão volta a tentar ao ler (e mostra o erro): o aviso segue na mesma
+            print(f"Realtime: Erro ao recarregar {', '.join(chaves)}: {ex}")
+
+
+def _avisar_sessoes(tabelas):
+    """(v1.6) Corre na thread do Timer: relê os caches e agenda o callback de cada sessão no loop dela."""
+    with _lock:
+        ouvintes = list(_ouvintes.values())
+    if not ouvintes:
+        return
+    _recarregar_caches(tabelas, ouvintes)
+    for ouvinte in ouvintes:
+        try:
+            ouvinte.page.run_task(ouvinte.callback, tabelas)
+        except Exception as ex:
+            print(f"Realtime: Erro ao avisar sessão: {ex}")  # Sessão a fechar
+
+
+_agrupador = _Agrupador(_avisar_sessoes, ATRASO_AGRUPAMENTO)
+
+
+def registar_ouvinte(page, callback, cliente):
+    """
+    Regista uma sessão: 'callback(set_de_tabelas_alteradas)' é uma função ASSÍNCRONA, corrida
+    no loop da sessão ('page.run_task'). 'cliente' (ClienteSessao) define o âmbito dos caches
+    relidos antes do aviso. Devolve um identificador para 'remover_ouvinte' (logout / fecho).
+    """
+    ouvinte = _Ouvinte(page, callback, cliente)
+    with _lock:
+        _ouvintes[id(ouvinte)] = ouvinte
+    return id(ouvinte)
+
+
+def remover_ouvinte(identificador):
+    with _lock:
+        _ouvintes.pop(identificador, None)
+
+
+def realtime_ligado():
+    """True se a subscrição está ativa (as alterações chegam sozinhas)."""
+    return _ligado.is_set()
+
+
+# --- Aplicação incremental ao cache global ---
+# (v1.5) O cache guarda uma cópia por âmbito RLS, e estes eventos chegam pelo cliente de
+# serviço (veem TODAS as linhas). Só um DELETE vale para qualquer âmbito (o registo sai de
+# todas as cópias); INSERT/UPDATE invalidam: cada âmbito relê com as suas credenciais.
+
+def _remover_por_id(registo_id):
+    return lambda lista: [registo for registo in lista if registo['id'] != registo_id]
+
+
+def _aplicar_nota_de_credito(evento, novo, antigo):
+    nc_id = (novo or {}).get('id') or (antigo or {}).get('id')
+    if evento == "DELETE":
+        cache_global.atualizar("ncs_lista", _remover_por_id(nc_id))
+    else:
+        cache_global.invalidar("ncs_lista")
+    # Um PI/ND novo pode não ser visível a todos; um UPDATE/DELETE pode deixar um PI/ND
+    # sem nenhuma NC: só a BD sabe dizer (recarregamento preguiçoso, na próxima leitura).
+    cache_global.invalidar("pis", "nds", "mapa_pi_nd")
+
+
+def _aplicar_nota_de_empenho(evento, novo, antigo):
+    """(v1.3) Mantém a lista (id, numero_ne) usada pelo índice de pesquisa de NEs."""
+    ne_id = (novo or {}).get('id') or (antigo or {}).get('id')
+    if evento == "DELETE":
+        cache_global.atualizar("nes_lista", _remover_por_id(ne_id))
+    else:
+        cache_global.invalidar("nes_lista")
+
+
+def _ncs_afetadas(tabela, novo, antigo):
+    """
+    (v1.2) Ids das NCs cujo saldo muda com o evento. NE/recolhimento: a NC a que
+    pertence (antes e depois, se mudou de NC). None = desconhecida (recarrega tudo).
+    """
+    coluna = 'id' if tabela == "notas_de_credito" else 'id_nc'
+    ids = {registo.get(coluna) for registo in (novo, antigo) if registo}
+    ids.discard(None)
+    return ids or {None}
+
+
+def _aplicar_secao(evento, novo, antigo):
+    secao_id = (novo or {}).get('id') or (antigo or {}).get('id')
+    if evento == "DELETE":
+        cache_global.atualizar("secoes_map", lambda secoes_map: {
+            chave: nome for chave, nome in secoes_map.items() if chave != secao_id})
+    else:
+        cache_global.invalidar("secoes_map")
+
+
+def _on_alteracao(payload):
+    """Callback do Realtime (corre na thread da subscrição)."""
+    try:
+        dados = payload.get('data', payload)
+        tabela = dados.get('table')
+        evento = dados.get('type') or dados.get('eventType')
+        novo = dados.get('record') or dados.get('new') or {}
+        antigo = dados.get('old_record') or dados.get('old') or {}
+        print(f"Realtime: {evento} em {tabela}")
+
+        if tabela == "notas_de_credito":
+            _aplicar_nota_de_credito(evento, novo, antigo)
+        elif tabela == "notas_de_empenho":
+            _aplicar_nota_de_empenho(evento, novo, antigo)
+        elif tabela == "secoes":
+            _aplicar_secao(evento, novo, antigo)
+        if tabela in TABELAS_DE_SALDO:
+            marcar_dados_alterados()
+            armazem_ncs.marcar_alteradas(*_ncs_afetadas(tabela, novo, antigo))
+
+        _agrupador.receber(tabela)
+
+    except Exception as ex:
+        print(f"Realtime: Erro ao aplicar alteração: {ex}")
+        traceback.print_exc()
+
+
+async def _subscrever():
+    """Liga ao Realtime e mantém a subscrição, reconectando em caso de falha."""
+    espera = 1
+    while True:
+        cliente = None
+        try:
+            # Cliente de serviço: a subscrição é do PROCESSO (não de um utilizador), e a
+            # RLS não deve esconder eventos que alimentam caches partilhados. (v1.5) Os
+            # eventos só invalidam/removem: os dados servidos são relidos por cada âmbito.
+            from realtime import AsyncRealtimeClient  # (v1.4) Só quando a 1ª sessão entra
+            cliente = AsyncRealtimeClient(f"{SUPABASE_URL}/realtime/v1", SUPABASE_SERVICE_KEY)
+            await cliente.connect()
+
+            canal = cliente.channel("salc-alteracoes")
+            for tabela in TABELAS_OBSERVADAS:
+                canal.on_postgres_changes("*", schema="public", table=tabela, callback=_on_alteracao)
+            await canal.subscribe()
+
+            _ligado.set()
+            espera = 1
+            print(f"Realtime: Subscrição ativa em {', '.join(TABELAS_OBSERVADAS)}.")
+
+            # Mantém a tarefa viva enquanto a ligação estiver aberta
+            while cliente.is_connected:
+                await asyncio.sleep(5)
+            print("Realtime: Ligação perdida.")
+
+        except Exception as ex:
+            print(f"Realtime: Erro na subscrição: {ex}")
+            traceback.print_exc()
+
+        finally:
+            _ligado.clear()
+            if cliente:
+                try:
+                    await cliente.close()
+                except Exception:
+                    pass
+
+        # Eventos perdidos enquanto desligado: invalida tudo por segurança
+        cache_global.invalidar()
+        marcar_dados_alterados()
+        armazem_ncs.invalidar()
+        await asyncio.sleep(espera)
+        espera = min(espera * 2, 60)
+
+
+def iniciar_sincronizacao():
+    """Inicia a subscrição Realtime UMA vez por processo (chamadas seguintes não fazem nada)."""
+    global _thread
+    with _lock:
+        if _thread is not None:
+            return
+        _thread = threading.Thread(
+            target=lambda: asyncio.run(_subscrever()),
+            name="salc-realtime",
+            daemon=True,
+        )
+        _thread.start()
+    print("Realtime: Thread de sincronização iniciada.")
@@ -0,0 +1,14 @@
+-- sql/001_realtime_publicacao.sql
+-- (Sincronização em Tempo Real - ver sincronizacao_realtime.py)
+-- Publica as tabelas observadas pelo servidor Flet no canal 'supabase_realtime'.
+-- 'replica identity full' faz o Realtime enviar o registo antigo (old_record)
+-- completo em UPDATE/DELETE, e não apenas a chave primária.
+
+alter publication supabase_realtime add table
+    public.notas_de_credito,
+    public.notas_de_empenho,
+    public.recolhimentos_de_saldo,
+    public.secoes;
+
+alter table public.notas_de_credito replica identity full;
+alter table public.secoes replica identity full;
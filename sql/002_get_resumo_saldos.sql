@@ -0,0 +1,39 @@
+-- sql/002_get_resumo_saldos.sql
+-- (Dashboard - ver repositorio.obter_resumo_saldos)
+-- Agrega o saldo disponível NO SERVIDOR: devolve um JSON pequeno em vez de
+-- todas as linhas de 'ncs_com_saldos' que cumprem os filtros.
+--   saldo_total / quantidade: com os filtros de PI, ND e status;
+--   por_status: {status: {saldo, quantidade}} com os filtros de PI e ND (todos os status).
+-- 'security invoker': a RLS do utilizador que chama continua a aplicar-se.
+
+create or replace function public.get_resumo_saldos(
+    p_pi text default null,
+    p_nd text default null,
+    p_status text default null
+)
+returns json
+language sql
+stable
+security invoker
+as $$
+    with por_status as (
+        select status_calculado,
+               coalesce(sum(saldo_disponivel), 0) as saldo,
+               count(*) as quantidade
+        from public.ncs_com_saldos
+        where (p_pi is null or pi = p_pi)
+          and (p_nd is null or natureza_despesa = p_nd)
+        group by status_calculado
+    )
+    select json_build_object(
+        'saldo_total', coalesce((select sum(saldo) from por_status
+                                 where p_status is null or status_calculado = p_status), 0),
+        'quantidade', coalesce((select sum(quantidade) from por_status
+                                where p_status is null or status_calculado = p_status), 0),
+        'por_status', coalesce((select json_object_agg(status_calculado,
+                                       json_build_object('saldo', saldo, 'quantidade', quantidade))
+                                from por_status), '{}'::json)
+    );
+$$;
+
+grant execute on function public.get_resumo_saldos(text, text, text) to authenticated;
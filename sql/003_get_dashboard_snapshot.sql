@@ -0,0 +1,50 @@
+-- sql/003_get_dashboard_snapshot.sql
+-- (Dashboard - ver repositorio.carregar_snapshot_dashboard)
+-- Tudo o que o Dashboard mostra num ÚNICO pedido:
+--   resumo:   get_resumo_saldos (KPI com os filtros de PI, ND e status);
+--   a_vencer: NCs ativas com prazo de empenho entre p_hoje e p_hoje + p_dias;
+--   pis:      PIs existentes (vocabulário do filtro PI);
+--   nds:      NDs existentes para o PI escolhido (ou todas, sem PI).
+-- 'p_hoje' vem do servidor Flet para manter a data local (e não a da BD).
+
+create or replace function public.get_dashboard_snapshot(
+    p_pi text default null,
+    p_nd text default null,
+    p_status text default null,
+    p_hoje date default current_date,
+    p_dias integer default 7
+)
+returns json
+language sql
+stable
+security invoker
+as $$
+    select json_build_object(
+        'resumo', public.get_resumo_saldos(p_pi, p_nd, p_status),
+        'a_vencer', coalesce((
+            select json_agg(json_build_object(
+                       'numero_nc', numero_nc,
+                       'data_validade_empenho', data_validade_empenho,
+                       'saldo_disponivel', saldo_disponivel,
+                       'pi', pi,
+                       'natureza_despesa', natureza_despesa,
+                       'valor_inicial', valor_inicial
+                   ) order by data_validade_empenho)
+            from public.ncs_com_saldos
+            where status_calculado = 'Ativa'
+              and data_validade_empenho between p_hoje and p_hoje + p_dias
+        ), '[]'::json),
+        'pis', coalesce((
+            select json_agg(pi order by pi)
+            from (select distinct pi from public.notas_de_credito where pi is not null) as t
+        ), '[]'::json),
+        'nds', coalesce((
+            select json_agg(natureza_despesa order by natureza_despesa)
+            from (select distinct natureza_despesa from public.notas_de_credito
+                  where natureza_despesa is not null
+                    and (p_pi is null or pi = p_pi)) as t
+        ), '[]'::json)
+    );
+$$;
+
+grant execute on function public.get_dashboard_snapshot(text, text, text, date, integer) to authenticated;
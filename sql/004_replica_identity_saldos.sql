@@ -0,0 +1,8 @@
+-- sql/004_replica_identity_saldos.sql
+-- (Armazém de NCs em memória - ver armazem_ncs.py e sincronizacao_realtime.py)
+-- Com 'replica identity full', o DELETE de uma NE ou de um recolhimento traz o
+-- 'id_nc' no old_record: o servidor Flet atualiza só ESSA NC no armazém, em vez
+-- de recarregar todas as NCs.
+
+alter table public.notas_de_empenho replica identity full;
+alter table public.recolhimentos_de_saldo replica identity full;
@@ -0,0 +1,24 @@
+-- sql/005_get_distinct_pi_nd.sql
+-- (Filtros PI -> ND - ver cache_global._carregar_mapa_pi_nd)
+-- Calcula os pares (PI, ND) distintos NO SERVIDOR: um pedido devolve só os pares,
+-- em vez de todas as linhas de 'notas_de_credito' lidas em janelas.
+-- Devolve um único JSON [{pi, natureza_despesa}, ...] (não fica cortado no 'max-rows').
+-- 'security invoker': a RLS do utilizador que chama continua a aplicar-se.
+
+create or replace function public.get_distinct_pi_nd()
+returns json
+language sql
+stable
+security invoker
+as $$
+    select coalesce(json_agg(json_build_object('pi', pi, 'natureza_despesa', natureza_despesa)
+                             order by pi, natureza_despesa), '[]'::json)
+    from (
+        select distinct pi, natureza_despesa
+        from public.notas_de_credito
+        where pi is not null and pi <> ''
+          and natureza_despesa is not null and natureza_despesa <> ''
+    ) as pares;
+$$;
+
+grant execute on function public.get_distinct_pi_nd() to authenticated;
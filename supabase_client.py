@@ -1,8 +1,12 @@
 # supabase_client.py
-# (Versão Lote 6.2 - Robusta, usa dotenv_values)
+# (Versão Lote 6.6 - Robusta, usa dotenv_values)
+# (Importar este módulo já não cria clientes: o Admin e as ligações HTTP nascem no 1º uso)
+# (LOTE 6.5) Cada sessão tem um 'âmbito RLS': os caches partilhados guardam uma cópia por âmbito
+# (LOTE 6.6) Âmbito padrão 'partilhado' (a RLS do SALC não varia por utilizador; ver README)
 
 import os
-from supabase import create_client, Client
+import time
+import threading
 from dotenv import dotenv_values # <-- MUDANÇA: Não usamos mais 'load_dotenv'
 
 # --- (MUDANÇA CRUCIAL LOTE 6.2) ---
@@ -47,18 +51,190 @@ if not SUPABASE_URL or not SUPABASE_KEY or not SUPABASE_SERVICE_KEY:
     print("---------------------")
     raise Exception("Erro: Uma ou mais chaves (SUPABASE_URL, SUPABASE_KEY, SUPABASE_SERVICE_KEY) não foram encontradas DENTRO do .env. Verifique se os nomes das variáveis estão corretos (sem espaços, em maiúsculas).")
 
-try:
-    # Cliente 'anon' (para utilizadores normais)
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-    print("Ligação ao Supabase (Cliente Anon) inicializada com sucesso!")
-except Exception as e:
-    print(f"Erro ao inicializar Cliente Anon: {e}")
-    supabase = None
-
-try:
-    # Cliente 'admin' (para a admin_view)
-    supabase_admin: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
-    print("Ligação ao Supabase (Cliente Admin) inicializada com sucesso!")
-except Exception as e:
-    print(f"Erro ao inicializar Cliente Admin: {e}")
-    supabase_admin = None
\ No newline at end of file
+# (LOTE 6.3) O antigo cliente 'anon' global foi removido: partilhava o token
+# entre TODAS as sessões. Cada sessão usa agora o seu 'ClienteSessao' (abaixo).
+
+class _ClienteAdminDiferido:
+    """
+    (LOTE 6.4) Cliente 'admin' (para a admin_view),
+    criado no PRIMEIRO acesso. O pacote 'supabase' completo (storage, functions,
+    realtime...) só é importado nessa altura, e não no arranque do processo.
+    """
+
+    def __init__(self):
+        self._cliente = None
+        self._lock = threading.Lock()
+
+    def obter(self):
+        if self._cliente is None:
+            with self._lock:
+                if self._cliente is None:
+                    from supabase import create_client
+                    try:
+                        self._cliente = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+                        print("Ligação ao Supabase (Cliente Admin) inicializada com sucesso!")
+                    except Exception as e:
+                        print(f"Erro ao inicializar Cliente Admin: {e}")
+                        raise
+        return self._cliente
+
+    def __getattr__(self, nome):
+        # supabase_admin.table(...), .rpc(...), .auth... continuam a funcionar
+        return getattr(self.obter(), nome)
+
+
+supabase_admin = _ClienteAdminDiferido()
+
+# --- (LOTE 6.3) CLIENTES POR SESSÃO ---
+# Cada sessão Flet tem a SUA autenticação e os SEUS headers PostgREST,
+# mas todas partilham as mesmas ligações HTTP/2 (keep-alive) do processo.
+
+import httpx
+from postgrest import SyncPostgrestClient, AsyncPostgrestClient
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_HEADERS
+from supabase_auth import SyncGoTrueClient
+
+REST_URL = f"{SUPABASE_URL}/rest/v1"
+AUTH_URL = f"{SUPABASE_URL}/auth/v1"
+
+# Limites (podem ser ajustados no .env ou no ambiente do servidor)
+MAX_CLIENTES_SESSAO = int(config.get("SALC_MAX_SESSOES") or os.environ.get("SALC_MAX_SESSOES", "50"))
+MAX_LIGACOES_HTTP = int(config.get("SALC_MAX_LIGACOES") or os.environ.get("SALC_MAX_LIGACOES", "20"))
+ESPERA_POOL_SEGUNDOS = 10
+
+# (LOTE 6.5) Âmbito RLS: os caches do processo (cache_global, armazem_ncs, snapshots) são lidos
+# com as credenciais de uma sessão e só servidos a sessões do MESMO âmbito.
+#   "partilhado" (padrão, LOTE 6.6): uma cópia para todos - uma rajada de N logins faz UMA
+#                 consulta por lookup. Correto porque as políticas do SALC mostram as mesmas
+#                 linhas a qualquer utilizador autenticado.
+#   "utilizador": uma cópia por utilizador (N logins = N conjuntos de consultas) - OBRIGATÓRIO
+#                 se a implantação tiver políticas de RLS que variem por utilizador (auth.uid()).
+AMBITO_RLS = (config.get("SALC_AMBITO_RLS") or os.environ.get("SALC_AMBITO_RLS", "partilhado")).lower()
+if AMBITO_RLS not in ("utilizador", "partilhado"):
+    raise Exception(f"Erro: SALC_AMBITO_RLS inválido ('{AMBITO_RLS}'). Use 'utilizador' ou 'partilhado'.")
+
+_HEADERS_ANON = {"apikey": SUPABASE_KEY, "Authorization": f"Bearer {SUPABASE_KEY}"}
+
+_limites_http = httpx.Limits(
+    max_connections=MAX_LIGACOES_HTTP,
+    max_keepalive_connections=MAX_LIGACOES_HTTP,
+    keepalive_expiry=60,
+)
+_timeout_http = httpx.Timeout(30.0, connect=10.0)
+
+# O PostgREST só usa o cliente HTTP como transporte (URL e headers vão em cada pedido),
+# por isso é seguro partilhar estes dois clientes entre sessões com tokens diferentes.
+# NUNCA fechar estes clientes a partir de uma sessão.
+# (LOTE 6.4) Criados no 1º login (cada um carrega os certificados TLS: não é grátis).
+_http_partilhados = {}
+_lock_http = threading.Lock()
+
+def _clientes_http():
+    """Devolve (http_partilhado, http_partilhado_async), criando-os na 1ª chamada."""
+    with _lock_http:
+        if not _http_partilhados:
+            _http_partilhados["sync"] = httpx.Client(http2=True, limits=_limites_http, timeout=_timeout_http, follow_redirects=True)
+            _http_partilhados["async"] = httpx.AsyncClient(http2=True, limits=_limites_http, timeout=_timeout_http, follow_redirects=True)
+        return _http_partilhados["sync"], _http_partilhados["async"]
+
+
+class ClienteSessao:
+    """
+    Cliente Supabase de UMA sessão Flet:
+      - 'auth': GoTrue próprio (login, refresh automático do token, logout);
+      - 'rest' / 'rest_async': PostgREST síncrono (escritas) e assíncrono (leituras),
+        autenticados com o token DESTA sessão;
+      - 'ambito': âmbito RLS da sessão (ver AMBITO_RLS); None sem login.
+    """
+
+    def __init__(self):
+        http_partilhado, http_partilhado_async = _clientes_http()
+        self.auth = SyncGoTrueClient(url=AUTH_URL, headers=dict(_HEADERS_ANON), http_client=http_partilhado)
+        self.rest = SyncPostgrestClient(
+            REST_URL, headers={**DEFAULT_POSTGREST_CLIENT_HEADERS, **_HEADERS_ANON}, http_client=http_partilhado
+        )
+        self.rest_async = AsyncPostgrestClient(
+            REST_URL, headers={**DEFAULT_POSTGREST_CLIENT_HEADERS, **_HEADERS_ANON}, http_client=http_partilhado_async
+        )
+        self.ambito = None
+        # Login, refresh e logout atualizam o token usado pelo PostgREST
+        self.auth.on_auth_state_change(self._on_auth_state_change)
+
+    def _on_auth_state_change(self, evento, sessao):
+        token = sessao.access_token if sessao else SUPABASE_KEY
+        self.rest.auth(token)
+        self.rest_async.auth(token)
+        if sessao is None:
+            self.ambito = None
+        elif AMBITO_RLS == "partilhado":
+            self.ambito = "partilhado"
+        else:
+            self.ambito = ("utilizador", sessao.user.id)
+
+    def table(self, nome_tabela):
+        return self.rest.from_(nome_tabela)
+
+    def rpc(self, nome_funcao, params=None):
+        return self.rest.rpc(nome_funcao, params or {})
+
+    def entrar(self, email, password):
+        return self.auth.sign_in_with_password({"email": email, "password": password})
+
+    def sair(self):
+        """Termina a sessão SÓ neste cliente (as outras abas do mesmo utilizador continuam)."""
+        try:
+            self.auth.sign_out({"scope": "local"})
+        except Exception as e:
+            print(f"Erro ao fazer logout no Supabase: {e}")
+        self._on_auth_state_change("SIGNED_OUT", None)
+
+
+class PoolClientes:
+    """
+    Pool limitado de 'ClienteSessao'. Um cliente é adquirido no login e devolvido
+    no logout / fecho da sessão, ficando pronto (sem token) para o próximo login.
+    """
+
+    def __init__(self, maximo=MAX_CLIENTES_SESSAO):
+        self.maximo = maximo
+        self._livres = []
+        self._criados = 0
+        self._condicao = threading.Condition()
+
+    def adquirir(self, espera_segundos=ESPERA_POOL_SEGUNDOS):
+        limite = time.monotonic() + espera_segundos
+        with self._condicao:
+            while not self._livres and self._criados >= self.maximo:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    raise Exception("Servidor ocupado: limite de sessões simultâneas atingido. Tente novamente dentro de instantes.")
+                self._condicao.wait(restante)
+            if self._livres:
+                return self._livres.pop()
+            self._criados += 1
+
+        try:
+            return ClienteSessao()
+        except Exception:
+            with self._condicao:
+                self._criados -= 1
+                self._condicao.notify()
+            raise
+
+    def devolver(self, cliente):
+        cliente.sair()
+        with self._condicao:
+            self._livres.append(cliente)
+            self._condicao.notify()
+
+    def estado(self):
+        with self._condicao:
+            return {"criados": self._criados, "livres": len(self._livres), "maximo": self.maximo}
+
+
+pool_clientes = PoolClientes()
+
+
+def cliente_da_sessao(page):
+    """Devolve o 'ClienteSessao' da sessão Flet (None se não houver login)."""
+    return page.session.get("cliente_supabase")
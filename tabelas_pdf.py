@@ -0,0 +1,153 @@
+# tabelas_pdf.py
+# (Versão v1.2 - Tabelas PDF por Blocos)
+# (As alturas já medidas vão para a LongTable ('rowHeights'): o ReportLab não volta a medir as linhas)
+
+# Um único 'Table' com todas as linhas obriga o ReportLab a medir a tabela inteira de cada
+# vez que a parte numa página nova (tempo quadrático) e a ter todas as células em memória.
+# Aqui a tabela é um flowable "preguiçoso":
+#   - as linhas vêm de um iterador e são formatadas 'LINHAS_POR_BLOCO_PDF' de cada vez,
+#     só quando a página onde vão ficar está a ser composta;
+#   - em cada página é criada uma 'LongTable' só com as linhas que lá cabem; as que sobram
+#     passam para a seguinte. (O ReportLab mede TODAS as linhas que uma tabela recebe: uma
+#     tabela por página mantém esse custo proporcional à página, não ao relatório);
+#   - (v1.1) a altura de cada linha é calculada UMA vez, quando o bloco é formatado, e as
+#     linhas da página são contadas por essas alturas. Antes, cada página media tabelas
+#     candidatas e depois partia-as ('LongTable.split'), medindo os Paragraphs várias vezes
+#     e lendo o nº de linhas de um atributo privado do ReportLab ('_nrows');
+#   - (v1.2) essas alturas são passadas à LongTable da página ('rowHeights'): o ReportLab só
+#     mede o cabeçalho, e os Paragraphs só voltam a ser medidos quando são desenhados;
+#   - as páginas já desenhadas saem da 'story' e o ReportLab liberta-as.
+# No papel o resultado é igual ao de uma só tabela: o cabeçalho repete-se no topo de cada página.
+# Só importado pelos exportadores (dentro das funções): corre nos processos do fila_relatorios.
+
+import itertools
+import os
+
+from reportlab.platypus import Flowable, LongTable, TableStyle
+
+# Registos formatados de cada vez (não é o nº de linhas por página: esse é medido)
+LINHAS_POR_BLOCO_PDF = int(os.environ.get("SALC_PDF_LINHAS_POR_BLOCO", "200"))
+
+# (v1.1) Padding das células (os valores por omissão do ReportLab) e entrelinha do texto simples
+PADDING_HORIZONTAL = 6 + 6
+PADDING_VERTICAL = 3 + 3
+ENTRELINHA_POR_OMISSAO = 12
+
+
+def em_blocos(linhas, tamanho=LINHAS_POR_BLOCO_PDF):
+    """Gerador de listas com até 'tamanho' elementos de 'linhas' (qualquer iterável)."""
+    iterador = iter(linhas)
+    while True:
+        bloco = list(itertools.islice(iterador, tamanho))
+        if not bloco:
+            return
+        yield bloco
+
+
+class TabelaEmBlocos(Flowable):
+    """
+    Tabela com cabeçalho repetido, paginada aos blocos (usar no lugar de um 'Table').
+      - linhas: iterável com os registos (em bruto);
+      - formatar_bloco(registos): lista de registos -> lista de linhas da tabela (células);
+      - comandos_estilo: comandos de 'TableStyle', aplicados a cada página da tabela;
+      - ao_avancar(feitas): chamado depois de cada página, com o nº de linhas já paginadas.
+    """
+
+    def __init__(self, cabecalho, linhas, larguras, comandos_estilo, formatar_bloco=list,
+                 tamanho_bloco=LINHAS_POR_BLOCO_PDF, ao_avancar=None):
+        super().__init__()
+        self.cabecalho = cabecalho
+        self.larguras = larguras
+        self.comandos_estilo = comandos_estilo
+        self.ao_avancar = ao_avancar
+        self.tamanho_bloco = tamanho_bloco
+        self._blocos = (formatar_bloco(bloco) for bloco in em_blocos(linhas, tamanho_bloco))
+        self._pendentes = []  # Linhas já formatadas, ainda sem página
+        self._alturas = []  # (v1.1) Altura de cada linha pendente
+        self._feitas = 0
+        self._entrelinha = max(
+            [comando[3] for comando in comandos_estilo if comando[0] == 'LEADING'] or [ENTRELINHA_POR_OMISSAO]
+        )
+
+    def _encher(self, minimo=1):
+        """Garante pelo menos 'minimo' linhas formatadas (ou todas as que faltam)."""
+        while len(self._pendentes) < minimo:
+            bloco = next(self._blocos, None)
+            if bloco is None:
+                break
+            self._pendentes.extend(bloco)
+            self._alturas.extend(self._altura(linha) for linha in bloco)
+        return bool(self._pendentes)
+
+    def _altura(self, linha):
+        """
+        (v1.1) Altura de uma linha: a célula mais alta (Paragraph medido na largura da coluna;
+        texto simples, uma entrelinha por linha) mais o padding, como no 'Table._calc_height'
+        do ReportLab. (v1.2) É a altura com que a linha é desenhada ('_tabela').
+        """
+        altura = 0
+        for celula, largura in zip(linha, self.larguras):
+            if hasattr(celula, 'wrap'):
+                altura = max(altura, celula.wrap(largura - PADDING_HORIZONTAL, 1e9)[1])
+            else:
+                altura = max(altura, (str(celula).count('\n') + 1) * self._entrelinha)
+        return altura + PADDING_VERTICAL
+
+    def wrap(self, availWidth, availHeight):
+        # Com linhas por paginar, "não cabe" de propósito: o ReportLab chama 'split', que
+        # cria a tabela desta página. Sem linhas, não ocupa espaço nenhum.
+        # (Tabela sem linhas nenhumas: ainda assim mostra o cabeçalho, como um 'Table')
+        if self._encher() or self._feitas == 0:
+            return availWidth, availHeight + 1
+        return 0, 0
+
+    def _tabela(self, n):
+        """
+        LongTable com o cabeçalho e as primeiras 'n' linhas pendentes.
+        (v1.2) Com as alturas já medidas: só a do cabeçalho (None) é calculada pelo ReportLab.
+        """
+        tabela = LongTable([self.cabecalho] + self._pendentes[:n], repeatRows=1, colWidths=self.larguras,
+                           rowHeights=[None] + self._alturas[:n])
+        tabela.setStyle(TableStyle(self.comandos_estilo))
+        return tabela
+
+    def split(self, availWidth, availHeight):
+        if not self._encher():
+            if self._feitas == 0 and self._tabela(0).wrap(availWidth, availHeight)[1] <= availHeight:
+                return [self._tabela(0)]  # Só o cabeçalho (e este flowable sai da 'story')
+            return []
+        # Linhas que cabem debaixo do cabeçalho, pelas alturas já medidas
+        livre = availHeight - self._tabela(0).wrap(availWidth, availHeight)[1]
+        n = 0
+        while self._encher(n + 1) and n < len(self._pendentes) and self._alturas[n] <= livre:
+            livre -= self._alturas[n]
+            n += 1
+        # Confirmação pelo ReportLab: se a estimativa passou (por décimas), uma linha a menos
+        while n:
+            pagina = self._tabela(n)
+            if pagina.wrap(availWidth, availHeight)[1] <= availHeight:
+                break
+            n -= 1
+        if not n:
+            return []  # Nem o cabeçalho + 1 linha cabem: fim de página
+
+        del self._pendentes[:n]
+        del self._alturas[:n]
+        self._feitas += n
+        if self.ao_avancar:
+            self.ao_avancar(self._feitas)
+        return [pagina, self._resto()] if self._encher() else [pagina]
+
+    def _resto(self):
+        """
+        As linhas que faltam, num flowable NOVO (como o 'split' de um 'Table'): o ReportLab
+        marca os flowables que adiou de página, e este já pode ter sido adiado.
+        """
+        resto = TabelaEmBlocos(self.cabecalho, (), self.larguras, self.comandos_estilo,
+                               tamanho_bloco=self.tamanho_bloco, ao_avancar=self.ao_avancar)
+        resto._blocos, resto._pendentes, resto._alturas = self._blocos, self._pendentes, self._alturas
+        resto._feitas = self._feitas
+        return resto
+
+    def draw(self):
+        pass  # Só chega aqui já sem linhas (tamanho 0)
@@ -0,0 +1,73 @@
+# tests/test_tabelas_pdf.py
+# (Versão v1.0 - Testes das Tabelas PDF por Blocos)
+# (Um PDF de várias páginas tem todas as linhas, uma vez cada, e o cabeçalho no topo de cada página)
+#
+# Uso:   python -m unittest discover -s tests   (ou: python -m pytest tests)
+
+import os
+import re
+import tempfile
+import unittest
+
+from pdfminer.high_level import extract_pages
+from pdfminer.layout import LTTextContainer
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import Paragraph, SimpleDocTemplate
+
+from tabelas_pdf import TabelaEmBlocos
+
+TOTAL_LINHAS = 300
+
+
+def _linhas():
+    estilo = getSampleStyleSheet()['Normal']
+    for i in range(TOTAL_LINHAS):
+        # Algumas linhas com um Paragraph longo (várias linhas de texto): alturas diferentes
+        descricao = Paragraph(f"Descrição da linha {i} " + "texto " * 40, estilo) if i % 7 == 0 else f"Linha curta {i}"
+        yield [f"LINHA-{i:04d}", descricao]
+
+
+class TestTabelaEmBlocos(unittest.TestCase):
+
+    def test_pdf_com_varias_paginas(self):
+        feitas = []
+        with tempfile.TemporaryDirectory() as pasta:
+            destino = os.path.join(pasta, "tabela.pdf")
+            tabela = TabelaEmBlocos(
+                ["CABECALHO-ID", "CABECALHO-DESCRICAO"], _linhas(), [100, 300],
+                [('VALIGN', (0, 0), (-1, -1), 'TOP')],
+                tamanho_bloco=50, ao_avancar=feitas.append,
+            )
+            SimpleDocTemplate(destino, pagesize=letter).build([tabela])
+
+            paginas = []
+            for pagina in extract_pages(destino):
+                paginas.append("".join(
+                    elemento.get_text() for elemento in pagina if isinstance(elemento, LTTextContainer)
+                ))
+
+        self.assertGreater(len(paginas), 3)
+        for numero, texto in enumerate(paginas, start=1):
+            self.assertIn("CABECALHO-ID", texto, f"Página {numero} sem cabeçalho")
+            self.assertIn("CABECALHO-DESCRICAO", texto, f"Página {numero} sem cabeçalho")
+
+        ids = re.findall(r"LINHA-(\d{4})", "".join(paginas))
+        self.assertEqual([int(i) for i in ids], list(range(TOTAL_LINHAS)))
+        self.assertEqual(feitas[-1], TOTAL_LINHAS)
+
+    def test_tabela_sem_linhas_mostra_o_cabecalho(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            destino = os.path.join(pasta, "vazia.pdf")
+            SimpleDocTemplate(destino, pagesize=letter).build(
+                [TabelaEmBlocos(["CABECALHO-ID"], [], [100], [])]
+            )
+            texto = "".join(
+                elemento.get_text() for pagina in extract_pages(destino)
+                for elemento in pagina if isinstance(elemento, LTTextContainer)
+            )
+        self.assertIn("CABECALHO-ID", texto)
+
+
+if __name__ == "__main__":
+    unittest.main()
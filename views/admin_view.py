@@ -1,12 +1,16 @@
 # views/admin_view.py
-# (Versão Refatorada v1.5 - Layout Moderno)
-# (Corrige a lógica de exibição de 'Quem' nos logs)
+# (Versão Refatorada v1.10 - Layout Moderno)
+# (Aviso do Realtime corrido no loop da sessão: a leitura das seções vai para uma thread)
 
 import flet as ft
-from supabase_client import supabase, supabase_admin
+import asyncio
+from supabase_client import supabase_admin
+from cache_global import cache_global
 from supabase_auth.errors import AuthApiError
 import traceback
 from datetime import datetime
+from views.tabela_chaveada import TabelaChaveada
+from views.frescura import Frescura
 
 class AdminView(ft.Row): 
     """
@@ -26,14 +30,19 @@ class AdminView(ft.Row):
         
         # --- Controlos de Utilizadores ---
         self.progress_ring_users = ft.ProgressRing(visible=True, width=32, height=32)
-        self.tabela_users = ft.DataTable(
+        # (v1.9) Idade dos dados mostrados (ver views/frescura.py)
+        self.frescura = Frescura()
+        # (v1.8) Linhas chaveadas pelo id do utilizador (ver views/tabela_chaveada.py)
+        self.tabela_users = TabelaChaveada(
+            construir_linha=self._construir_linha_user,
+            chave=lambda user: user['id_usuario'],
+            texto_vazio="Nenhum perfil de utilizador encontrado.",
             columns=[
                 ft.DataColumn(ft.Text("Login (Email)", weight=ft.FontWeight.BOLD)),
                 ft.DataColumn(ft.Text("Nome Completo", weight=ft.FontWeight.BOLD)),
                 ft.DataColumn(ft.Text("Função", weight=ft.FontWeight.BOLD)), 
                 ft.DataColumn(ft.Text("Ações", weight=ft.FontWeight.BOLD)),
             ],
-            rows=[],
             expand=True,
             border=ft.border.all(1, "grey200"),
             border_radius=8,
@@ -54,13 +63,14 @@ class AdminView(ft.Row):
         
         # --- Controlos de Logs ---
         self.progress_ring_logs = ft.ProgressRing(visible=True, width=32, height=32)
-        self.tabela_logs = ft.DataTable(
+        self.tabela_logs = TabelaChaveada(
+            construir_linha=self._construir_linha_log,
+            texto_vazio="Nenhum log de auditoria encontrado.",
             columns=[
                 ft.DataColumn(ft.Text("Quando", weight=ft.FontWeight.BOLD)),
                 ft.DataColumn(ft.Text("Quem", weight=ft.FontWeight.BOLD)), 
                 ft.DataColumn(ft.Text("Ação", weight=ft.FontWeight.BOLD)),
             ],
-            rows=[],
             expand=True,
             border=ft.border.all(1, "grey200"),
             border_radius=8,
@@ -160,10 +170,7 @@ class AdminView(ft.Row):
                         ft.Row(
                             [
                                 ft.Text("Gestão de Seções", size=20, weight=ft.FontWeight.W_600),
-                                ft.Row([
-                                    ft.IconButton(icon="REFRESH", on_click=self.load_secoes_wrapper, tooltip="Recarregar Lista"),
-                                    self.progress_ring_secoes,
-                                ])
+                                self.progress_ring_secoes,
                             ],
                             alignment=ft.MainAxisAlignment.SPACE_BETWEEN
                         ),
@@ -241,7 +248,12 @@ class AdminView(ft.Row):
         
     def on_view_mount(self, e):
         """Chamado pelo Flet DEPOIS que o controlo é adicionado à página."""
-        print("AdminView: Controlo montado. A carregar dados...")
+        # (v1.9) Utilizadores, seções e logs mantêm-se entre abas: só recarrega se estiverem velhos
+        if self.frescura.precisa_revalidar():
+            print("AdminView: Controlo montado. A revalidar dados...")
+            self.frescura.revalidar_agora(self._carregar_tudo)
+
+    def _carregar_tudo(self):
         self.load_users()
         self.load_secoes()
         self.load_logs() 
@@ -255,6 +267,34 @@ class AdminView(ft.Row):
         """Wrapper para o botão de refresh."""
         self.load_users()
 
+    def _construir_linha_user(self, user):
+        user_id = user["id_usuario"]
+        login_name = user["login"]
+        return ft.DataRow(
+            data=user_id, 
+            cells=[
+                ft.DataCell(ft.Text(login_name, tooltip=user["email"])), 
+                ft.DataCell(ft.Text(user["nome_completo"])), 
+                ft.DataCell(ft.Text(user["funcao"])), 
+                ft.DataCell(
+                    ft.Row([
+                        ft.IconButton(
+                            icon="EDIT", 
+                            tooltip="Editar Função", 
+                            icon_color="blue700", 
+                            on_click=self.on_action_not_implemented
+                        ),
+                        ft.IconButton(
+                            icon="DELETE", 
+                            tooltip="Excluir Utilizador", 
+                            icon_color="red700", 
+                            on_click=lambda e, u_id=user_id, u_login=login_name: self.open_confirm_delete_user(u_id, u_login)
+                        ),
+                    ])
+                ),
+            ]
+        )
+
     def load_users(self):
         print("AdminView: A carregar lista de utilizadores (Modo Admin)...")
         self.progress_ring_users.visible = True
@@ -266,52 +306,26 @@ class AdminView(ft.Row):
             
             resposta_perfis = supabase_admin.table('perfis_usuarios').select('*').execute()
             
-            self.tabela_users.rows.clear()
             self.user_id_to_login_map.clear() 
             
-            if resposta_perfis.data:
-                for profile in resposta_perfis.data:
-                    user_id = profile.get('id_usuario')
-                    user_email = auth_users_map.get(user_id, "Email não encontrado")
-                    login_name = user_email.replace("@salc.com", "")
-                    nome_completo = profile.get('nome_completo', 'Nome Desconhecido')
-                    
-                    # Popula o mapa com o LOGIN
-                    self.user_id_to_login_map[user_id] = login_name 
-
-                    self.tabela_users.rows.append(
-                        ft.DataRow(
-                            data=user_id, 
-                            cells=[
-                                ft.DataCell(ft.Text(login_name, tooltip=user_email)), 
-                                ft.DataCell(ft.Text(nome_completo)), 
-                                ft.DataCell(ft.Text(profile.get('funcao', 'N/A'))), 
-                                ft.DataCell(
-                                    ft.Row([
-                                        ft.IconButton(
-                                            icon="EDIT", 
-                                            tooltip="Editar Função", 
-                                            icon_color="blue700", 
-                                            on_click=self.on_action_not_implemented
-                                        ),
-                                        ft.IconButton(
-                                            icon="DELETE", 
-                                            tooltip="Excluir Utilizador", 
-                                            icon_color="red700", 
-                                            on_click=lambda e, u_id=user_id, u_login=login_name: self.open_confirm_delete_user(u_id, u_login)
-                                        ),
-                                    ])
-                                ),
-                            ]
-                        )
-                    )
-            else:
-                self.tabela_users.rows.append(
-                    ft.DataRow(cells=[
-                        ft.DataCell(ft.Text("Nenhum perfil de utilizador encontrado.", italic=True)),
-                        ft.DataCell(ft.Text("")), ft.DataCell(ft.Text("")), ft.DataCell(ft.Text("")),
-                    ])
-                )
+            users = []
+            for profile in (resposta_perfis.data or []):
+                user_id = profile.get('id_usuario')
+                user_email = auth_users_map.get(user_id, "Email não encontrado")
+                login_name = user_email.replace("@salc.com", "")
+                
+                # Popula o mapa com o LOGIN
+                self.user_id_to_login_map[user_id] = login_name 
+
+                users.append({
+                    "id_usuario": user_id,
+                    "email": user_email,
+                    "login": login_name,
+                    "nome_completo": profile.get('nome_completo', 'Nome Desconhecido'),
+                    "funcao": profile.get('funcao', 'N/A'),
+                })
+            # (v1.8) Reaproveita as linhas dos utilizadores que não mudaram
+            self.tabela_users.sincronizar(users)
             
             print("AdminView: Utilizadores carregados com sucesso (Modo Admin).")
 
@@ -325,8 +339,14 @@ class AdminView(ft.Row):
             self.update()
 
     # --- Funções de Gestão de Seções (sem alteração) ---
-    def load_secoes_wrapper(self, e):
-        self.load_secoes()
+    async def on_realtime_change(self, tabelas):
+        """
+        (v1.7) Chamado pelo main.py quando o Realtime avisa de alterações
+        (substitui o antigo botão REFRESH das seções).
+        (v1.10) Corre no loop da sessão: a consulta (síncrona) vai para uma thread.
+        """
+        if "secoes" in tabelas:
+            await asyncio.to_thread(self.load_secoes)
 
     def load_secoes(self):
         print("AdminView: A carregar lista de seções...")
@@ -379,6 +399,7 @@ class AdminView(ft.Row):
 
         try:
             supabase_admin.table('secoes').insert({"nome": nome_secao}).execute()
+            cache_global.invalidar("secoes_map")
             
             self.show_success_snackbar(f"Seção '{nome_secao}' adicionada!")
             self.txt_nova_secao.value = ""
@@ -401,6 +422,7 @@ class AdminView(ft.Row):
         
         try:
             supabase_admin.table('secoes').delete().eq('id', secao_id).execute()
+            cache_global.invalidar("secoes_map")
             self.show_success_snackbar("Seção apagada com sucesso.")
             self.load_secoes()
             self.load_logs() # Recarrega os logs
@@ -418,6 +440,15 @@ class AdminView(ft.Row):
         self.load_users()
         self.load_logs()
         
+    def _construir_linha_log(self, log):
+        return ft.DataRow(
+            cells=[
+                ft.DataCell(ft.Text(log["quando"])),
+                ft.DataCell(ft.Text(log["quem"])),
+                ft.DataCell(ft.Text(log["acao"], tooltip=f"Record ID: {log['record_id']}")),
+            ]
+        )
+
     def load_logs(self):
         """Carrega os logs de auditoria mais recentes."""
         # Esta função AGORA assume que 'self.user_id_to_login_map' está preenchido
@@ -437,41 +468,30 @@ class AdminView(ft.Row):
                                      .limit(50) \
                                      .execute()
             
-            self.tabela_logs.rows.clear()
-            
-            if resposta.data:
-                for log in resposta.data:
-                    quando_dt = datetime.fromisoformat(log['created_at'])
-                    quando_str = quando_dt.strftime('%d/%m/%y %H:%M')
-                    
-                    user_id = log.get('user_id')
-                    
-                    # Lógica de 'Quem' melhorada
-                    if user_id:
-                        # Tenta buscar o login no mapa
-                        quem_str = self.user_id_to_login_map.get(user_id, f"ID: ...{str(user_id)[-6:]}") # Mostra ID encurtado se não achar
-                    else:
-                        # Se user_id for None
-                        quem_str = "Sistema" # Ação provavelmente foi via service_role
-                    
-                    acao_str = f"{log.get('action', 'AÇÃO')} em {log.get('target_table', 'tabela')}"
-                    
-                    self.tabela_logs.rows.append(
-                        ft.DataRow(
-                            cells=[
-                                ft.DataCell(ft.Text(quando_str)),
-                                ft.DataCell(ft.Text(quem_str)),
-                                ft.DataCell(ft.Text(acao_str, tooltip=f"Record ID: {log.get('record_id')}")),
-                            ]
-                        )
-                    )
-            else:
-                self.tabela_logs.rows.append(
-                    ft.DataRow(cells=[
-                        ft.DataCell(ft.Text("Nenhum log de auditoria encontrado.", italic=True)),
-                        ft.DataCell(ft.Text("")), ft.DataCell(ft.Text("")),
-                    ])
-                )
+            logs = []
+            for log in (resposta.data or []):
+                quando_dt = datetime.fromisoformat(log['created_at'])
+                quando_str = quando_dt.strftime('%d/%m/%y %H:%M')
+                
+                user_id = log.get('user_id')
+                
+                # Lógica de 'Quem' melhorada
+                if user_id:
+                    # Tenta buscar o login no mapa
+                    quem_str = self.user_id_to_login_map.get(user_id, f"ID: ...{str(user_id)[-6:]}") # Mostra ID encurtado se não achar
+                else:
+                    # Se user_id for None
+                    quem_str = "Sistema" # Ação provavelmente foi via service_role
+                
+                logs.append({
+                    "id": log.get('id') or log['created_at'],
+                    "quando": quando_str,
+                    "quem": quem_str,
+                    "acao": f"{log.get('action', 'AÇÃO')} em {log.get('target_table', 'tabela')}",
+                    "record_id": log.get('record_id'),
+                })
+            # (v1.8) Um log novo = uma linha nova enviada (as restantes são reaproveitadas)
+            self.tabela_logs.sincronizar(logs)
             
             print("AdminView: Logs carregados com sucesso.")
 
@@ -1,11 +1,14 @@
 # views/dashboard_view.py
-# (Versão Refatorada v1.2 - Layout Moderno)
-# (Organiza a UI em Cards)
+# (Versão Refatorada v1.11 - Layout Moderno)
+# (Ao voltar à aba mostra logo os últimos dados; só revalida se estiverem velhos)
 
 import flet as ft
 import traceback 
-from supabase_client import supabase # Cliente 'anon'
-from datetime import datetime, timedelta
+import repositorio
+from supabase_client import cliente_da_sessao
+from datetime import datetime
+from views.tabela_chaveada import TabelaChaveada
+from views.frescura import Frescura
 
 class DashboardView(ft.Column):
     """
@@ -25,9 +28,18 @@ class DashboardView(ft.Column):
         # self.scroll = ft.ScrollMode.ADAPTIVE 
         
         self.progress_ring = ft.ProgressRing(visible=True, width=32, height=32)
+        # (v1.11) Idade dos dados mostrados (ver views/frescura.py)
+        self.frescura = Frescura()
         self.txt_saldo_total = ft.Text("R$ 0,00", size=32, weight=ft.FontWeight.BOLD)
+        # (v1.8) Detalhe do KPI: nº de NCs e totais por status (vêm da mesma RPC)
+        self.txt_quantidade_ncs = ft.Text("", italic=True)
+        self.linha_por_status = ft.Row(wrap=True, spacing=20)
         
-        self.tabela_vencendo = ft.DataTable(
+        # (v1.10) Linhas chaveadas pelo número da NC (ver views/tabela_chaveada.py)
+        self.tabela_vencendo = TabelaChaveada(
+            construir_linha=self._construir_linha_vencendo,
+            chave=lambda nc: nc['numero_nc'],
+            texto_vazio="Nenhuma NC a vencer nos próximos 7 dias.",
             columns=[
                 ft.DataColumn(ft.Text("Número NC", weight=ft.FontWeight.BOLD)),
                 ft.DataColumn(ft.Text("Prazo Empenho", weight=ft.FontWeight.BOLD)),
@@ -36,7 +48,6 @@ class DashboardView(ft.Column):
                 ft.DataColumn(ft.Text("Valor Inicial", weight=ft.FontWeight.BOLD), numeric=True),
                 ft.DataColumn(ft.Text("Saldo Disponível", weight=ft.FontWeight.BOLD), numeric=True),
             ],
-            rows=[], 
             expand=True,
             border=ft.border.all(1, "grey200"),
             border_radius=8,
@@ -82,17 +93,12 @@ class DashboardView(ft.Column):
                 padding=20,
                 content=ft.Column(
                     [
-                        # 1. Título do Card (com refresh)
+                        # 1. Título do Card
                         ft.Row(
                             [
                                 ft.Text("Saldo Disponível Total", size=20, weight="w600"),
                                 ft.Row([
                                     self.btn_limpar_filtros,
-                                    ft.IconButton(
-                                        icon="REFRESH", 
-                                        on_click=self.load_dashboard_data_wrapper, 
-                                        tooltip="Recarregar e Aplicar Filtros"
-                                    ),
                                     self.progress_ring,
                                 ])
                             ],
@@ -101,7 +107,10 @@ class DashboardView(ft.Column):
                         
                         # 2. O Saldo (o KPI)
                         ft.Container(
-                            content=self.txt_saldo_total,
+                            content=ft.Column(
+                                [self.txt_saldo_total, self.txt_quantidade_ncs, self.linha_por_status],
+                                spacing=5
+                            ),
                             padding=ft.padding.only(top=10, bottom=20)
                         ),
 
@@ -156,9 +165,14 @@ class DashboardView(ft.Column):
         
     def on_view_mount(self, e):
         """Chamado pelo Flet DEPOIS que o controlo é adicionado à página."""
-        print("DashboardView: Controlo montado. A carregar dados...")
-        self.load_filter_options()
-        self.load_dashboard_data(None)
+        # (v1.11) Os controlos guardam os últimos dados: só revalida se estiverem velhos
+        if self.frescura.precisa_revalidar():
+            print("DashboardView: Controlo montado. A revalidar dados...")
+            self.page.run_task(self.revalidar)
+
+    async def revalidar(self):
+        """(v1.11) Recarrega os dados (também usado no pré-carregamento após o login)."""
+        await self.frescura.revalidar(self.load_dashboard_data, None)
         
     def show_error(self, message):
         """Exibe o modal de erro global."""
@@ -185,133 +199,94 @@ class DashboardView(ft.Column):
         except (ValueError, TypeError):
             return "R$ 0,00"
 
-    def load_filter_options(self, pi_selecionado=None):
+    def preencher_filtros(self, pis, nds):
         """
-        Preenche os dropdowns de filtro PI e ND.
+        (v1.9) Preenche os dropdowns PI e ND com as listas que vêm no snapshot
+        do Dashboard (as NDs já vêm restritas ao PI escolhido).
         """
-        try:
-            if pi_selecionado is None:
-                print("Dashboard: A carregar opções de filtro (PIs e NDs)...")
-                pis = supabase.rpc('get_distinct_pis').execute() 
-                self.filtro_pi.options.clear()
-                self.filtro_pi.options.append(ft.dropdown.Option(text="Todos os PIs", key=None))
-                if pis.data:
-                    for pi in sorted(pis.data):
-                        if pi: self.filtro_pi.options.append(ft.dropdown.Option(text=pi, key=pi))
-                
-                nds = supabase.rpc('get_distinct_nds').execute()
-                self.filtro_nd.options.clear()
-                self.filtro_nd.options.append(ft.dropdown.Option(text="Todas as NDs", key=None))
-                if nds.data:
-                    for nd in sorted(nds.data):
-                        if nd: self.filtro_nd.options.append(ft.dropdown.Option(text=nd, key=nd))
-                print("Dashboard: Opções de filtro iniciais carregadas.")
-            
-            else:
-                print(f"Dashboard: A carregar NDs para o PI: {pi_selecionado}...")
-                self.filtro_nd.disabled = True
-                self.filtro_nd.update()
-                nds = supabase.rpc('get_distinct_nds_for_pi', {'p_pi': pi_selecionado}).execute()
-                self.filtro_nd.options.clear()
-                self.filtro_nd.options.append(ft.dropdown.Option(text="Todas as NDs", key=None))
-                if nds.data:
-                    for nd in sorted(nds.data):
-                         if nd: self.filtro_nd.options.append(ft.dropdown.Option(text=nd, key=nd))
-                print("Dashboard: Filtro ND atualizado.")
-            
-            self.filtro_nd.disabled = False
-            
-            if pi_selecionado is None:
-                self.update() 
+        self.filtro_pi.options = [ft.dropdown.Option(text="Todos os PIs", key=None)] + [
+            ft.dropdown.Option(text=pi, key=pi) for pi in pis if pi
+        ]
+        self.filtro_nd.options = [ft.dropdown.Option(text="Todas as NDs", key=None)] + [
+            ft.dropdown.Option(text=nd, key=nd) for nd in nds if nd
+        ]
+        self.filtro_nd.disabled = False
 
-        except Exception as ex:
-            print("--- ERRO CRÍTICO (TRACEBACK) NO DASHBOARD [load_filter_options] ---")
-            traceback.print_exc()
-            print("------------------------------------------------------------------")
-            
-            print(f"Erro ao carregar opções de filtro no Dashboard: {ex}")
-            self.handle_db_error(ex, "carregar filtros do Dashboard")
+    async def on_pi_filter_change(self, e):
+        """
+        Recarrega os dados do Dashboard (o snapshot traz as NDs do novo PI).
+        """
+        await self.load_dashboard_data(None) 
+
+    async def load_dashboard_data_wrapper(self, e):
+        """Função "wrapper" para os eventos dos filtros."""
+        await self.load_dashboard_data(e)
 
-    def on_pi_filter_change(self, e):
+    def on_realtime_change(self, tabelas):
         """
-        Recarrega as opções de ND e depois recarrega os dados do Dashboard.
+        (v1.5) Chamado pelo main.py quando o Realtime avisa de alterações
+        (substitui o antigo botão REFRESH).
+        (v1.9) O Realtime já invalidou os snapshots: basta pedir um novo.
         """
-        pi_val = self.filtro_pi.value if self.filtro_pi.value else None
-        self.filtro_nd.value = None
-        self.load_filter_options(pi_selecionado=pi_val)
-        self.load_dashboard_data(None) 
+        if tabelas & {"notas_de_credito", "notas_de_empenho", "recolhimentos_de_saldo"}:
+            self.page.run_task(self.load_dashboard_data, None)
 
-    def load_dashboard_data_wrapper(self, e):
-        """Função "wrapper" para o botão recarregar."""
-        self.load_dashboard_data(e)
+    def _construir_linha_vencendo(self, nc):
+        saldo_nc = float(nc['saldo_disponivel'])
+        data_formatada = datetime.fromisoformat(nc['data_validade_empenho']).strftime('%d/%m/%Y')
+        return ft.DataRow(
+            cells=[
+                ft.DataCell(ft.Text(nc['numero_nc'])),
+                ft.DataCell(ft.Text(data_formatada)),
+                ft.DataCell(ft.Text(nc['pi'])),
+                ft.DataCell(ft.Text(nc['natureza_despesa'])),
+                ft.DataCell(ft.Text(self.formatar_moeda(nc['valor_inicial']))),
+                ft.DataCell(ft.Text(self.formatar_moeda(saldo_nc))),
+            ]
+        )
 
-    def load_dashboard_data(self, e):
+    async def load_dashboard_data(self, e):
         """
         Busca os dados no Supabase e atualiza os controlos da UI.
         Aplica filtros APENAS ao cálculo do saldo total.
+        (v1.6) Corrotina: não bloqueia a sessão.
+        (v1.9) Um único pedido (snapshot), guardado por combinação de filtros.
         """
         print("Dashboard: A carregar dados com filtros...")
         self.progress_ring.visible = True
         self.page.update()
 
         try:
-            # --- 1. Buscar Saldo Total (COM FILTROS) ---
-            query_saldo = supabase.table('ncs_com_saldos').select('saldo_disponivel')
-            
-            if self.filtro_status.value:
-                query_saldo = query_saldo.eq('status_calculado', self.filtro_status.value)
-            if self.filtro_pi.value:
-                query_saldo = query_saldo.eq('pi', self.filtro_pi.value)
-            if self.filtro_nd.value:
-                query_saldo = query_saldo.eq('natureza_despesa', self.filtro_nd.value)
-
-            resposta_saldo = query_saldo.execute()
-            
-            saldo_total = 0.0
-            if resposta_saldo.data:
-                saldo_total = sum(float(item['saldo_disponivel']) for item in resposta_saldo.data)
-            
-            self.txt_saldo_total.value = self.formatar_moeda(saldo_total)
-            
-            # --- 2. Buscar NCs a Vencer (Ponto 3) ---
-            hoje = datetime.now().date()
-            em_7_dias = hoje + timedelta(days=7)
+            # --- 1 e 2. Resumo dos Saldos (COM FILTROS), NCs a Vencer (Ponto 3) e listas de filtros ---
+            # (v1.8) A soma é feita no servidor: a resposta não cresce com o nº de NCs
+            snapshot = await repositorio.carregar_snapshot_dashboard(
+                cliente_da_sessao(self.page),
+                status=self.filtro_status.value,
+                pi=self.filtro_pi.value,
+                nd=self.filtro_nd.value,
+            )
+            if self.filtro_nd.value and self.filtro_nd.value not in snapshot["nds"]:
+                # A ND escolhida não existe para o novo PI: limpa-a e pede de novo
+                self.filtro_nd.value = None
+                snapshot = await repositorio.carregar_snapshot_dashboard(
+                    cliente_da_sessao(self.page),
+                    status=self.filtro_status.value,
+                    pi=self.filtro_pi.value,
+                )
+            self.preencher_filtros(snapshot["pis"], snapshot["nds"])
+            resumo = snapshot["resumo"]
+            ncs_a_vencer = snapshot["a_vencer"]
             
-            resposta_vencendo = supabase.table('ncs_com_saldos') \
-                                        .select('numero_nc, data_validade_empenho, saldo_disponivel, pi, natureza_despesa, valor_inicial') \
-                                        .filter('status_calculado', 'eq', 'Ativa') \
-                                        .filter('data_validade_empenho', 'gte', hoje.isoformat()) \
-                                        .filter('data_validade_empenho', 'lte', em_7_dias.isoformat()) \
-                                        .order('data_validade_empenho', desc=False) \
-                                        .execute()
+            self.txt_saldo_total.value = self.formatar_moeda(resumo["saldo_total"])
+            self.txt_quantidade_ncs.value = f"{resumo['quantidade']} NC(s) com estes filtros"
+            self.linha_por_status.controls = [
+                ft.Text(f"{status}: {self.formatar_moeda(totais.get('saldo'))} ({totais.get('quantidade', 0)})", size=12)
+                for status, totais in sorted(resumo["por_status"].items())
+            ]
 
             # --- 3. Preencher a Tabela "A Vencer" ---
-            self.tabela_vencendo.rows.clear()
-            if resposta_vencendo.data:
-                for nc in resposta_vencendo.data:
-                    saldo_nc = float(nc['saldo_disponivel'])
-                    data_formatada = datetime.fromisoformat(nc['data_validade_empenho']).strftime('%d/%m/%Y')
-                    self.tabela_vencendo.rows.append(
-                        ft.DataRow(
-                            cells=[
-                                ft.DataCell(ft.Text(nc['numero_nc'])),
-                                ft.DataCell(ft.Text(data_formatada)),
-                                ft.DataCell(ft.Text(nc['pi'])),
-                                ft.DataCell(ft.Text(nc['natureza_despesa'])),
-                                ft.DataCell(ft.Text(self.formatar_moeda(nc['valor_inicial']))),
-                                ft.DataCell(ft.Text(self.formatar_moeda(saldo_nc))),
-                            ]
-                        )
-                    )
-            else:
-                self.tabela_vencendo.rows.append(
-                    ft.DataRow(cells=[
-                        ft.DataCell(ft.Text("Nenhuma NC a vencer nos próximos 7 dias.", italic=True)),
-                        ft.DataCell(ft.Text("")), ft.DataCell(ft.Text("")),
-                        ft.DataCell(ft.Text("")), ft.DataCell(ft.Text("")),
-                        ft.DataCell(ft.Text("")), 
-                    ])
-                )
+            # (v1.10) Só as NCs novas/alteradas geram linhas novas
+            self.tabela_vencendo.sincronizar(ncs_a_vencer)
 
             print("Dashboard: Dados carregados com sucesso.")
 
@@ -327,7 +302,7 @@ class DashboardView(ft.Column):
             self.progress_ring.visible = False
             self.page.update()
         
-    def limpar_filtros(self, e):
+    async def limpar_filtros(self, e):
         """
         Limpa os filtros do saldo e recarrega os dados.
         """
@@ -336,8 +311,7 @@ class DashboardView(ft.Column):
         self.filtro_nd.value = None
         self.filtro_status.value = "Ativa" # Volta ao default
         
-        self.load_filter_options(pi_selecionado=None) 
-        self.load_dashboard_data(None)
+        await self.load_dashboard_data(None)
         self.page.update()
 
 # --- Função de Nível Superior (Obrigatória) ---
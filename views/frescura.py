@@ -0,0 +1,61 @@
+# views/frescura.py
+# (Versão v1.0 - Dados das Views "Stale-While-Revalidate")
+# (Cada view mantém os seus dados entre mudanças de aba e só os pede de novo quando ficam velhos)
+
+import os
+import time
+
+# Idade (segundos) a partir da qual os dados de uma view são pedidos de novo ao montar
+IDADE_MAXIMA_SEGUNDOS = int(os.environ.get("SALC_IDADE_MAXIMA_VIEW", "60"))
+
+
+class Frescura:
+    """
+    Regista quando os dados de uma view foram carregados.
+    Ao voltar a uma aba, a view mostra logo o que já tem (os controlos não são
+    destruídos) e só revalida se os dados tiverem mais de 'idade_maxima' segundos
+    ou se tiverem sido invalidados (ex: o Realtime avisou enquanto a aba estava escondida).
+    """
+
+    def __init__(self, idade_maxima=IDADE_MAXIMA_SEGUNDOS):
+        self.idade_maxima = idade_maxima
+        self._carregado_em = None
+        self._versao = 0
+        self._em_curso = False
+
+    def precisa_revalidar(self):
+        if self._em_curso:
+            return False  # Já há um carregamento a caminho (ex: o pré-carregamento do login)
+        if self._carregado_em is None:
+            return True
+        return (time.monotonic() - self._carregado_em) >= self.idade_maxima
+
+    def invalidar(self):
+        """Os dados mudaram: o próximo 'on_mount' recarrega (mesmo a meio de um carregamento)."""
+        self._versao += 1
+        self._carregado_em = None
+
+    def _concluir(self, versao, inicio):
+        # Só marca como frescos se ninguém invalidou durante o carregamento
+        if versao == self._versao:
+            self._carregado_em = inicio
+
+    async def revalidar(self, carregar, *args):
+        """Corre a corrotina 'carregar(*args)' e marca os dados como frescos."""
+        versao, inicio = self._versao, time.monotonic()
+        self._em_curso = True
+        try:
+            await carregar(*args)
+        finally:
+            self._em_curso = False
+        self._concluir(versao, inicio)
+
+    def revalidar_agora(self, carregar, *args):
+        """Igual a 'revalidar', para views cujos carregamentos são síncronos."""
+        versao, inicio = self._versao, time.monotonic()
+        self._em_curso = True
+        try:
+            carregar(*args)
+        finally:
+            self._em_curso = False
+        self._concluir(versao, inicio)
@@ -1,20 +1,26 @@
 # views/ncs_view.py
-# (Versão Refatorada v1.6 - Layout Moderno)
-# (Adiciona todos os campos orçamentários ao modal "Quick View")
+# (Versão Refatorada v1.21 - Layout Moderno)
+# (Aviso do Realtime corrido no loop da sessão; uma atualização no sítio mais antiga nunca sobrepõe a mais recente)
+# (v1.21) Erros da pesquisa enquanto se escreve mostrados com 'handle_db_error' (ver pesquisa_adiada v1.2)
 
 import flet as ft
-from supabase_client import supabase # Cliente 'anon'
+from supabase_client import cliente_da_sessao
+import repositorio
+from cache_global import cache_global, nds_para_pi, nd_valida_para_pi
 from datetime import datetime
 import traceback 
+from views.tabela_chaveada import LinhasChaveadas
+from views.pesquisa_adiada import PesquisaAdiada, indice_do_cache
+from views.frescura import Frescura
+from limpeza_ficheiros import zelador_ficheiros
 
-import io       
-import httpx    
 import os       
-
-# --- IMPORTAÇÕES PARA PDF ---
-import pdfplumber
 import re
-# ----------------------------
+# (v1.16) 'pdfplumber' é importado em '_parse_siafi_pdf' (só quando é preciso)
+
+# (v1.12) Lista virtualizada: altura fixa por linha e distância ao fim (px) que pede a página seguinte
+ALTURA_LINHA_NC = 48
+LIMIAR_SCROLL_PX = 300
 
 class NcsView(ft.Column):
     """
@@ -36,26 +42,51 @@ class NcsView(ft.Column):
         self.spacing = 20
         
         self.progress_ring = ft.ProgressRing(visible=True, width=32, height=32)
+        # (v1.15) Idade da lista mostrada (ver views/frescura.py)
+        self.frescura = Frescura()
         
         self.file_picker_import = ft.FilePicker(
             on_result=self.on_file_picker_result,
             on_upload=self.on_upload_progress 
         )
         
-        self.tabela_ncs = ft.DataTable(
-            columns=[
-                ft.DataColumn(ft.Text("Número NC", weight=ft.FontWeight.BOLD)),
-                ft.DataColumn(ft.Text("PI", weight=ft.FontWeight.BOLD)),
-                ft.DataColumn(ft.Text("ND", weight=ft.FontWeight.BOLD)),
-                ft.DataColumn(ft.Text("Valor Inicial", weight=ft.FontWeight.BOLD), numeric=True),
-                ft.DataColumn(ft.Text("Saldo Disp.", weight=ft.FontWeight.BOLD), numeric=True),
-                ft.DataColumn(ft.Text("Ações", weight=ft.FontWeight.BOLD)),
-            ], 
-            rows=[], 
-            expand=True, 
-            border=ft.border.all(1, "grey200"), 
-            border_radius=8,
+        # (v1.12) Cabeçalho + ListView virtualizado (substitui a DataTable, que
+        # construía TODAS as linhas). As páginas seguintes chegam com o scroll.
+        self.cabecalho_ncs = ft.Container(
+            padding=ft.padding.symmetric(horizontal=10, vertical=8),
+            border=ft.border.only(bottom=ft.border.BorderSide(1, "grey400")),
+            content=ft.Row(
+                [
+                    ft.Text("Número NC", weight=ft.FontWeight.BOLD, expand=2),
+                    ft.Text("PI", weight=ft.FontWeight.BOLD, expand=2),
+                    ft.Text("ND", weight=ft.FontWeight.BOLD, expand=1),
+                    ft.Text("Valor Inicial", weight=ft.FontWeight.BOLD, expand=2, text_align=ft.TextAlign.RIGHT),
+                    ft.Text("Saldo Disp.", weight=ft.FontWeight.BOLD, expand=2, text_align=ft.TextAlign.RIGHT),
+                    ft.Container(ft.Text("Ações", weight=ft.FontWeight.BOLD), width=60),
+                ]
+            ),
         )
+        self.lista_ncs = ft.ListView(
+            expand=True,
+            item_extent=ALTURA_LINHA_NC,
+            on_scroll=self.on_lista_ncs_scroll,
+            on_scroll_interval=100,
+        )
+        # (v1.13) Linhas chaveadas pelo id da NC (ver views/tabela_chaveada.py)
+        self.linhas_ncs = LinhasChaveadas(self._construir_linha_nc)
+        self.btn_carregar_mais_ncs = ft.TextButton(
+            "Carregar mais NCs",
+            icon="EXPAND_MORE",
+            visible=False,
+            on_click=self.carregar_mais_ncs,
+        )
+        
+        # Estado da paginação
+        self._cursor_ncs = None        # (data_recebimento, id) da última linha mostrada
+        self._filtros_ncs = {}         # Filtros em vigor quando a 1ª página foi pedida
+        self._geracao_ncs = 0          # Incrementa a cada recarregamento (descarta páginas obsoletas)
+        self._atualizacao_ncs = 0      # (v1.20) Incrementa a cada atualização no sítio (Realtime)
+        self._a_carregar_mais_ncs = False
 
         # --- (INÍCIO DA ATUALIZAÇÃO v1.6) ---
         # --- Novo Modal "Quick View" ---
@@ -141,7 +172,16 @@ class NcsView(ft.Column):
         self.confirm_delete_nc_dialog = ft.AlertDialog(modal=True, title=ft.Text("Confirmar Exclusão de Nota de Crédito"), content=ft.Text("Atenção!\nTem a certeza de que deseja excluir esta Nota de Crédito?\nTodas as Notas de Empenho e Recolhimentos vinculados também serão excluídos.\nEsta ação não pode ser desfeita."), actions=[ft.TextButton("Cancelar", on_click=lambda e: self.close_confirm_delete_nc(None)), ft.ElevatedButton("Excluir NC", color="white", bgcolor="red", on_click=self.confirm_delete_nc),], actions_alignment=ft.MainAxisAlignment.END,)
 
         # --- Filtros (Sem alteração) ---
-        self.filtro_pesquisa_nc = ft.TextField(label="Pesquisar por Nº NC", hint_text="Digite parte do número...", expand=True, on_submit=self.load_ncs_data_wrapper)
+        self.filtro_pesquisa_nc = ft.TextField(label="Pesquisar por Nº NC", hint_text="Digite parte do número...", expand=True)
+        # (v1.14) Pesquisa enquanto se escreve (ver views/pesquisa_adiada.py)
+        self.pesquisa_nc = PesquisaAdiada(
+            self.filtro_pesquisa_nc,
+            self.load_ncs_data,
+            obter_indice=lambda: indice_do_cache("ncs_lista", "numero_nc", cliente_da_sessao(self.page)),
+            descricao="NC(s)",
+            ao_erro=self.handle_db_error,  # (v1.21)
+            indicador=self.progress_ring,
+        )
         self.filtro_pi = ft.Dropdown(label="Filtrar por PI", options=[ft.dropdown.Option(text="Carregando...", disabled=True)], expand=True, on_change=self.on_pi_filter_change)
         self.filtro_nd = ft.Dropdown(label="Filtrar por ND", options=[ft.dropdown.Option(text="Carregando...", disabled=True)], expand=True, on_change=self.load_ncs_data_wrapper)
         self.filtro_status = ft.Dropdown(label="Filtrar por Status", options=[ft.dropdown.Option(text="Ativa", key="Ativa"), ft.dropdown.Option(text="Sem Saldo", key="Sem Saldo"), ft.dropdown.Option(text="Vencida", key="Vencida"), ft.dropdown.Option(text="Cancelada", key="Cancelada"),], width=200, on_change=self.load_ncs_data_wrapper)
@@ -186,11 +226,6 @@ class NcsView(ft.Column):
                                 self.filtro_pesquisa_nc,
                                 self.filtro_status, 
                                 self.btn_limpar_filtros,
-                                ft.IconButton(
-                                    icon="REFRESH", 
-                                    on_click=self.load_ncs_data_wrapper, 
-                                    tooltip="Recarregar e Aplicar Filtros"
-                                ),
                                 self.progress_ring,
                             ],
                             alignment=ft.MainAxisAlignment.START
@@ -215,11 +250,14 @@ class NcsView(ft.Column):
                 padding=20,
                 content=ft.Column(
                     [
+                        self.cabecalho_ncs,
                         ft.Container(
-                            content=self.tabela_ncs,
+                            content=self.lista_ncs,
                             expand=True
-                        )
+                        ),
+                        ft.Row([self.btn_carregar_mais_ncs], alignment=ft.MainAxisAlignment.CENTER),
                     ],
+                    spacing=0,
                     expand=True
                 )
             )
@@ -242,10 +280,17 @@ class NcsView(ft.Column):
         self.on_mount = self.on_view_mount
         
     def on_view_mount(self, e):
-        print("NcsView: Controlo montado. A carregar dados...")
+        # Seções e filtros vêm do cache global (memória): baratos, sempre atualizados
         self.load_secoes_cache() 
         self.load_filter_options()
-        self.load_ncs_data()
+        # (v1.15) A lista mantém-se entre abas: só volta à BD se estiver velha
+        if self.frescura.precisa_revalidar():
+            print("NcsView: Controlo montado. A revalidar dados...")
+            self.page.run_task(self.revalidar)
+
+    async def revalidar(self):
+        """(v1.15) Recarrega a lista (também usado no pré-carregamento após o login)."""
+        await self.frescura.revalidar(self.load_ncs_data)
         
     # --- (INÍCIO DA ATUALIZAÇÃO v1.6) ---
     def open_quick_view_modal(self, e, nc_obj):
@@ -400,10 +445,9 @@ class NcsView(ft.Column):
     def load_secoes_cache(self):
         print("NcsView: A carregar cache de seções...")
         try:
-            resposta = supabase.table('secoes').select('id, nome').execute()
-            if resposta.data:
-                self.secoes_cache = {secao['id']: secao['nome'] for secao in resposta.data}
-                print("NcsView: Cache de seções carregado.")
+            # (v1.7) Usa o mapa de seções do cache global
+            self.secoes_cache = cache_global.obter("secoes_map", cliente_da_sessao(self.page))
+            print("NcsView: Cache de seções carregado.")
         except Exception as ex:
             print("--- ERRO CRÍTICO (TRACEBACK) NO NCS [load_secoes_cache] ---")
             traceback.print_exc()
@@ -432,36 +476,34 @@ class NcsView(ft.Column):
         try:
             if pi_selecionado is None:
                 print("A carregar opções de filtro (PIs e NDs)...")
-                pis = supabase.rpc('get_distinct_pis').execute()
+                # (v1.7) Lê do cache global (só vai à BD se os dados estiverem expirados)
+                pis = cache_global.obter("pis", cliente_da_sessao(self.page))
                 self.filtro_pi.options.clear()
                 self.filtro_pi.options.append(ft.dropdown.Option(text="Todos os PIs", key=None)) 
-                if pis.data:
-                    for pi in sorted(pis.data): 
-                        if pi: self.filtro_pi.options.append(ft.dropdown.Option(text=pi, key=pi))
+                for pi in sorted(pis): 
+                    if pi: self.filtro_pi.options.append(ft.dropdown.Option(text=pi, key=pi))
                 
-                nds = supabase.rpc('get_distinct_nds').execute()
+                nds = cache_global.obter("nds", cliente_da_sessao(self.page))
                 self.filtro_nd.options.clear()
                 self.filtro_nd.options.append(ft.dropdown.Option(text="Todas as NDs", key=None)) 
-                if nds.data:
-                    for nd in sorted(nds.data): 
-                        if nd: self.filtro_nd.options.append(ft.dropdown.Option(text=nd, key=nd))
+                for nd in sorted(nds): 
+                    if nd: self.filtro_nd.options.append(ft.dropdown.Option(text=nd, key=nd))
                 print("Opções de filtro iniciais carregadas.")
             else:
+                # (v1.8) NDs do PI vêm do mapa PI->ND em memória (sem RPC, sem bloquear o dropdown)
                 print(f"A carregar NDs para o PI: {pi_selecionado}...")
-                self.filtro_nd.disabled = True 
-                self.filtro_nd.update()
-                nds = supabase.rpc('get_distinct_nds_for_pi', {'p_pi': pi_selecionado}).execute()
                 self.filtro_nd.options.clear()
                 self.filtro_nd.options.append(ft.dropdown.Option(text="Todas as NDs", key=None))
-                if nds.data:
-                    for nd in sorted(nds.data):
-                         if nd: self.filtro_nd.options.append(ft.dropdown.Option(text=nd, key=nd))
+                for nd in nds_para_pi(cliente_da_sessao(self.page), pi_selecionado):
+                    self.filtro_nd.options.append(ft.dropdown.Option(text=nd, key=nd))
                 print("Filtro ND atualizado.")
-                
+
             self.filtro_nd.disabled = False 
             
             if pi_selecionado is None:
                 self.update() 
+            else:
+                self.filtro_nd.update()
                 
         except Exception as ex: 
             print("--- ERRO CRÍTICO (TRACEBACK) NO NCS [load_filter_options] ---")
@@ -471,110 +513,97 @@ class NcsView(ft.Column):
             print(f"Erro ao carregar opções de filtro: {ex}")
             self.handle_db_error(ex, "carregar filtros")
             
-    def on_pi_filter_change(self, e):
+    async def on_pi_filter_change(self, e):
         pi_val = self.filtro_pi.value if self.filtro_pi.value else None
-        self.filtro_nd.value = None 
+        # Mantém a ND escolhida se ela existir para o novo PI
+        if not nd_valida_para_pi(cliente_da_sessao(self.page), pi_val, self.filtro_nd.value):
+            self.filtro_nd.value = None
         self.load_filter_options(pi_selecionado=pi_val) 
-        self.load_ncs_data() 
+        await self.load_ncs_data() 
 
-    def limpar_filtros(self, e):
+    async def limpar_filtros(self, e):
         print("A limpar filtros...")
+        self.pesquisa_nc.cancelar()
         self.filtro_pesquisa_nc.value = ""
+        self.filtro_pesquisa_nc.helper_text = None
         self.filtro_status.value = None
         self.filtro_pi.value = None
         self.filtro_nd.value = None
         self.load_filter_options(pi_selecionado=None) 
-        self.load_ncs_data() 
+        await self.load_ncs_data() 
         self.page.update() 
         
-    def load_ncs_data_wrapper(self, e): 
-        self.load_ncs_data()
+    async def load_ncs_data_wrapper(self, e): 
+        await self.load_ncs_data()
+
+    async def on_realtime_change(self, tabelas):
+        """
+        (v1.9) Chamado pelo main.py quando o Realtime avisa de alterações
+        (substitui o antigo botão REFRESH).
+        (v1.20) Corre no loop da sessão (o sincronizacao_realtime agenda-o com 'page.run_task'
+        e já releu os caches): não se intercala com 'carregar_mais_ncs' a meio de uma alteração
+        da lista, só nos 'await'.
+        """
+        if "secoes" in tabelas:
+            self.load_secoes_cache()
+        if "notas_de_credito" in tabelas:
+            self.load_filter_options()
+            if self.filtro_pi.value:
+                self.load_filter_options(pi_selecionado=self.filtro_pi.value)
+        if tabelas & {"notas_de_credito", "notas_de_empenho", "recolhimentos_de_saldo"}:
+            # (v1.19) Os filtros não mudaram: atualiza as linhas carregadas, sem voltar ao início
+            await self.atualizar_ncs_carregadas()
+
+    async def atualizar_ncs_carregadas(self):
+        """
+        (v1.19) Relê as NCs já carregadas (da 1ª página até ao cursor) e atualiza a lista no
+        sítio: só as linhas novas, alteradas ou removidas mudam, e o scroll e o cursor ficam.
+        Só a mudança de filtros ('load_ncs_data') recomeça a lista.
+        (v1.20) A lista só é mexida depois do último 'await', e só se nada a mudou entretanto
+        (filtros, 'Carregar mais' ou outra atualização mais recente).
+        """
+        if self._geracao_ncs == 0:
+            await self.load_ncs_data()  # Ainda nada carregado
+            return
+        self._atualizacao_ncs += 1
+        geracao, cursor, atualizacao = self._geracao_ncs, self._cursor_ncs, self._atualizacao_ncs
+        try:
+            ncs = await repositorio.listar_ncs_carregadas(
+                cliente_da_sessao(self.page),
+                cursor=cursor,
+                **self._filtros_ncs,
+            )
+            if geracao != self._geracao_ncs or cursor != self._cursor_ncs or atualizacao != self._atualizacao_ncs:
+                return  # Entretanto a lista recomeçou, cresceu ou foi relida de novo: esta leitura já não serve
+            self._mostrar_ncs(ncs)
+            self.page.update()
+            print(f"NCs: {len(ncs)} linha(s) carregada(s) atualizada(s) (Realtime).")
+
+        except Exception as ex:
+            print("--- ERRO CRÍTICO (TRACEBACK) NO NCS [atualizar_ncs_carregadas] ---")
+            traceback.print_exc()
+            print("--------------------------------------------------------------------")
+            self.handle_db_error(ex, "atualizar NCs")
         
-    def load_ncs_data(self):
+    async def load_ncs_data(self):
+        """
+        (v1.12) Recomeça a lista com os filtros atuais: pede SÓ a 1ª página.
+        As seguintes são pedidas pelo scroll (ou pelo botão "Carregar mais").
+        """
         print("NCs: A carregar dados com filtros...")
+        self._geracao_ncs += 1
+        self._cursor_ncs = None
+        self._filtros_ncs = {
+            "pesquisa": self.filtro_pesquisa_nc.value,
+            "status": self.filtro_status.value,
+            "pi": self.filtro_pi.value,
+            "nd": self.filtro_nd.value,
+        }
         self.progress_ring.visible = True
         self.page.update()
         
         try:
-            # (v1.6) Busca todos os dados para o modal de Quick View
-            query = supabase.table('ncs_com_saldos').select(
-                'id, numero_nc, pi, natureza_despesa, status_calculado, '
-                'valor_inicial, saldo_disponivel, total_empenhado, id_secao, ' 
-                'data_validade_empenho, data_recebimento, ptres, fonte, '
-                'ug_gestora, observacao'
-            )
-            
-            if self.filtro_pesquisa_nc.value: 
-                query = query.ilike('numero_nc', f"%{self.filtro_pesquisa_nc.value}%")
-            if self.filtro_status.value: 
-                query = query.eq('status_calculado', self.filtro_status.value)
-            if self.filtro_pi.value: 
-                query = query.eq('pi', self.filtro_pi.value)
-            if self.filtro_nd.value: 
-                query = query.eq('natureza_despesa', self.filtro_nd.value)
-            resposta = query.order('data_recebimento', desc=True).execute()
-            
-            self.tabela_ncs.rows.clear()
-            if resposta.data:
-                for nc in resposta.data:
-                    
-                    self.tabela_ncs.rows.append(
-                        ft.DataRow(
-                            cells=[
-                                # (v1.6) Nº NC como "botão" clicável
-                                ft.DataCell(
-                                    ft.TextButton(
-                                        text=nc.get('numero_nc', ''),
-                                        on_click=lambda e, nc_obj=nc: self.open_quick_view_modal(e, nc_obj),
-                                        style=ft.ButtonStyle(padding=0)
-                                    )
-                                ),
-                                # (v1.6) Colunas essenciais
-                                ft.DataCell(ft.Text(nc.get('pi', ''))),
-                                ft.DataCell(ft.Text(nc.get('natureza_despesa', ''))),
-                                ft.DataCell(ft.Text(self.formatar_moeda(nc.get('valor_inicial')))),
-                                ft.DataCell(ft.Text(self.formatar_moeda(nc.get('saldo_disponivel')), weight=ft.FontWeight.BOLD)),
-                                # (v1.6) Ações
-                                ft.DataCell(
-                                    ft.PopupMenuButton(
-                                        icon="MORE_VERT", 
-                                        items=[
-                                            ft.PopupMenuItem(
-                                                text="Editar NC (Detalhes)",
-                                                icon="EDIT",
-                                                on_click=lambda e, nc_obj=nc: self.open_edit_modal(nc_obj)
-                                            ),
-                                            ft.PopupMenuItem(
-                                                text="Ver Extrato (NEs)",
-                                                icon="HISTORY",
-                                                on_click=lambda e, nc_obj=nc: self.open_history_modal(nc_obj)
-                                            ),
-                                            ft.PopupMenuItem(
-                                                text="Recolher Saldo",
-                                                icon="KEYBOARD_RETURN",
-                                                on_click=lambda e, nc_obj=nc: self.open_recolhimento_modal(nc_obj)
-                                            ),
-                                            ft.PopupMenuItem(), # Divisor
-                                            ft.PopupMenuItem(
-                                                text="Excluir NC",
-                                                icon="DELETE",
-                                                on_click=lambda e, nc_obj=nc: self.open_confirm_delete_nc(nc_obj)
-                                            ),
-                                        ]
-                                    )
-                                ),
-                            ]
-                        )
-                    )
-            else:
-                self.tabela_ncs.rows.append(
-                    ft.DataRow(cells=[ 
-                        ft.DataCell(ft.Text("Nenhuma Nota de Crédito encontrada com estes filtros.", italic=True)), 
-                        ft.DataCell(ft.Text("")), ft.DataCell(ft.Text("")), 
-                        ft.DataCell(ft.Text("")), ft.DataCell(ft.Text("")),
-                        ft.DataCell(ft.Text("")),
-                    ])
-                )
+            await self._carregar_pagina_ncs(self._geracao_ncs, limpar=True)
             print("NCs: Dados carregados com sucesso.")
             
         except Exception as ex: 
@@ -588,6 +617,127 @@ class NcsView(ft.Column):
         finally: 
             self.progress_ring.visible = False
             self.page.update()
+
+    async def carregar_mais_ncs(self, e=None):
+        """(v1.12) Acrescenta a página seguinte ao fim da lista."""
+        if self._cursor_ncs is None or self._a_carregar_mais_ncs:
+            return
+        self._a_carregar_mais_ncs = True
+        self.btn_carregar_mais_ncs.disabled = True
+        self.btn_carregar_mais_ncs.update()
+        
+        try:
+            await self._carregar_pagina_ncs(self._geracao_ncs, limpar=False)
+            
+        except Exception as ex:
+            print("--- ERRO CRÍTICO (TRACEBACK) NO NCS [carregar_mais_ncs] ---")
+            traceback.print_exc()
+            print("-------------------------------------------------------------")
+            self.handle_db_error(ex, "carregar mais NCs")
+            
+        finally:
+            self._a_carregar_mais_ncs = False
+            self.btn_carregar_mais_ncs.disabled = False
+            self.page.update()
+
+    async def on_lista_ncs_scroll(self, e: ft.OnScrollEvent):
+        if e.max_scroll_extent and e.pixels >= e.max_scroll_extent - LIMIAR_SCROLL_PX:
+            await self.carregar_mais_ncs()
+
+    async def _carregar_pagina_ncs(self, geracao, limpar):
+        # (v1.6) Busca todos os dados para o modal de Quick View
+        # (v1.10) Consulta assíncrona (não bloqueia o loop do Flet)
+        ncs, cursor = await repositorio.listar_ncs_pagina(
+            cliente_da_sessao(self.page),
+            cursor=self._cursor_ncs,
+            **self._filtros_ncs,
+        )
+        if geracao != self._geracao_ncs:
+            # Os filtros mudaram enquanto esperávamos: esta página já não interessa
+            return
+        
+        # (v1.13) Reaproveita as linhas das NCs que não mudaram
+        if limpar:
+            self._mostrar_ncs(ncs)
+        else:
+            self.lista_ncs.controls = self.linhas_ncs.acrescentar(self.lista_ncs.controls, ncs)
+        
+        self._cursor_ncs = cursor
+        self.btn_carregar_mais_ncs.visible = cursor is not None
+        print(f"NCs: {len(ncs)} linha(s) carregada(s){' (há mais)' if cursor else ''}.")
+
+    def _mostrar_ncs(self, ncs):
+        """Mostra exatamente 'ncs' (por esta ordem), reaproveitando as linhas que não mudaram."""
+        self.lista_ncs.controls = self.linhas_ncs.sincronizar(ncs)
+        if not ncs:
+            self.lista_ncs.controls.append(
+                ft.Container(
+                    content=ft.Text("Nenhuma Nota de Crédito encontrada com estes filtros.", italic=True),
+                    padding=ft.padding.symmetric(horizontal=10),
+                    alignment=ft.alignment.center_left,
+                )
+            )
+
+    def _construir_linha_nc(self, nc):
+        """
+        (v1.12) Uma linha da lista (altura fixa = ALTURA_LINHA_NC).
+        A NC vai no 'data' dos controlos: os cliques usam handlers partilhados
+        em vez de criar lambdas por linha.
+        """
+        return ft.Container(
+            height=ALTURA_LINHA_NC,
+            padding=ft.padding.symmetric(horizontal=10),
+            border=ft.border.only(bottom=ft.border.BorderSide(1, "grey200")),
+            content=ft.Row(
+                [
+                    # (v1.6) Nº NC como "botão" clicável
+                    ft.Container(
+                        ft.TextButton(
+                            text=nc.get('numero_nc', ''),
+                            data=nc,
+                            on_click=self.on_numero_nc_click,
+                            style=ft.ButtonStyle(padding=0)
+                        ),
+                        expand=2,
+                        alignment=ft.alignment.center_left,
+                    ),
+                    # (v1.6) Colunas essenciais
+                    ft.Text(nc.get('pi', ''), expand=2),
+                    ft.Text(nc.get('natureza_despesa', ''), expand=1),
+                    ft.Text(self.formatar_moeda(nc.get('valor_inicial')), expand=2, text_align=ft.TextAlign.RIGHT),
+                    ft.Text(self.formatar_moeda(nc.get('saldo_disponivel')), weight=ft.FontWeight.BOLD, expand=2, text_align=ft.TextAlign.RIGHT),
+                    # (v1.6) Ações
+                    ft.Container(
+                        ft.PopupMenuButton(
+                            icon="MORE_VERT", 
+                            items=[
+                                ft.PopupMenuItem(text="Editar NC (Detalhes)", icon="EDIT", data=("editar", nc), on_click=self.on_menu_acao_nc),
+                                ft.PopupMenuItem(text="Ver Extrato (NEs)", icon="HISTORY", data=("extrato", nc), on_click=self.on_menu_acao_nc),
+                                ft.PopupMenuItem(text="Recolher Saldo", icon="KEYBOARD_RETURN", data=("recolher", nc), on_click=self.on_menu_acao_nc),
+                                ft.PopupMenuItem(), # Divisor
+                                ft.PopupMenuItem(text="Excluir NC", icon="DELETE", data=("excluir", nc), on_click=self.on_menu_acao_nc),
+                            ]
+                        ),
+                        width=60,
+                    ),
+                ],
+                vertical_alignment=ft.CrossAxisAlignment.CENTER,
+            ),
+        )
+
+    def on_numero_nc_click(self, e):
+        self.open_quick_view_modal(e, e.control.data)
+
+    def on_menu_acao_nc(self, e):
+        acao, nc = e.control.data
+        if acao == "editar":
+            self.open_edit_modal(nc)
+        elif acao == "extrato":
+            self.page.run_task(self.open_history_modal, nc)
+        elif acao == "recolher":
+            self.open_recolhimento_modal(nc)
+        elif acao == "excluir":
+            self.open_confirm_delete_nc(nc)
         
     def open_add_modal(self, e):
         print("A abrir modal de ADIÇÃO...")
@@ -711,22 +861,23 @@ class NcsView(ft.Column):
         try:
             if self.id_sendo_editado is None:
                 print(f"A inserir nova NC no Supabase como: {numero_formatado}...")
-                supabase.table('notas_de_credito').insert(dados_para_salvar).execute()
+                cliente_da_sessao(self.page).table('notas_de_credito').insert(dados_para_salvar).execute()
                 msg_sucesso = f"NC {numero_formatado} salva com sucesso!"
             else:
                 print(f"A atualizar NC ID: {self.id_sendo_editado} como: {numero_formatado}...")
-                supabase.table('notas_de_credito').update(dados_para_salvar).eq('id', self.id_sendo_editado).execute()
+                cliente_da_sessao(self.page).table('notas_de_credito').update(dados_para_salvar).eq('id', self.id_sendo_editado).execute()
                 msg_sucesso = f"NC {numero_formatado} atualizada com sucesso!"
             
             print("NC salva com sucesso.")
             self.show_success_snackbar(msg_sucesso)
             
             self.close_modal(None)
-            self.load_secoes_cache() 
-            self.load_filter_options() 
-            self.load_ncs_data() 
+            # (v1.7) Invalida o cache global ANTES de recarregar os filtros
             if self.on_data_changed_callback:
                 self.on_data_changed_callback(None) 
+            self.load_secoes_cache() 
+            self.load_filter_options() 
+            self.page.run_task(self.load_ncs_data)
 
         except Exception as ex:
             print(f"Erro ao salvar NC: {ex}")
@@ -738,7 +889,7 @@ class NcsView(ft.Column):
             self.modal_form_btn_salvar.disabled = False
             self.modal_form.update()
                  
-    def open_history_modal(self, nc):
+    async def open_history_modal(self, nc):
         nc_id = nc.get('id')
         nc_numero = nc.get('numero_nc', 'Desconhecido')
         if not nc_id:
@@ -758,9 +909,10 @@ class NcsView(ft.Column):
             self.history_nes_list.controls.clear()
             self.history_recolhimentos_list.controls.clear()
             
-            resposta_nes = supabase.table('notas_de_empenho').select('*').eq('id_nc', nc_id).order('data_empenho', desc=True).execute()
-            if resposta_nes.data:
-                for ne in resposta_nes.data:
+            # (v1.10) NEs e recolhimentos pedidos em paralelo
+            nes, recolhimentos = await repositorio.carregar_historico_nc(cliente_da_sessao(self.page), nc_id)
+            if nes:
+                for ne in nes:
                     data = datetime.fromisoformat(ne['data_empenho']).strftime('%d/%m/%Y') if ne.get('data_empenho') else '??/??/????'
                     valor = self.formatar_moeda(ne.get('valor_empenhado'))
                     num_ne = ne.get('numero_ne', 'N/A')
@@ -769,9 +921,8 @@ class NcsView(ft.Column):
             else:
                 self.history_nes_list.controls.append(ft.Text("Nenhum empenho registado.", italic=True))
             
-            resposta_recolhimentos = supabase.table('recolhimentos_de_saldo').select('*').eq('id_nc', nc_id).order('data_recolhimento', desc=True).execute()
-            if resposta_recolhimentos.data:
-                for rec in resposta_recolhimentos.data:
+            if recolhimentos:
+                for rec in recolhimentos:
                     data = datetime.fromisoformat(rec['data_recolhimento']).strftime('%d/%m/%Y') if rec.get('data_recolhimento') else '??/??/????'
                     valor = self.formatar_moeda(rec.get('valor_recolhido'))
                     desc = rec.get('descricao', '')
@@ -853,13 +1004,13 @@ class NcsView(ft.Column):
 
         try:
             print("A inserir Recolhimento no Supabase...")
-            supabase.table('recolhimentos_de_saldo').insert(dados_para_inserir).execute()
+            cliente_da_sessao(self.page).table('recolhimentos_de_saldo').insert(dados_para_inserir).execute()
             print("Recolhimento salvo com sucesso.")
             
             self.show_success_snackbar("Recolhimento de saldo registado com sucesso!")
             
             self.close_recolhimento_modal(None)
-            self.load_ncs_data() 
+            self.page.run_task(self.load_ncs_data)
             if self.on_data_changed_callback:
                 self.on_data_changed_callback(None) 
                 
@@ -898,17 +1049,18 @@ class NcsView(ft.Column):
 
         try:
             print(f"A excluir NC ID: {id_para_excluir}...")
-            supabase.table('notas_de_credito').delete().eq('id', id_para_excluir).execute()
+            cliente_da_sessao(self.page).table('notas_de_credito').delete().eq('id', id_para_excluir).execute()
             print("NC excluída com sucesso.")
             
             self.show_success_snackbar("Nota de Crédito excluída com sucesso.")
             
             self.close_confirm_delete_nc(None)
-            self.load_secoes_cache() 
-            self.load_filter_options() 
-            self.load_ncs_data() 
+            # (v1.7) Invalida o cache global ANTES de recarregar os filtros
             if self.on_data_changed_callback:
                 self.on_data_changed_callback(None) 
+            self.load_secoes_cache() 
+            self.load_filter_options() 
+            self.page.run_task(self.load_ncs_data)
                 
         except Exception as ex:
             print(f"Erro ao excluir NC: {ex}")
@@ -964,6 +1116,8 @@ class NcsView(ft.Column):
         file_path_no_servidor = os.path.join("uploads", file_name)
         
         print(f"on_upload_progress: A processar ficheiro em: {file_path_no_servidor}")
+        # (v1.17) A limpeza periódica não lhe toca enquanto estiver a ser lido
+        zelador_ficheiros.proteger(file_path_no_servidor)
         
         try:
             if not os.path.exists(file_path_no_servidor):
@@ -985,10 +1139,13 @@ class NcsView(ft.Column):
             self.show_error(f"Erro ao ler o ficheiro PDF: {ex}")
         
         finally: 
+            # (v1.17) Os dados já estão no modal: o PDF deixa de ser preciso
+            zelador_ficheiros.descartar(file_path_no_servidor)
             self.progress_ring.visible = False
             self.page.update()
 
     def _parse_siafi_pdf(self, file_path_or_object): 
+        import pdfplumber  # (v1.16) Importação diferida: pesada e raramente usada
         texto_completo = ""
         
         with pdfplumber.open(file_path_or_object) as pdf:
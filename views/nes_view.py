@@ -1,12 +1,22 @@
 # views/nes_view.py
-# (Versão Refatorada v1.3 - Layout Moderno)
-# (Corrige o carregamento do filtro de NC e adiciona scroll à tabela)
+# (Versão Refatorada v1.16 - Layout Moderno)
+# (Aviso do Realtime corrido no loop da sessão; uma atualização no sítio mais antiga nunca sobrepõe a mais recente)
+# (v1.16) Erros da pesquisa enquanto se escreve mostrados com 'handle_db_error' (ver pesquisa_adiada v1.2)
 
 import flet as ft
-from supabase_client import supabase # Cliente 'anon'
+import asyncio
+from supabase_client import cliente_da_sessao
+import repositorio
+from cache_global import cache_global, nds_para_pi, nd_valida_para_pi
+from views.tabela_chaveada import TabelaChaveada
+from views.pesquisa_adiada import PesquisaAdiada, indice_do_cache
+from views.frescura import Frescura
 from datetime import datetime
 import traceback 
 
+# (v1.9) Distância (px) ao fim da tabela que pede a página seguinte
+LIMIAR_SCROLL_PX = 300
+
 class NesView(ft.Column):
     """
     Representa o conteúdo da aba Notas de Empenho (CRUD).
@@ -25,8 +35,13 @@ class NesView(ft.Column):
         self.spacing = 20
         
         self.progress_ring = ft.ProgressRing(visible=True, width=32, height=32)
+        # (v1.12) Idade da tabela mostrada (ver views/frescura.py)
+        self.frescura = Frescura()
         
-        self.tabela_nes = ft.DataTable(
+        # (v1.10) Linhas chaveadas pelo id da NE (ver views/tabela_chaveada.py)
+        self.tabela_nes = TabelaChaveada(
+            construir_linha=self._construir_linha_ne,
+            texto_vazio="Nenhuma Nota de Empenho encontrada com estes filtros.",
             columns=[
                 ft.DataColumn(ft.Text("Nº Empenho", weight=ft.FontWeight.BOLD)),
                 ft.DataColumn(ft.Text("NC Vinculada", weight=ft.FontWeight.BOLD)),
@@ -35,11 +50,25 @@ class NesView(ft.Column):
                 ft.DataColumn(ft.Text("Descrição", weight=ft.FontWeight.BOLD)),
                 ft.DataColumn(ft.Text("Ações", weight=ft.FontWeight.BOLD)),
             ],
-            rows=[],
             expand=True,
             border=ft.border.all(1, "grey200"),
             border_radius=8,
         )
+        
+        # (v1.9) Paginação: total de NEs e botão para a página seguinte
+        self.txt_total_nes = ft.Text("", italic=True, size=12)
+        self.btn_carregar_mais_nes = ft.TextButton(
+            "Carregar mais NEs",
+            icon="EXPAND_MORE",
+            visible=False,
+            on_click=self.carregar_mais_nes,
+        )
+        self._cursor_nes = None        # (data_empenho, id) da última linha mostrada
+        self._filtros_nes = {}         # Filtros em vigor quando a 1ª página foi pedida
+        self._geracao_nes = 0          # Incrementa a cada recarregamento (descarta páginas obsoletas)
+        self._atualizacao_nes = 0      # (v1.15) Incrementa a cada atualização no sítio (Realtime)
+        self._total_nes = 0
+        self._a_carregar_mais_nes = False
 
         # --- Modais (Sem alteração) ---
         self.modal_dropdown_nc = ft.Dropdown(label="Vincular à NC (Obrigatório)")
@@ -125,7 +154,15 @@ class NesView(ft.Column):
             label="Pesquisar por Nº NE", 
             hint_text="Digite parte do número...",
             expand=True,
-            on_submit=self.load_nes_data_wrapper
+        )
+        # (v1.11) Pesquisa enquanto se escreve (ver views/pesquisa_adiada.py)
+        self.pesquisa_ne = PesquisaAdiada(
+            self.filtro_pesquisa_ne,
+            self.load_nes_data,
+            obter_indice=lambda: indice_do_cache("nes_lista", "numero_ne", cliente_da_sessao(self.page)),
+            descricao="NE(s)",
+            ao_erro=self.handle_db_error,  # (v1.16)
+            indicador=self.progress_ring,
         )
         self.filtro_nc_vinculada = ft.Dropdown(
             label="Filtrar por NC Vinculada",
@@ -165,14 +202,7 @@ class NesView(ft.Column):
                         ft.Row(
                             [
                                 ft.Text("Gestão de Notas de Empenho", size=20, weight=ft.FontWeight.W_600),
-                                ft.Row([
-                                    ft.IconButton(
-                                        icon="REFRESH", 
-                                        on_click=self.load_nes_data_wrapper, 
-                                        tooltip="Recarregar e Aplicar Filtros"
-                                    ),
-                                    self.progress_ring,
-                                ])
+                                self.progress_ring,
                             ],
                             alignment=ft.MainAxisAlignment.SPACE_BETWEEN
                         ),
@@ -207,12 +237,19 @@ class NesView(ft.Column):
                         # Adiciona um Column com scroll e expand=True
                         # para conter a tabela, permitindo scroll vertical
                         # e horizontal (adaptativo).
+                        # (v1.9) O scroll perto do fim pede a página seguinte
                         ft.Column(
-                            [self.tabela_nes],
+                            [
+                                self.tabela_nes,
+                                ft.Row([self.btn_carregar_mais_nes], alignment=ft.MainAxisAlignment.CENTER),
+                            ],
                             scroll=ft.ScrollMode.ADAPTIVE,
-                            expand=True
-                        )
+                            expand=True,
+                            on_scroll=self.on_tabela_nes_scroll,
+                            on_scroll_interval=100,
+                        ),
                         # --- (FIM DA CORREÇÃO v1.3) ---
+                        self.txt_total_nes,
                     ],
                     expand=True
                 )
@@ -234,10 +271,17 @@ class NesView(ft.Column):
         
     def on_view_mount(self, e):
         """Chamado pelo Flet DEPOIS que o controlo é adicionado à página."""
-        print("NesView: Controlo montado. A carregar dados...")
+        # Filtros vêm do cache global (memória): baratos, sempre atualizados
         self.load_nc_filter_options()
         self.load_pi_nd_filter_options() 
-        self.load_nes_data()
+        # (v1.12) A tabela mantém-se entre abas: só volta à BD se estiver velha
+        if self.frescura.precisa_revalidar():
+            print("NesView: Controlo montado. A revalidar dados...")
+            self.page.run_task(self.revalidar)
+
+    async def revalidar(self):
+        """(v1.12) Recarrega a tabela (também usado no pré-carregamento após o login)."""
+        await self.frescura.revalidar(self.load_nes_data)
 
     def open_datepicker(self, picker: ft.DatePicker):
         if picker and self.page: 
@@ -323,16 +367,14 @@ class NesView(ft.Column):
         """
         print("NEs: A carregar NCs para o filtro...")
         try:
-            # --- (CORREÇÃO v1.3 - Eficiência) ---
-            # Troca a consulta da view 'ncs_com_saldos' pela tabela 'notas_de_credito'
-            resposta_ncs = supabase.table('notas_de_credito').select('id, numero_nc').order('numero_nc', desc=False).execute()
-            # --- (FIM DA CORREÇÃO v1.3) ---
+            # (v1.4) Lista de NCs (id, numero_nc) vem do cache global
+            ncs_lista = cache_global.obter("ncs_lista", cliente_da_sessao(self.page))
 
             self.filtro_nc_vinculada.options.clear()
             self.filtro_nc_vinculada.options.append(ft.dropdown.Option(text="Todas as NCs", key=None))
             
-            if resposta_ncs.data:
-                for nc in resposta_ncs.data:
+            if ncs_lista:
+                for nc in ncs_lista:
                     self.filtro_nc_vinculada.options.append(
                         ft.dropdown.Option(key=nc['id'], text=nc['numero_nc'])
                     )
@@ -354,36 +396,34 @@ class NesView(ft.Column):
         try:
             if pi_selecionado is None:
                 print("NEs: A carregar opções de filtro (PIs e NDs)...")
-                pis = supabase.rpc('get_distinct_pis').execute()
+                # (v1.4) Lê do cache global (só vai à BD se os dados estiverem expirados)
+                pis = cache_global.obter("pis", cliente_da_sessao(self.page))
                 self.filtro_pi.options.clear()
                 self.filtro_pi.options.append(ft.dropdown.Option(text="Todos os PIs", key=None)) 
-                if pis.data:
-                    for pi in sorted(pis.data): 
-                        if pi: self.filtro_pi.options.append(ft.dropdown.Option(text=pi, key=pi))
+                for pi in sorted(pis): 
+                    if pi: self.filtro_pi.options.append(ft.dropdown.Option(text=pi, key=pi))
                 
-                nds = supabase.rpc('get_distinct_nds').execute()
+                nds = cache_global.obter("nds", cliente_da_sessao(self.page))
                 self.filtro_nd.options.clear()
                 self.filtro_nd.options.append(ft.dropdown.Option(text="Todas as NDs", key=None)) 
-                if nds.data:
-                    for nd in sorted(nds.data): 
-                        if nd: self.filtro_nd.options.append(ft.dropdown.Option(text=nd, key=nd))
+                for nd in sorted(nds): 
+                    if nd: self.filtro_nd.options.append(ft.dropdown.Option(text=nd, key=nd))
                 print("NEs: Opções de filtro PI/ND iniciais carregadas.")
             else:
+                # (v1.5) NDs do PI vêm do mapa PI->ND em memória (sem RPC, sem bloquear o dropdown)
                 print(f"NEs: A carregar NDs para o PI: {pi_selecionado}...")
-                self.filtro_nd.disabled = True 
-                self.filtro_nd.update()
-                nds = supabase.rpc('get_distinct_nds_for_pi', {'p_pi': pi_selecionado}).execute()
                 self.filtro_nd.options.clear()
                 self.filtro_nd.options.append(ft.dropdown.Option(text="Todas as NDs", key=None))
-                if nds.data:
-                    for nd in sorted(nds.data):
-                         if nd: self.filtro_nd.options.append(ft.dropdown.Option(text=nd, key=nd))
+                for nd in nds_para_pi(cliente_da_sessao(self.page), pi_selecionado):
+                    self.filtro_nd.options.append(ft.dropdown.Option(text=nd, key=nd))
                 print("NEs: Filtro ND atualizado.")
-                
+
             self.filtro_nd.disabled = False 
             
             if pi_selecionado is None:
                 self.update() 
+            else:
+                self.filtro_nd.update()
                 
         except Exception as ex: 
             print("--- ERRO CRÍTICO (TRACEBACK) NO NES [load_pi_nd_filter_options] ---")
@@ -393,78 +433,99 @@ class NesView(ft.Column):
             print(f"Erro ao carregar opções de filtro PI/ND: {ex}")
             self.handle_db_error(ex, "carregar filtros PI/ND")
 
-    def on_pi_filter_change(self, e):
+    async def on_pi_filter_change(self, e):
         pi_val = self.filtro_pi.value if self.filtro_pi.value else None
-        self.filtro_nd.value = None 
+        # Mantém a ND escolhida se ela existir para o novo PI
+        if not nd_valida_para_pi(cliente_da_sessao(self.page), pi_val, self.filtro_nd.value):
+            self.filtro_nd.value = None
         self.load_pi_nd_filter_options(pi_selecionado=pi_val) 
-        self.load_nes_data() 
+        await self.load_nes_data() 
+
+    async def load_nes_data_wrapper(self, e):
+        await self.load_nes_data()
 
-    def load_nes_data_wrapper(self, e):
-        self.load_nes_data()
+    async def on_realtime_change(self, tabelas):
+        """
+        (v1.6) Chamado pelo main.py quando o Realtime avisa de alterações
+        (substitui o antigo botão REFRESH).
+        (v1.15) Corre no loop da sessão (o sincronizacao_realtime agenda-o com 'page.run_task'
+        e já releu os caches): não se intercala com 'carregar_mais_nes' a meio de uma alteração
+        da tabela, só nos 'await'.
+        """
+        if "notas_de_credito" in tabelas:
+            self.load_nc_filter_options()
+            self.load_pi_nd_filter_options()
+            if self.filtro_pi.value:
+                self.load_pi_nd_filter_options(pi_selecionado=self.filtro_pi.value)
+        if tabelas & {"notas_de_credito", "notas_de_empenho"}:
+            # (v1.14) Os filtros não mudaram: atualiza as linhas carregadas, sem voltar ao início
+            await self.atualizar_nes_carregadas()
 
-    def load_nes_data(self):
+    async def atualizar_nes_carregadas(self):
+        """
+        (v1.14) Relê as NEs já carregadas (da 1ª página até ao cursor) e o total, e atualiza
+        a tabela no sítio: só as linhas novas, alteradas ou removidas mudam, e o cursor fica.
+        Só a mudança de filtros ('load_nes_data') recomeça a tabela.
+        (v1.15) A tabela só é mexida depois do último 'await', e só se nada a mudou entretanto
+        (filtros, 'Carregar mais' ou outra atualização mais recente).
+        """
+        if self._geracao_nes == 0:
+            await self.load_nes_data()  # Ainda nada carregado
+            return
+        self._atualizacao_nes += 1
+        geracao, cursor, atualizacao = self._geracao_nes, self._cursor_nes, self._atualizacao_nes
+        try:
+            cliente = cliente_da_sessao(self.page)
+            nes, total = await asyncio.gather(
+                repositorio.listar_nes_carregadas(cliente, cursor=cursor, **self._filtros_nes),
+                repositorio.contar_nes(cliente, **self._filtros_nes),
+            )
+            if geracao != self._geracao_nes or cursor != self._cursor_nes or atualizacao != self._atualizacao_nes:
+                return  # Entretanto a tabela recomeçou, cresceu ou foi relida de novo: esta leitura já não serve
+            self._total_nes = total
+            self.tabela_nes.sincronizar(nes)
+            self._atualizar_paginacao_nes(cursor)
+            self.page.update()
+            print(f"NEs: {len(nes)} linha(s) carregada(s) atualizada(s) (Realtime).")
+
+        except Exception as ex:
+            print("--- ERRO CRÍTICO (TRACEBACK) NO NES [atualizar_nes_carregadas] ---")
+            traceback.print_exc()
+            print("--------------------------------------------------------------------")
+            self.handle_db_error(ex, "atualizar Notas de Empenho")
+
+    async def load_nes_data(self):
+        """
+        (v1.9) Recomeça a tabela com os filtros atuais: pede a 1ª página e,
+        em paralelo, o total de NEs (pedido só de contagem).
+        """
         print("NEs: A carregar dados com filtros...")
+        self._geracao_nes += 1
+        geracao = self._geracao_nes
+        self._cursor_nes = None
+        self._filtros_nes = {
+            "pesquisa": self.filtro_pesquisa_ne.value,
+            "id_nc": self.filtro_nc_vinculada.value,
+            "pi": self.filtro_pi.value,
+            "nd": self.filtro_nd.value,
+        }
         self.progress_ring.visible = True
         self.page.update()
 
         try:
-            query = supabase.table('notas_de_empenho') \
-                           .select('*, notas_de_credito(numero_nc, pi, natureza_despesa)')
+            cliente = cliente_da_sessao(self.page)
+            # (v1.7) Consultas assíncronas (não bloqueiam o loop do Flet)
+            (nes, cursor), total = await asyncio.gather(
+                repositorio.listar_nes_pagina(cliente, **self._filtros_nes),
+                repositorio.contar_nes(cliente, **self._filtros_nes),
+            )
+            if geracao != self._geracao_nes:
+                return  # Os filtros mudaram enquanto esperávamos
 
-            if self.filtro_pesquisa_ne.value:
-                query = query.ilike('numero_ne', f"%{self.filtro_pesquisa_ne.value}%")
-            if self.filtro_nc_vinculada.value:
-                query = query.eq('id_nc', self.filtro_nc_vinculada.value)
-            if self.filtro_pi.value:
-                query = query.eq('notas_de_credito.pi', self.filtro_pi.value)
-            if self.filtro_nd.value:
-                query = query.eq('notas_de_credito.natureza_despesa', self.filtro_nd.value)
-
-            resposta = query.order('data_empenho', desc=True).execute()
-
-            self.tabela_nes.rows.clear()
-            if resposta.data:
-                for ne in resposta.data:
-                    data_emp = datetime.fromisoformat(ne['data_empenho']).strftime('%d/%m/%Y')
-                    nc_vinculada = ne.get('notas_de_credito', {})
-                    numero_nc = nc_vinculada.get('numero_nc', 'Erro - NC não encontrada')
-                    
-                    self.tabela_nes.rows.append(
-                        ft.DataRow(
-                            cells=[
-                                ft.DataCell(ft.Text(ne['numero_ne'])),
-                                ft.DataCell(ft.Text(numero_nc)),
-                                ft.DataCell(ft.Text(data_emp)),
-                                ft.DataCell(ft.Text(self.formatar_moeda(ne['valor_empenhado']))),
-                                ft.DataCell(ft.Text(ne['descricao'])),
-                                ft.DataCell(
-                                    ft.Row([
-                                        ft.IconButton(
-                                            icon="EDIT", 
-                                            tooltip="Editar NE",
-                                            icon_color="blue700",
-                                            on_click=lambda e, ne_obj=ne: self.open_edit_modal(ne_obj)
-                                        ),
-                                        ft.IconButton(
-                                            icon="DELETE", 
-                                            tooltip="Excluir NE",
-                                            icon_color="red700",
-                                            on_click=lambda e, ne_obj=ne: self.open_confirm_delete(ne_obj)
-                                        )
-                                    ])
-                                ),
-                            ]
-                        )
-                    )
-            else:
-                self.tabela_nes.rows.append(
-                    ft.DataRow(cells=[
-                        ft.DataCell(ft.Text("Nenhuma Nota de Empenho encontrada com estes filtros.", italic=True)),
-                        ft.DataCell(ft.Text("")), ft.DataCell(ft.Text("")),
-                        ft.DataCell(ft.Text("")), ft.DataCell(ft.Text("")),
-                        ft.DataCell(ft.Text("")),
-                    ])
-                )
+            self._total_nes = total
+            # (v1.10) Reaproveita as linhas das NEs que não mudaram
+            self.tabela_nes.sincronizar(nes)
+            self._atualizar_paginacao_nes(cursor)
             print("NEs: Dados carregados com sucesso.")
 
         except Exception as ex:
@@ -479,35 +540,116 @@ class NesView(ft.Column):
             self.progress_ring.visible = False
             self.page.update()
 
-    def limpar_filtros(self, e):
+    async def carregar_mais_nes(self, e=None):
+        """(v1.9) Acrescenta a página seguinte ao fim da tabela."""
+        if self._cursor_nes is None or self._a_carregar_mais_nes:
+            return
+        self._a_carregar_mais_nes = True
+        geracao = self._geracao_nes
+        self.btn_carregar_mais_nes.disabled = True
+        self.btn_carregar_mais_nes.update()
+
+        try:
+            nes, cursor = await repositorio.listar_nes_pagina(
+                cliente_da_sessao(self.page),
+                cursor=self._cursor_nes,
+                **self._filtros_nes,
+            )
+            if geracao == self._geracao_nes:
+                self.tabela_nes.acrescentar(nes)
+                self._atualizar_paginacao_nes(cursor)
+
+        except Exception as ex:
+            print("--- ERRO CRÍTICO (TRACEBACK) NO NES [carregar_mais_nes] ---")
+            traceback.print_exc()
+            print("-------------------------------------------------------------")
+            self.handle_db_error(ex, "carregar mais Notas de Empenho")
+
+        finally:
+            self._a_carregar_mais_nes = False
+            self.btn_carregar_mais_nes.disabled = False
+            self.page.update()
+
+    async def on_tabela_nes_scroll(self, e: ft.OnScrollEvent):
+        if e.max_scroll_extent and e.pixels >= e.max_scroll_extent - LIMIAR_SCROLL_PX:
+            await self.carregar_mais_nes()
+
+    def _construir_linha_ne(self, ne):
+        """(v1.10) DataRow de uma NE (só é chamada para NEs novas ou alteradas)."""
+        data_emp = datetime.fromisoformat(ne['data_empenho']).strftime('%d/%m/%Y')
+        nc_vinculada = ne.get('notas_de_credito') or {}
+        numero_nc = nc_vinculada.get('numero_nc', 'Erro - NC não encontrada')
+        
+        return ft.DataRow(
+            cells=[
+                ft.DataCell(ft.Text(ne['numero_ne'])),
+                ft.DataCell(ft.Text(numero_nc)),
+                ft.DataCell(ft.Text(data_emp)),
+                ft.DataCell(ft.Text(self.formatar_moeda(ne['valor_empenhado']))),
+                ft.DataCell(ft.Text(ne['descricao'])),
+                ft.DataCell(
+                    ft.Row([
+                        ft.IconButton(
+                            icon="EDIT", 
+                            tooltip="Editar NE",
+                            icon_color="blue700",
+                            data=ne,
+                            on_click=self.on_editar_ne_click
+                        ),
+                        ft.IconButton(
+                            icon="DELETE", 
+                            tooltip="Excluir NE",
+                            icon_color="red700",
+                            data=ne,
+                            on_click=self.on_excluir_ne_click
+                        )
+                    ])
+                ),
+            ]
+        )
+
+    def _atualizar_paginacao_nes(self, cursor):
+        self._cursor_nes = cursor
+        self.btn_carregar_mais_nes.visible = cursor is not None
+        if self.tabela_nes.quantidade:
+            self.txt_total_nes.value = f"A mostrar {self.tabela_nes.quantidade} de {self._total_nes} Notas de Empenho."
+        else:
+            self.txt_total_nes.value = ""
+
+    async def on_editar_ne_click(self, e):
+        await self.open_edit_modal(e.control.data)
+
+    def on_excluir_ne_click(self, e):
+        self.open_confirm_delete(e.control.data)
+
+    async def limpar_filtros(self, e):
         print("NEs: A limpar filtros...")
+        self.pesquisa_ne.cancelar()
         self.filtro_pesquisa_ne.value = ""
+        self.filtro_pesquisa_ne.helper_text = None
         self.filtro_nc_vinculada.value = None
         self.filtro_pi.value = None     
         self.filtro_nd.value = None     
         self.load_pi_nd_filter_options(pi_selecionado=None) 
-        self.load_nes_data()
+        await self.load_nes_data()
         self.page.update()
 
-    def carregar_ncs_para_dropdown_modal(self):
+    async def carregar_ncs_para_dropdown_modal(self):
         """Busca NCs 'Ativas' para o dropdown do MODAL e armazena seus saldos."""
         print("NEs Modal: A carregar NCs ativas...")
         try:
-            resposta_ncs = supabase.table('ncs_com_saldos') \
-                                   .select('id, numero_nc, saldo_disponivel') \
-                                   .filter('status_calculado', 'eq', 'Ativa') \
-                                   .execute()
+            ncs_ativas = await repositorio.listar_ncs_ativas(cliente_da_sessao(self.page))
             
             self.modal_dropdown_nc.options.clear()
             self.saldos_ncs_ativas.clear() 
             
-            if not resposta_ncs.data:
+            if not ncs_ativas:
                 self.page.snack_bar = ft.SnackBar(ft.Text("Nenhuma NC 'Ativa' encontrada para vincular."), bgcolor="orange")
                 self.page.snack_bar.open = True
                 self.page.update()
                 return False
                 
-            for nc in resposta_ncs.data:
+            for nc in ncs_ativas:
                 saldo_float = float(nc['saldo_disponivel'])
                 saldo_formatado = self.formatar_moeda(saldo_float)
                 texto_opcao = f"{nc['numero_nc']} (Saldo: {saldo_formatado})"
@@ -523,9 +665,9 @@ class NesView(ft.Column):
             self.handle_db_error(ex, "carregar NCs ativas")
             return False
 
-    def open_add_modal(self, e):
+    async def open_add_modal(self, e):
         print("A abrir modal de ADIÇÃO de NE...")
-        if not self.carregar_ncs_para_dropdown_modal():
+        if not await self.carregar_ncs_para_dropdown_modal():
             return 
         self.id_ne_sendo_editada = None
         self.modal_form.title = ft.Text("Adicionar Nova Nota de Empenho")
@@ -543,9 +685,9 @@ class NesView(ft.Column):
         self.page.update()
         self.modal_txt_numero_ne.focus()
 
-    def open_edit_modal(self, ne):
+    async def open_edit_modal(self, ne):
         print(f"A abrir modal de EDIÇÃO para NE: {ne['numero_ne']}")
-        self.carregar_ncs_para_dropdown_modal() 
+        await self.carregar_ncs_para_dropdown_modal() 
         self.id_ne_sendo_editada = ne['id']
         self.modal_form.title = ft.Text(f"Editar NE: {ne['numero_ne']}")
         self.modal_form_btn_salvar.text = "Atualizar"
@@ -638,18 +780,18 @@ class NesView(ft.Column):
         try:
             if self.id_ne_sendo_editada is None:
                 print(f"A inserir nova NE no Supabase como: {numero_formatado}...")
-                supabase.table('notas_de_empenho').insert(dados_para_salvar).execute()
+                cliente_da_sessao(self.page).table('notas_de_empenho').insert(dados_para_salvar).execute()
                 msg_sucesso = f"NE {numero_formatado} salva com sucesso!"
             else:
                 print(f"A atualizar NE ID: {self.id_ne_sendo_editada} como: {numero_formatado}...")
-                supabase.table('notas_de_empenho').update(dados_para_salvar).eq('id', self.id_ne_sendo_editada).execute()
+                cliente_da_sessao(self.page).table('notas_de_empenho').update(dados_para_salvar).eq('id', self.id_ne_sendo_editada).execute()
                 msg_sucesso = f"NE {numero_formatado} atualizada com sucesso!"
             
             print("NE salva com sucesso.")
             self.show_success_snackbar(msg_sucesso)
             
             self.close_modal(None) 
-            self.load_nes_data() 
+            self.page.run_task(self.load_nes_data)
             if self.on_data_changed_callback:
                 self.on_data_changed_callback(None) 
 
@@ -683,13 +825,13 @@ class NesView(ft.Column):
 
         try:
             print(f"A excluir NE ID: {id_para_excluir}...")
-            supabase.table('notas_de_empenho').delete().eq('id', id_para_excluir).execute()
+            cliente_da_sessao(self.page).table('notas_de_empenho').delete().eq('id', id_para_excluir).execute()
             print("NE excluída com sucesso.")
             
             self.show_success_snackbar("Nota de Empenho excluída com sucesso.")
             
             self.close_confirm_delete(None)
-            self.load_nes_data() 
+            self.page.run_task(self.load_nes_data)
             if self.on_data_changed_callback:
                 self.on_data_changed_callback(None) 
                 
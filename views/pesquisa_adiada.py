@@ -0,0 +1,152 @@
+# views/pesquisa_adiada.py
+# (Versão v1.2 - Pesquisa Enquanto se Escreve)
+# (Debounce + cancelamento das consultas obsoletas; sugestões por prefixo servidas por um índice local)
+# (v1.2) Erros da consulta mostrados pela view (e o indicador escondido); '_indices' protegido por lock
+
+import asyncio
+import bisect
+import threading
+import traceback
+
+from cache_global import cache_global
+
+# Pausa na escrita (segundos) antes de consultar a BD
+ATRASO_PESQUISA = 0.35
+
+# Máximo de números mostrados como sugestão por baixo do campo
+MAX_SUGESTOES = 3
+
+
+class IndiceNumeros:
+    """
+    Índice ordenado de números de documento (ex: '2025NC000123'), em minúsculas.
+    'prefixo' usa pesquisa binária; 'contem' percorre a lista (milhares de
+    strings curtas: microssegundos, sem ida à BD).
+    """
+
+    def __init__(self, numeros):
+        self.numeros = sorted({numero.lower() for numero in numeros if numero})
+
+    def prefixo(self, texto, limite=MAX_SUGESTOES):
+        texto = texto.lower()
+        inicio = bisect.bisect_left(self.numeros, texto)
+        encontrados = []
+        for numero in self.numeros[inicio:]:
+            if not numero.startswith(texto) or len(encontrados) >= limite:
+                break
+            encontrados.append(numero)
+        return encontrados
+
+    def contem(self, texto):
+        """Quantos números contêm 'texto' (a mesma regra do ilike '%texto%')."""
+        texto = texto.lower()
+        return sum(1 for numero in self.numeros if texto in numero)
+
+
+# Um índice por lista do cache global; reconstruído só quando a lista muda
+# (o cache_global é copy-on-write: lista alterada = objeto novo)
+# (v1.1) Por (chave, âmbito RLS), como o cache; os mais antigos saem acima do limite dele
+# (v1.2) Chamado em 'asyncio.to_thread' por todas as sessões: só mexer com '_lock_indices'
+_indices = {}
+_lock_indices = threading.Lock()
+
+def indice_do_cache(chave, campo, cliente):
+    """IndiceNumeros da lista 'chave' do cache global (ex: 'ncs_lista', campo 'numero_nc')."""
+    lista = cache_global.obter(chave, cliente)
+    chave_indice = (chave, cliente.ambito)
+    with _lock_indices:
+        atual = _indices.get(chave_indice)
+    if atual is None or atual[0] is not lista:
+        # Construído fora do lock (não bloqueia as outras sessões); duas threads a construir
+        # o mesmo índice ao mesmo tempo só repetem trabalho
+        atual = (lista, IndiceNumeros(registo.get(campo) for registo in lista))
+    with _lock_indices:
+        _indices.pop(chave_indice, None)
+        _indices[chave_indice] = atual  # No fim: o dict fica do usado há mais tempo ao mais recente
+        while len(_indices) > 2 * cache_global.max_ambitos:
+            _indices.pop(next(iter(_indices)), None)
+    return atual[1]
+
+
+class PesquisaAdiada:
+    """
+    Liga um ft.TextField de pesquisa a uma corrotina de recarregamento:
+      - a cada tecla, mostra por baixo do campo as correspondências do índice
+        local (sem ida à BD);
+      - só depois de ATRASO_PESQUISA sem escrever é que 'recarregar()' corre;
+      - uma tecla nova cancela a espera E a consulta anterior ainda em curso,
+        por isso uma resposta lenta nunca substitui uma mais recente;
+      - Enter pesquisa logo (sem esperar).
+    'obter_indice' é uma função (bloqueante) que devolve o IndiceNumeros.
+    (v1.2) Um erro em 'recarregar()' vai para 'ao_erro(ex, contexto)' (o 'handle_db_error'
+    da view) e esconde o 'indicador' (ProgressRing), em vez de ficar numa tarefa sem dono.
+    """
+
+    def __init__(self, campo, recarregar, obter_indice=None, descricao="registo(s)", atraso=ATRASO_PESQUISA,
+                 ao_erro=None, indicador=None):
+        self.campo = campo
+        self.recarregar = recarregar
+        self.obter_indice = obter_indice
+        self.descricao = descricao
+        self.atraso = atraso
+        self.ao_erro = ao_erro
+        self.indicador = indicador
+        self._tarefa = None
+        campo.on_change = self.on_change
+        campo.on_submit = self.on_submit
+
+    async def on_change(self, e):
+        await self._mostrar_sugestoes()
+        self._agendar(self.atraso)
+
+    async def on_submit(self, e):
+        self._agendar(0)
+
+    def cancelar(self):
+        """Cancela a espera/consulta pendente (ex: ao limpar os filtros)."""
+        if self._tarefa and not self._tarefa.done():
+            self._tarefa.cancel()
+        self._tarefa = None
+
+    def _agendar(self, atraso):
+        self.cancelar()
+        self._tarefa = asyncio.create_task(self._executar(atraso))
+
+    async def _executar(self, atraso):
+        try:
+            if atraso:
+                await asyncio.sleep(atraso)
+            await self.recarregar()
+        except asyncio.CancelledError:
+            raise  # Tecla nova: a tarefa seguinte trata do indicador
+        except Exception as ex:
+            print("--- ERRO CRÍTICO (TRACEBACK) NA PESQUISA [_executar] ---")
+            traceback.print_exc()
+            print("---------------------------------------------------------")
+            try:
+                if self.indicador is not None and self.indicador.visible:
+                    self.indicador.visible = False
+                    self.indicador.update()
+                if self.ao_erro:
+                    self.ao_erro(ex, f"pesquisar {self.descricao}")
+            except Exception as ex_aviso:
+                # A página pode já ter fechado: nada mais a mostrar
+                print(f"Pesquisa: Não foi possível mostrar o erro: {ex_aviso}")
+
+    async def _mostrar_sugestoes(self):
+        texto = (self.campo.value or "").strip()
+        ajuda = None
+        if texto and self.obter_indice:
+            try:
+                indice = await asyncio.to_thread(self.obter_indice)
+                total = indice.contem(texto)
+                sugestoes = indice.prefixo(texto)
+                ajuda = f"{total} {self.descricao}"
+                if sugestoes:
+                    ajuda += f" · {', '.join(numero.upper() for numero in sugestoes)}"
+            except Exception as ex:
+                # Sem índice a pesquisa continua a funcionar (só perde as sugestões)
+                print(f"Pesquisa: Índice indisponível: {ex}")
+        if ajuda != self.campo.helper_text:
+            self.campo.helper_text = ajuda
+            self.campo.update()
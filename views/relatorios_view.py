@@ -1,23 +1,20 @@
 # views/relatorios_view.py
-# (Versão Refatorada v1.3 - Layout Moderno)
-# (Adiciona scroll vertical à aba)
+# (Versão Refatorada v1.18 - Layout Moderno)
+# (Aviso do Realtime corrido no loop da sessão, com PIs/NDs/NCs já relidos no cache)
 
 import flet as ft
-from supabase_client import supabase # Cliente 'anon'
+import repositorio
+from supabase_client import cliente_da_sessao
+from cache_global import cache_global, nds_para_pi, nd_valida_para_pi
+from fila_relatorios import fila_relatorios, FilaCheia, gravar_linhas
+from cache_relatorios import cache_relatorios, RelatorioSemDados
+from downloads import url_download
 from datetime import datetime, date
-import pandas as pd
 import traceback 
-import io       
 import os       
-import uuid     
 
-# Importações do ReportLab
-from reportlab.lib.pagesizes import letter, landscape
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT 
+# (v1.11) A geração em si (pandas/openpyxl/ReportLab) está em exportadores.py e corre
+# noutro processo (ver fila_relatorios.py): este módulo já não importa nenhum deles
 
 class RelatoriosView(ft.Column):
     """
@@ -38,10 +35,10 @@ class RelatoriosView(ft.Column):
         # --- (FIM DA CORREÇÃO v1.3) ---
         
         self.progress_ring = ft.ProgressRing(visible=False, width=32, height=32)
+        # (v1.11) Etapa/posição na fila do relatório em geração
+        self.texto_progresso = ft.Text(visible=False, size=12, italic=True)
 
         # --- Controlos de Download (v8.0 - mantidos) ---
-        self.tipo_ficheiro_a_salvar = None 
-        self.dados_relatorio_para_salvar = None 
         
         self.download_button_geral = ft.ElevatedButton(
             text="Baixar Relatório", 
@@ -96,14 +93,7 @@ class RelatoriosView(ft.Column):
                         ft.Row(
                             [
                                 ft.Text("Relatório Geral de Notas de Crédito", size=20, weight=ft.FontWeight.W_600),
-                                ft.Row([
-                                    ft.IconButton(
-                                        icon="REFRESH", 
-                                        on_click=self.load_all_filters_wrapper, 
-                                        tooltip="Recarregar Listas de Filtros"
-                                    ),
-                                    self.progress_ring,
-                                ])
+                                ft.Row([self.texto_progresso, self.progress_ring]),
                             ],
                             alignment=ft.MainAxisAlignment.SPACE_BETWEEN
                         ),
@@ -180,10 +170,6 @@ class RelatoriosView(ft.Column):
         self.page.snack_bar.open = True
         self.page.update()
              
-    def formatar_moeda(self, valor):
-        try: val = float(valor); return f"R$ {val:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-        except (ValueError, TypeError): return "R$ 0,00"
-
     def open_datepicker(self, picker: ft.DatePicker):
         if picker and self.page: 
              if picker not in self.page.overlay:
@@ -203,54 +189,50 @@ class RelatoriosView(ft.Column):
         self.filtro_data_fim.update() 
         if self.page: self.page.update() 
 
-    def load_all_filters_wrapper(self, e):
-        print("Relatórios: Recarregando todos os filtros...")
-        self.progress_ring.visible = True
-        self.update() 
-        try:
-            self.load_all_filters()
-            self.show_success_snackbar("Filtros atualizados com sucesso.")
-        except Exception as ex:
-            print("--- ERRO CRÍTICO (TRACEBACK) NO RELATORIOS [load_all_filters_wrapper] ---")
-            traceback.print_exc()
-            print("--------------------------------------------------------------------------")
-            self.handle_db_error(ex, "recarregar filtros")
-        finally: 
-            self.progress_ring.visible = False
-            self.update() 
-        
     def load_all_filters(self):
         self.load_filter_options()
         self.load_nc_list_for_statement_filter()
+
+    def on_realtime_change(self, tabelas):
+        """
+        (v1.6) Chamado pelo main.py quando o Realtime avisa de alterações
+        (substitui o antigo botão REFRESH das listas de filtros).
+        (v1.18) Corre no loop da sessão, e o sincronizacao_realtime já releu PIs/NDs/NCs
+        (uma vez por âmbito): as leituras do cache_global aqui não vão à BD.
+        """
+        if "notas_de_credito" in tabelas:
+            self.load_all_filters()
+            if self.filtro_pi.value:
+                self.load_filter_options(pi_selecionado=self.filtro_pi.value)
     
     def load_filter_options(self, pi_selecionado=None):
         try:
             if pi_selecionado is None:
                 print("Relatórios: A carregar opções de filtro (PIs e NDs)...")
-                pis = supabase.rpc('get_distinct_pis').execute()
+                # (v1.4) Lê do cache global (só vai à BD se os dados estiverem expirados)
+                pis = cache_global.obter("pis", cliente_da_sessao(self.page))
                 self.filtro_pi.options.clear(); self.filtro_pi.options.append(ft.dropdown.Option(text="Todos os PIs", key=None))
-                if pis.data:
-                    for pi in sorted(pis.data):
-                        if pi: self.filtro_pi.options.append(ft.dropdown.Option(text=pi, key=pi))
-                nds = supabase.rpc('get_distinct_nds').execute()
+                for pi in sorted(pis):
+                    if pi: self.filtro_pi.options.append(ft.dropdown.Option(text=pi, key=pi))
+                nds = cache_global.obter("nds", cliente_da_sessao(self.page))
                 self.filtro_nd.options.clear(); self.filtro_nd.options.append(ft.dropdown.Option(text="Todas as NDs", key=None))
-                if nds.data:
-                    for nd in sorted(nds.data):
-                        if nd: self.filtro_nd.options.append(ft.dropdown.Option(text=nd, key=nd))
+                for nd in sorted(nds):
+                    if nd: self.filtro_nd.options.append(ft.dropdown.Option(text=nd, key=nd))
                 print("Relatórios: Opções de filtro carregadas.")
             else:
+                # (v1.5) NDs do PI vêm do mapa PI->ND em memória (sem RPC, sem bloquear o dropdown)
                 print(f"Relatórios: A carregar NDs para o PI: {pi_selecionado}...")
-                self.filtro_nd.disabled = True; self.filtro_nd.update() 
-                nds = supabase.rpc('get_distinct_nds_for_pi', {'p_pi': pi_selecionado}).execute()
-                self.filtro_nd.options.clear(); self.filtro_nd.options.append(ft.dropdown.Option(text="Todas as NDs", key=None))
-                if nds.data:
-                    for nd in sorted(nds.data):
-                         if nd: self.filtro_nd.options.append(ft.dropdown.Option(text=nd, key=nd))
+                self.filtro_nd.options.clear()
+                self.filtro_nd.options.append(ft.dropdown.Option(text="Todas as NDs", key=None))
+                for nd in nds_para_pi(cliente_da_sessao(self.page), pi_selecionado):
+                    self.filtro_nd.options.append(ft.dropdown.Option(text=nd, key=nd))
                 print("Relatórios: Filtro ND atualizado.")
-                
+
             self.filtro_nd.disabled = False
             if pi_selecionado is None:
                 self.update() 
+            else:
+                self.filtro_nd.update()
         except Exception as ex: 
             print("--- ERRO CRÍTICO (TRACEBACK) NO RELATORIOS [load_filter_options] ---")
             traceback.print_exc()
@@ -260,7 +242,9 @@ class RelatoriosView(ft.Column):
 
     def on_pi_filter_change(self, e):
         pi_val = self.filtro_pi.value if self.filtro_pi.value else None
-        self.filtro_nd.value = None 
+        # Mantém a ND escolhida se ela existir para o novo PI
+        if not nd_valida_para_pi(cliente_da_sessao(self.page), pi_val, self.filtro_nd.value):
+            self.filtro_nd.value = None
         self.load_filter_options(pi_selecionado=pi_val)
 
     def limpar_filtros_geral(self, e):
@@ -272,47 +256,55 @@ class RelatoriosView(ft.Column):
         self.load_filter_options(pi_selecionado=None)
         if self.page: self.page.update() 
         
-    def fetch_report_data_geral(self, e): 
+    def _filtros_geral(self):
+        """(v1.11) Filtros do Relatório Geral (consulta e cabeçalho do PDF)."""
+        return {
+            "data_inicio": self.filtro_data_inicio.value,
+            "data_fim": self.filtro_data_fim.value,
+            "status": self.filtro_status.value,
+            "pi": self.filtro_pi.value,
+            "nd": self.filtro_nd.value,
+        }
+
+    def _avisar_sem_registos(self):
+        print("Relatórios: Nenhum registo encontrado.");
+        self.page.snack_bar = ft.SnackBar(ft.Text("Nenhum registo encontrado com estes filtros."), bgcolor="orange")
+        self.page.snack_bar.open = True
+        self.page.update()
+
+    async def fetch_report_data_geral(self, e): 
+        """
+        (v1.17) Devolve as janelas do Relatório Geral (iterável assíncrono de listas), não uma
+        lista: '_executar_download' grava cada janela no ficheiro do relatório à medida que chega.
+        """
         print("Relatórios: A buscar dados para Relatório Geral...")
-        try:
-            query = supabase.table('ncs_com_saldos') \
-                           .select('numero_nc, pi, natureza_despesa, status_calculado, valor_inicial, saldo_disponivel, data_validade_empenho, ug_gestora, data_recebimento, observacao') 
-            if self.filtro_data_inicio.value: query = query.gte('data_recebimento', self.filtro_data_inicio.value)
-            if self.filtro_data_fim.value: query = query.lte('data_recebimento', self.filtro_data_fim.value)
-            if self.filtro_status.value: query = query.eq('status_calculado', self.filtro_status.value)
-            if self.filtro_pi.value: query = query.eq('pi', self.filtro_pi.value)
-            if self.filtro_nd.value: query = query.eq('natureza_despesa', self.filtro_nd.value)
-            resposta = query.order('data_recebimento', desc=True).execute()
+        cliente = cliente_da_sessao(self.page)
+        filtros = self._filtros_geral()
+
+        async def janelas():
+            try:
+                async for lote in repositorio.iterar_relatorio_geral(cliente, **filtros):
+                    yield lote
+            except Exception as ex: 
+                print(f"Erro ao buscar dados (Geral): {ex}"); 
+                self.handle_db_error(ex, "buscar dados do Relatório Geral") 
+                raise RelatorioSemDados() from ex
+
+        return janelas()
             
-            if resposta.data: 
-                print(f"Relatórios: {len(resposta.data)} registos encontrados."); 
-                return resposta.data
-            else: 
-                print("Relatórios: Nenhum registo encontrado.");
-                self.page.snack_bar = ft.SnackBar(ft.Text("Nenhum registo encontrado com estes filtros."), bgcolor="orange")
-                self.page.snack_bar.open = True
-                self.page.update()
-                return None
-        except Exception as ex: 
-            print(f"Erro ao buscar dados (Geral): {ex}"); 
-            self.handle_db_error(ex, "buscar dados do Relatório Geral") 
-            return None
-            
-    def fetch_report_data_extrato(self, nc_id):
+    async def fetch_report_data_extrato(self, nc_id):
         if not nc_id: return None
         print(f"Relatórios: A buscar dados para Extrato da NC ID: {nc_id}...")
         try:
-            nc_data = supabase.table('notas_de_credito').select('*, observacao').eq('id', nc_id).maybe_single().execute()
-            if not nc_data.data: 
+            # (v1.7) NC, NEs e recolhimentos pedidos em paralelo
+            extrato = await repositorio.carregar_extrato_nc(cliente_da_sessao(self.page), nc_id)
+            if not extrato: 
                 print("NC não encontrada."); 
                 self.show_error("NC selecionada não encontrada."); 
                 return None
             
-            nes_data = supabase.table('notas_de_empenho').select('*').eq('id_nc', nc_id).order('data_empenho', desc=True).execute()
-            recolhimentos_data = supabase.table('recolhimentos_de_saldo').select('*').eq('id_nc', nc_id).order('data_recolhimento', desc=True).execute()
-            
             print("Dados do Extrato carregados.")
-            return { "nc": nc_data.data, "nes": nes_data.data if nes_data.data else [], "recolhimentos": recolhimentos_data.data if recolhimentos_data.data else [] }
+            return extrato
         except Exception as ex: 
             print(f"Erro ao buscar dados (Extrato): {ex}"); 
             self.handle_db_error(ex, "buscar dados do Extrato")
@@ -321,16 +313,14 @@ class RelatoriosView(ft.Column):
     def load_nc_list_for_statement_filter(self):
         print("Relatórios: A carregar NCs para o filtro de Extrato...")
         try:
-            resposta_ncs = supabase.table('notas_de_credito') \
-                                   .select('id, numero_nc') \
-                                   .order('numero_nc', desc=False) \
-                                   .execute()
+            # (v1.4) Lista de NCs (id, numero_nc) vem do cache global
+            ncs_lista = cache_global.obter("ncs_lista", cliente_da_sessao(self.page))
 
             self.dropdown_nc_extrato.options.clear()
-            if not resposta_ncs.data:
+            if not ncs_lista:
                  self.dropdown_nc_extrato.options.append(ft.dropdown.Option(text="Nenhuma NC encontrada", disabled=True))
             else:
-                for nc in resposta_ncs.data:
+                for nc in ncs_lista:
                     self.dropdown_nc_extrato.options.append(
                         ft.dropdown.Option(key=nc['id'], text=nc['numero_nc'])
                     )
@@ -347,35 +337,76 @@ class RelatoriosView(ft.Column):
     
     # --- LÓGICA DE DOWNLOAD (v8.0 - Mantida) ---
     
-    def _executar_download(self, tipo_relatorio, nome_base, dados_para_gerar, button_control_to_update):
+    def _mostrar_progresso(self, etapa, fracao=None):
+        """(v1.11) Chamado pela fila_relatorios (de outra thread) à medida que o relatório avança."""
+        self.texto_progresso.value = etapa if fracao is None else f"{etapa} ({fracao:.0%})"
+        self.progress_ring.value = fracao
+        self.update()
+
+    async def _executar_download(self, tipo_relatorio, nome_base, obter_dados, button_control_to_update, filtros=None):
+        """
+        (v1.15) 'obter_dados()' (assíncrona) só é chamada se o relatório ainda não estiver no
+        cache (chave: tipo + filtros + âmbito RLS + versão dos dados); devolve None sem dados
+        (e já avisou o utilizador). (v1.17) Pode devolver um iterável assíncrono de janelas
+        (Relatório Geral), gravado no ficheiro de linhas sem passar por uma lista.
+        """
         self.progress_ring.visible = True
+        self.progress_ring.value = None
+        self.texto_progresso.value = "A preparar..."
+        self.texto_progresso.visible = True
         button_control_to_update.visible = False 
         self.update()
         
         try:
-            self.dados_relatorio_para_salvar = dados_para_gerar
-            self.tipo_ficheiro_a_salvar = tipo_relatorio
-            
-            file_bytes = self._gerar_bytes_do_relatorio()
-            
-            extensao = "xlsx" if "excel" in tipo_relatorio else "pdf"
-            nome_unico = f"{nome_base}_{uuid.uuid4()}.{extensao}"
-            
-            if not os.path.exists("assets"):
-                os.makedirs("assets")
-            caminho_servidor = os.path.join("assets", nome_unico)
-            
-            print(f"A salvar ficheiro público em: {caminho_servidor}")
-            with open(caminho_servidor, "wb") as f:
-                f.write(file_bytes)
-                
-            url_download = nome_unico # URL relativa para 'assets/'
+            # (v1.12) Mesmo tipo + filtros + dados = mesmo ficheiro: só é gerado da 1ª vez
+            async def gerar(destino):
+                self.texto_progresso.value = "A ler os dados..."
+                self.update()
+                dados = await obter_dados()
+                if not dados:
+                    raise RelatorioSemDados()
+                # (v1.16) Relatório Geral: as linhas vão para um ficheiro (o processo do pool lê-o)
+                # (v1.17) ...gravadas janela a janela, à medida que chegam da consulta
+                caminho_linhas = destino + ".linhas" if hasattr(dados, "__aiter__") else None
+                try:
+                    if caminho_linhas:
+                        dados = await gravar_linhas(caminho_linhas, dados)
+                        print(f"Relatórios: {len(dados)} registos encontrados.")
+                        if not len(dados):
+                            self._avisar_sem_registos()
+                            raise RelatorioSemDados()
+                    # (v1.11) Gerado num processo do pool: não prende o loop do Flet nem o GIL deste processo
+                    total = await fila_relatorios.executar(
+                        tipo_relatorio, dados, destino,
+                        filtros=filtros, ao_progresso=self._mostrar_progresso,
+                    )
+                finally:
+                    if caminho_linhas and os.path.exists(caminho_linhas):
+                        os.remove(caminho_linhas)
+                print(f"Relatórios: {tipo_relatorio} gerado ({total} linhas).")
+
+            nome_unico, reutilizado = await cache_relatorios.obter_ou_gerar(
+                tipo_relatorio, nome_base, filtros, cliente_da_sessao(self.page).ambito, gerar,
+            )
+            print(f"Relatório em: {os.path.join(cache_relatorios.pasta, nome_unico)}")
+            nome_download = f"{nome_base}{os.path.splitext(nome_unico)[1]}"
             
-            button_control_to_update.text = f"Baixar: {nome_unico}"
-            button_control_to_update.on_click = lambda e, url=url_download: self.page.launch_url(url)
+            # (v1.13) Token assinado gerado a cada clique (válido poucos minutos): o ficheiro
+            # já não é público em assets/
+            button_control_to_update.text = f"Baixar: {nome_download}"
+            button_control_to_update.on_click = lambda e, nome=nome_unico, nome_download=nome_download: self.page.launch_url(url_download(nome, nome_download))
             button_control_to_update.visible = True
             
-            self.show_success_snackbar("Relatório pronto. Clique no botão para baixar.")
+            if reutilizado:
+                self.show_success_snackbar("Relatório já gerado com estes filtros e dados. Clique no botão para baixar.")
+            else:
+                self.show_success_snackbar("Relatório pronto. Clique no botão para baixar.")
+
+        except FilaCheia as e:
+            self.show_error(str(e))
+
+        except RelatorioSemDados:
+            pass  # 'obter_dados' já avisou (sem registos / erro na consulta)
 
         except Exception as e:
             print(f"Erro ao preparar download para {tipo_relatorio}: {e}")
@@ -383,32 +414,36 @@ class RelatoriosView(ft.Column):
             self.show_error(f"Erro ao gerar relatório: {e}")
         
         finally:
-            self.dados_relatorio_para_salvar = None
-            self.tipo_ficheiro_a_salvar = None
             self.progress_ring.visible = False
+            self.texto_progresso.visible = False
             self.update()
 
-    def gerar_relatorio_geral_excel(self, e):
-        dados = self.fetch_report_data_geral(e)
-        if dados:
-            self._executar_download(
-                tipo_relatorio="excel_geral",
-                nome_base="relatorio_geral_ncs",
-                dados_para_gerar=dados,
-                button_control_to_update=self.download_button_geral 
-            )
+    async def gerar_relatorio_geral_excel(self, e):
+        # (v1.11) Gerar o ficheiro é trabalho de CPU: corre num processo do pool (fila_relatorios)
+        # (v1.15) Os filtros identificam o relatório no cache (os dados só são lidos se faltar)
+        await self._executar_download(
+            tipo_relatorio="excel_geral",
+            nome_base="relatorio_geral_ncs",
+            obter_dados=lambda: self.fetch_report_data_geral(e),
+            button_control_to_update=self.download_button_geral,
+            filtros=self._filtros_geral(),
+        )
 
-    def gerar_relatorio_geral_pdf(self, e):
-        dados = self.fetch_report_data_geral(e)
-        if dados:
-            self._executar_download(
-                tipo_relatorio="pdf_geral",
-                nome_base="relatorio_geral_ncs",
-                dados_para_gerar=dados,
-                button_control_to_update=self.download_button_geral
-            )
+    async def gerar_relatorio_geral_pdf(self, e):
+        await self._executar_download(
+            tipo_relatorio="pdf_geral",
+            nome_base="relatorio_geral_ncs",
+            obter_dados=lambda: self.fetch_report_data_geral(e),
+            button_control_to_update=self.download_button_geral,
+            filtros=self._filtros_geral(),
+        )
+
+    def _nome_base_extrato(self, nc_id):
+        """(v1.15) 'extrato_<número da NC>', pelo texto do dropdown (sem ler o extrato)."""
+        numero = next((opcao.text for opcao in self.dropdown_nc_extrato.options if str(opcao.key) == str(nc_id)), None)
+        return "extrato_" + (numero or "extrato").replace('/', '_').replace('\\', '_')
 
-    def gerar_extrato_excel(self, e):
+    async def gerar_extrato_excel(self, e):
         self.download_button_extrato.visible = False 
         nc_id_selecionada = self.dropdown_nc_extrato.value
         if not nc_id_selecionada: 
@@ -416,17 +451,15 @@ class RelatoriosView(ft.Column):
             self.page.snack_bar.open = True; self.page.update()
             return
             
-        dados_extrato = self.fetch_report_data_extrato(nc_id_selecionada)
-        if dados_extrato:
-            nome_base = dados_extrato['nc'].get('numero_nc', 'extrato').replace('/', '_').replace('\\', '_')
-            self._executar_download(
-                tipo_relatorio="excel_extrato",
-                nome_base=f"extrato_{nome_base}",
-                dados_para_gerar=dados_extrato,
-                button_control_to_update=self.download_button_extrato 
-            )
+        await self._executar_download(
+            tipo_relatorio="excel_extrato",
+            nome_base=self._nome_base_extrato(nc_id_selecionada),
+            obter_dados=lambda: self.fetch_report_data_extrato(nc_id_selecionada),
+            button_control_to_update=self.download_button_extrato,
+            filtros={"nc_id": nc_id_selecionada},
+        )
 
-    def gerar_extrato_pdf(self, e):
+    async def gerar_extrato_pdf(self, e):
         self.download_button_extrato.visible = False
         nc_id_selecionada = self.dropdown_nc_extrato.value
         if not nc_id_selecionada: 
@@ -434,200 +467,14 @@ class RelatoriosView(ft.Column):
             self.page.snack_bar.open = True; self.page.update()
             return
             
-        dados_extrato = self.fetch_report_data_extrato(nc_id_selecionada)
-        if dados_extrato:
-            nome_base = dados_extrato['nc'].get('numero_nc', 'extrato').replace('/', '_').replace('\\', '_')
-            self._executar_download(
-                tipo_relatorio="pdf_extrato",
-                nome_base=f"extrato_{nome_base}",
-                dados_para_gerar=dados_extrato,
-                button_control_to_update=self.download_button_extrato
-            )
-
-    def _gerar_bytes_do_relatorio(self):
-        tipo = self.tipo_ficheiro_a_salvar
-        dados = self.dados_relatorio_para_salvar
-        
-        if not tipo or not dados:
-            raise Exception("Dados ou tipo de relatório em falta para gerar bytes.")
-
-        print(f"A gerar bytes para: {tipo}")
+        await self._executar_download(
+            tipo_relatorio="pdf_extrato",
+            nome_base=self._nome_base_extrato(nc_id_selecionada),
+            obter_dados=lambda: self.fetch_report_data_extrato(nc_id_selecionada),
+            button_control_to_update=self.download_button_extrato,
+            filtros={"nc_id": nc_id_selecionada},
+        )
 
-        try:
-            # --- EXCEL GERAL ---
-            if tipo == "excel_geral":
-                df = pd.DataFrame(dados)
-                df = df.rename(columns={ 'numero_nc': 'Número NC', 'pi': 'PI', 'natureza_despesa': 'ND', 'status_calculado': 'Status', 'valor_inicial': 'Valor Inicial', 'saldo_disponivel': 'Saldo Disponível', 'data_validade_empenho': 'Prazo Empenho', 'ug_gestora': 'UG Gestora', 'data_recebimento': 'Data Recebimento', 'observacao': 'Observação' })
-                colunas_relatorio = ['Número NC', 'PI', 'ND', 'Status', 'Valor Inicial', 'Saldo Disponível', 'Prazo Empenho', 'UG Gestora', 'Data Recebimento', 'Observação']
-                colunas_existentes = [col for col in colunas_relatorio if col in df.columns]
-                df = df[colunas_existentes]
-                if 'Data Recebimento' in df.columns: df['Data Recebimento'] = pd.to_datetime(df['Data Recebimento'], errors='coerce').dt.strftime('%d/%m/%Y')
-                if 'Prazo Empenho' in df.columns: df['Prazo Empenho'] = pd.to_datetime(df['Prazo Empenho'], errors='coerce').dt.strftime('%d/%m/%Y')
-                if 'Valor Inicial' in df.columns: df['Valor Inicial'] = pd.to_numeric(df['Valor Inicial'], errors='coerce').fillna(0)
-                if 'Saldo Disponível' in df.columns: df['Saldo Disponível'] = pd.to_numeric(df['Saldo Disponível'], errors='coerce').fillna(0)
-                
-                with io.BytesIO() as file_in_memory:
-                    df.to_excel(file_in_memory, index=False, engine='openpyxl')
-                    return file_in_memory.getvalue()
-
-            # --- PDF GERAL ---
-            elif tipo == "pdf_geral":
-                with io.BytesIO() as file_in_memory:
-                    doc = SimpleDocTemplate(file_in_memory, pagesize=landscape(letter)); story = [];
-                    styles = getSampleStyleSheet()
-                    style_normal = styles['Normal']; style_normal.alignment = TA_LEFT; style_normal.fontSize = 8
-                    style_right = ParagraphStyle(name='Right', parent=style_normal, alignment=TA_RIGHT)
-                    style_header = ParagraphStyle(name='Header', parent=style_normal, alignment=TA_CENTER, fontName='Helvetica-Bold', textColor=colors.whitesmoke, fontSize=9)
-                    style_center = ParagraphStyle(name='Center', parent=style_normal, alignment=TA_CENTER)
-                    style_title = styles['Heading1']; style_title.alignment = TA_CENTER
-                    
-                    story.append(Paragraph("Relatório Geral de Notas de Crédito", style_title)); story.append(Spacer(1, 0.2*inch))
-                    filtros_str = "Filtros Aplicados: "; 
-                    if self.filtro_data_inicio.value: filtros_str += f"Data Rec. Início: {self.filtro_data_inicio.value}, "; 
-                    if self.filtro_data_fim.value: filtros_str += f"Data Rec. Fim: {self.filtro_data_fim.value}, "; 
-                    if self.filtro_pi.value: filtros_str += f"PI: {self.filtro_pi.value}, "; 
-                    if self.filtro_nd.value: filtros_str += f"ND: {self.filtro_nd.value}, "; 
-                    if self.filtro_status.value: filtros_str += f"Status: {self.filtro_status.value}"; 
-                    if filtros_str == "Filtros Aplicados: ": filtros_str += "Nenhum"
-                    story.append(Paragraph(filtros_str, styles['Normal'])); story.append(Spacer(1, 0.2*inch))
-                    
-                    header = [Paragraph(h, style_header) for h in ['Número NC', 'PI', 'ND', 'Status', 'Valor Inicial', 'Saldo', 'Prazo Empenho', 'UG Gestora', 'Data Receb.', 'Observação']]
-                    pdf_data = [header]
-                    
-                    for item in dados: 
-                        data_rec = datetime.fromisoformat(item.get('data_recebimento', '')).strftime('%d/%m/%Y') if item.get('data_recebimento') else ''
-                        prazo_emp = datetime.fromisoformat(item.get('data_validade_empenho', '')).strftime('%d/%m/%Y') if item.get('data_validade_empenho') else ''
-                        row = [ 
-                            Paragraph(item.get('numero_nc', ''), style_center), 
-                            Paragraph(item.get('pi', ''), style_center), 
-                            Paragraph(item.get('natureza_despesa', ''), style_center), 
-                            Paragraph(item.get('status_calculado', ''), style_center), 
-                            Paragraph(self.formatar_moeda(item.get('valor_inicial')), style_right), 
-                            Paragraph(self.formatar_moeda(item.get('saldo_disponivel')), style_right), 
-                            Paragraph(prazo_emp, style_center), 
-                            Paragraph(item.get('ug_gestora', ''), style_center), 
-                            Paragraph(data_rec, style_center), 
-                            Paragraph(item.get('observacao', ''), style_normal) 
-                        ]
-                        pdf_data.append(row) 
-                        
-                    col_widths = [1.2*inch, 0.7*inch, 0.7*inch, 0.7*inch, 1.0*inch, 1.0*inch, 0.8*inch, 0.7*inch, 0.8*inch, 2.4*inch]
-                    
-                    table = Table(pdf_data, repeatRows=1, colWidths=col_widths) 
-                    style = TableStyle([ ('BACKGROUND', (0, 0), (-1, 0), colors.grey), ('VALIGN', (0, 0), (-1, -1), 'TOP'), ('GRID', (0, 0), (-1, -1), 1, colors.black), ('BACKGROUND', (0, 1), (-1, -1), colors.beige), ])
-                    table.setStyle(style); story.append(table)
-                    doc.build(story)
-                    return file_in_memory.getvalue()
-
-            # --- EXCEL EXTRATO ---
-            elif tipo == "excel_extrato":
-                df_nc = pd.DataFrame([dados['nc']])
-                df_nc = df_nc.rename(columns={ 'numero_nc': 'Número NC', 'pi': 'PI', 'natureza_despesa': 'ND', 'valor_inicial': 'Valor Inicial', 'data_validade_empenho': 'Prazo Empenho', 'ug_gestora': 'UG Gestora', 'data_recebimento': 'Data Recebimento', 'ptres':'PTRES', 'fonte':'Fonte', 'observacao': 'Observação' })
-                df_nc = df_nc[['Número NC', 'PI', 'ND', 'Valor Inicial', 'Prazo Empenho', 'Data Recebimento', 'UG Gestora', 'PTRES', 'Fonte', 'Observação']] 
-                if 'Data Recebimento' in df_nc.columns: df_nc['Data Recebimento'] = pd.to_datetime(df_nc['Data Recebimento'], errors='coerce').dt.strftime('%d/%m/%Y')
-                if 'Prazo Empenho' in df_nc.columns: df_nc['Prazo Empenho'] = pd.to_datetime(df_nc['Prazo Empenho'], errors='coerce').dt.strftime('%d/%m/%Y')
-                
-                df_nes = pd.DataFrame(dados['nes'])
-                if not df_nes.empty:
-                    df_nes = df_nes.rename(columns={'numero_ne': 'Número NE', 'data_empenho': 'Data Empenho', 'valor_empenhado': 'Valor Empenhado', 'descricao':'Descrição'})
-                    df_nes = df_nes[['Número NE', 'Data Empenho', 'Valor Empenhado', 'Descrição']]
-                    if 'Data Empenho' in df_nes.columns: df_nes['Data Empenho'] = pd.to_datetime(df_nes['Data Empenho'], errors='coerce').dt.strftime('%d/%m/%Y')
-                    if 'Valor Empenhado' in df_nes.columns: df_nes['Valor Empenhado'] = pd.to_numeric(df_nes['Valor Empenhado'], errors='coerce') 
-                else: df_nes = pd.DataFrame([{" ": "Nenhum empenho registado."}])
-                    
-                df_recolhimentos = pd.DataFrame(dados['recolhimentos'])
-                if not df_recolhimentos.empty:
-                    df_recolhimentos = df_recolhimentos.rename(columns={'data_recolhimento': 'Data Recolhimento', 'valor_recolhido': 'Valor Recolhido', 'descricao':'Descrição'})
-                    df_recolhimentos = df_recolhimentos[['Data Recolhimento', 'Valor Recolhido', 'Descrição']]
-                    if 'Data Recolhimento' in df_recolhimentos.columns: df_recolhimentos['Data Recolhimento'] = pd.to_datetime(df_recolhimentos['Data Recolhimento'], errors='coerce').dt.strftime('%d/%m/%Y')
-                    if 'Valor Recolhido' in df_recolhimentos.columns: df_recolhimentos['Valor Recolhido'] = pd.to_numeric(df_recolhimentos['Valor Recolhido'], errors='coerce')
-                else: df_recolhimentos = pd.DataFrame([{" ": "Nenhum recolhimento registado."}])
-                
-                with io.BytesIO() as file_in_memory:
-                    with pd.ExcelWriter(file_in_memory, engine='openpyxl') as writer:
-                         if 'Valor Empenhado' in df_nes.columns: df_nes['Valor Empenhado'] = pd.to_numeric(df_nes['Valor Empenhado'], errors='coerce')
-                         if 'Valor Recolhido' in df_recolhimentos.columns: df_recolhimentos['Valor Recolhido'] = pd.to_numeric(df_recolhimentos['Valor Recolhido'], errors='coerce')
-                         
-                         df_nc.to_excel(writer, sheet_name='Dados da NC', index=False)
-                         df_nes.to_excel(writer, sheet_name='Notas de Empenho', index=False)
-                         df_recolhimentos.to_excel(writer, sheet_name='Recolhimentos', index=False)
-                    return file_in_memory.getvalue()
-                    
-            # --- PDF EXTRATO ---
-            elif tipo == "pdf_extrato":
-                with io.BytesIO() as file_in_memory:
-                    doc = SimpleDocTemplate(file_in_memory, pagesize=letter); story = []; 
-                    
-                    nc = dados['nc'] 
-                    
-                    styles = getSampleStyleSheet()
-                    style_normal = styles['Normal']; style_normal.alignment = TA_LEFT; style_normal.fontSize = 8
-                    style_right = ParagraphStyle(name='Right', parent=style_normal, alignment=TA_RIGHT)
-                    style_header = ParagraphStyle(name='Header', parent=style_normal, alignment=TA_CENTER, fontName='Helvetica-Bold', textColor=colors.whitesmoke, fontSize=9)
-                    style_center = ParagraphStyle(name='Center', parent=style_normal, alignment=TA_CENTER)
-                    style_title = styles['Heading1']; style_title.alignment = TA_CENTER
-                    style_heading2 = styles['Heading2']
-                    
-                    story.append(Paragraph(f"Extrato da Nota de Crédito: {nc.get('numero_nc', '')}", style_title)); story.append(Spacer(1, 0.1*inch))
-                    story.append(Paragraph(f"PI: {nc.get('pi', '')} | ND: {nc.get('natureza_despesa', '')}", styles['Normal']))
-                    story.append(Paragraph(f"Valor Inicial: {self.formatar_moeda(nc.get('valor_inicial'))} | Prazo Empenho: {datetime.fromisoformat(nc.get('data_validade_empenho', '')).strftime('%d/%m/%Y') if nc.get('data_validade_empenho') else ''}", styles['Normal']))
-                    story.append(Paragraph(f"Data Recebimento: {datetime.fromisoformat(nc.get('data_recebimento', '')).strftime('%d/%m/%Y') if nc.get('data_recebimento') else ''} | UG Gestora: {nc.get('ug_gestora', '')}", styles['Normal']))
-                    story.append(Paragraph("Observação:", style_heading2))
-                    story.append(Paragraph(nc.get('observacao', 'N/A'), styles['Normal']))
-                    story.append(Spacer(1, 0.2*inch))
-
-                    story.append(Paragraph("Notas de Empenho Vinculadas", style_heading2))
-                    header_nes = [Paragraph(h, style_header) for h in ['Número NE', 'Data', 'Valor', 'Descrição']]
-                    pdf_data_nes = [header_nes]
-                    
-                    for ne in dados['nes']:
-                        data = datetime.fromisoformat(ne.get('data_empenho', '')).strftime('%d/%m/%Y') if ne.get('data_empenho') else '??/??/????'
-                        row = [
-                            Paragraph(ne.get('numero_ne', ''), style_center), 
-                            Paragraph(data, style_center), 
-                            Paragraph(self.formatar_moeda(ne.get('valor_empenhado')), style_right), 
-                            Paragraph(ne.get('descricao', ''), style_normal) 
-                        ]
-                        pdf_data_nes.append(row)
-                    
-                    if not dados['nes']: 
-                        pdf_data_nes.append([Paragraph("Nenhum empenho registado.", style_normal), "", "", ""])
-                    
-                    table_nes = Table(pdf_data_nes, repeatRows=1, colWidths=[1.5*inch, 0.8*inch, 1.2*inch, 4*inch])
-                    style_nes = TableStyle([('BACKGROUND', (0, 0), (-1, 0), colors.darkblue), ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke), ('VALIGN', (0, 0), (-1, -1), 'TOP'), ('GRID', (0, 0), (-1, -1), 1, colors.black), ('BACKGROUND', (0, 1), (-1, -1), colors.lightblue),])
-                    table_nes.setStyle(style_nes); story.append(table_nes); story.append(Spacer(1, 0.2*inch))
-                    
-                    story.append(Paragraph("Recolhimentos de Saldo Vinculados", style_heading2))
-                    header_rec = [Paragraph(h, style_header) for h in ['Data', 'Valor Recolhido', 'Descrição']]
-                    pdf_data_rec = [header_rec]
-                    
-                    for rec in dados['recolhimentos']:
-                         data = datetime.fromisoformat(rec.get('data_recolhimento', '')).strftime('%d/%m/%Y') if rec.get('data_recolhimento') else '??/??/????'
-                         row = [
-                            Paragraph(data, style_center), 
-                            Paragraph(self.formatar_moeda(rec.get('valor_recolhido')), style_right), 
-                            Paragraph(rec.get('descricao', ''), style_normal) 
-                         ]
-                         pdf_data_rec.append(row)
-                    
-                    if not dados['recolhimentos']: 
-                        pdf_data_rec.append([Paragraph("Nenhum recolhimento registado.", style_normal), "", ""])
-                    
-                    table_rec = Table(pdf_data_rec, repeatRows=1, colWidths=[1*inch, 1.5*inch, 5*inch])
-                    style_rec = TableStyle([('BACKGROUND', (0, 0), (-1, 0), colors.darkorange), ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke), ('VALIGN', (0, 0), (-1, -1), 'TOP'), ('GRID', (0, 0), (-1, -1), 1, colors.black), ('BACKGROUND', (0, 1), (-1, -1), colors.lightyellow),])
-                    table_rec.setStyle(style_rec); story.append(table_rec)
-
-                    doc.build(story)
-                    return file_in_memory.getvalue()
-            
-            else:
-                raise Exception(f"Tipo de relatório desconhecido: {tipo}")
-        
-        except Exception as e:
-            print(f"Erro ao gerar bytes para {tipo}: {e}")
-            traceback.print_exc()
-            raise e # Propaga o erro
-            
 # --- FIM DAS ALTERAÇÕES ---
 
 def create_relatorios_view(page: ft.Page, error_modal=None):
@@ -0,0 +1,106 @@
+# views/tabela_chaveada.py
+# (Versão v1.0 - Tabelas e Listas com Linhas Chaveadas)
+# (Reaproveita as linhas por id: o page.update() só envia as linhas novas, removidas ou alteradas)
+
+import flet as ft
+
+
+def _assinatura(registo):
+    """Muda sempre que algum valor do registo muda (os registos vêm do PostgREST: dicts/listas simples)."""
+    return repr(registo)
+
+
+class LinhasChaveadas:
+    """
+    Gere as linhas (controlos) de uma lista de registos, por chave (id do registo).
+
+    O Flet compara os filhos de um controlo pela IDENTIDADE dos objetos: um
+    controlo reaproveitado não é serializado de novo. Por isso, em vez de limpar
+    e reconstruir tudo, 'sincronizar()' mantém o controlo de cada registo que não
+    mudou e só chama 'construir_linha' para registos novos ou alterados.
+
+    'construir_linha(registo)' devolve o controlo (DataRow, Container, ...) de um registo.
+    'chave(registo)' devolve o identificador estável (por omissão, registo['id']).
+    """
+
+    def __init__(self, construir_linha, chave=None):
+        self.construir_linha = construir_linha
+        self.chave = chave or (lambda registo: registo['id'])
+        self._linhas = {}  # chave -> (assinatura, controlo)
+
+    def __len__(self):
+        return len(self._linhas)
+
+    def _linha_de(self, registo, anteriores):
+        chave = self.chave(registo)
+        assinatura = _assinatura(registo)
+        anterior = anteriores.get(chave)
+        if anterior and anterior[0] == assinatura:
+            linha = anterior[1]
+        else:
+            linha = self.construir_linha(registo)
+        self._linhas[chave] = (assinatura, linha)
+        return linha
+
+    def sincronizar(self, registos):
+        """Controlos para mostrar exatamente 'registos' (por esta ordem), reaproveitando os iguais."""
+        anteriores = self._linhas
+        self._linhas = {}
+        return [self._linha_de(registo, anteriores) for registo in registos]
+
+    def acrescentar(self, linhas_atuais, registos):
+        """
+        Lista 'linhas_atuais' + os controlos de 'registos' (paginação).
+        Um registo já mostrado é atualizado no sítio, não repetido no fim.
+        """
+        linhas = list(linhas_atuais)
+        for registo in registos:
+            anterior = self._linhas.get(self.chave(registo))
+            linha = self._linha_de(registo, self._linhas)
+            if anterior is None:
+                linhas.append(linha)
+            elif anterior[1] is not linha and anterior[1] in linhas:
+                linhas[linhas.index(anterior[1])] = linha
+        return linhas
+
+    def limpar(self):
+        self._linhas = {}
+
+
+class TabelaChaveada(ft.DataTable):
+    """
+    ft.DataTable com as linhas geridas por LinhasChaveadas.
+    Depois de gravar uma NE, a atualização enviada é a dessa linha, não a tabela.
+    'texto_vazio' é a mensagem da linha mostrada quando não há registos.
+    """
+
+    def __init__(self, columns, construir_linha, chave=None, texto_vazio=None, **kwargs):
+        super().__init__(columns=columns, rows=[], **kwargs)
+        self.linhas_chaveadas = LinhasChaveadas(construir_linha, chave)
+        self.texto_vazio = texto_vazio
+        self._linha_vazia = None
+
+    @property
+    def quantidade(self):
+        """Número de registos mostrados (sem contar a linha 'vazio')."""
+        return len(self.linhas_chaveadas)
+
+    def sincronizar(self, registos):
+        self.rows = self.linhas_chaveadas.sincronizar(registos)
+        if not self.rows and self.texto_vazio:
+            self.rows = [self._construir_linha_vazia()]
+
+    def acrescentar(self, registos):
+        linhas = [linha for linha in self.rows if linha is not self._linha_vazia]
+        self.rows = self.linhas_chaveadas.acrescentar(linhas, registos)
+
+    def limpar(self):
+        self.linhas_chaveadas.limpar()
+        self.rows = []
+
+    def _construir_linha_vazia(self):
+        if self._linha_vazia is None:
+            celulas = [ft.DataCell(ft.Text(self.texto_vazio, italic=True))]
+            celulas += [ft.DataCell(ft.Text("")) for _ in self.columns[1:]]
+            self._linha_vazia = ft.DataRow(cells=celulas)
+        return self._linha_vazia